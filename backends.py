@@ -0,0 +1,248 @@
+'''Backends running the PDF operations.
+
+The PyPDF2 code in `engine` can do everything and is always used as the fallback.
+With `use_poppler_tools=True`, operations are first offered to the locally installed
+Poppler utilities: `pdfunite` joins whole files and `pdfseparate` splits them, both
+without loading the documents into Python. Whenever a tool isn't on the PATH, can't
+do what is asked (page selections, deduplication, optimized output, rotating,
+stamping) or fails on a file, the operation falls back to the next backend:
+
+    join_pdfs(entries, 'joined.pdf', use_poppler_tools=True)
+
+The functions of this module take the same arguments as their counterparts in
+`engine` plus `use_poppler_tools`. Joining, rotating and stamping also take a
+`resultcache.ResultCache`, which serves jobs that ran before with the same inputs
+and parameters. `engine` and thereby PyPDF2 are only imported once an operation
+actually runs on the PyPDF2 backend.
+'''
+
+import os
+import shutil
+import subprocess
+import tempfile
+
+from settings import POPPLER_SPLIT_CHUNK
+from doccache import document_cache
+from tracing import span
+
+
+class Unsupported(Exception):
+    '''Raised by a backend that can't run an operation with the given arguments.'''
+
+
+def _no_progress(done, total=None):
+    pass
+
+
+class PyPDF2Backend:
+    '''The operations of `engine`, which support every option.'''
+
+    name = 'PyPDF2'
+
+    def join(self, *args, **kwargs):
+        from engine import join_pdfs
+        return join_pdfs(*args, **kwargs)
+
+    def split(self, *args, **kwargs):
+        from engine import split_pdf
+        return split_pdf(*args, **kwargs)
+
+    def rotate(self, *args, **kwargs):
+        from engine import rotate_pdf
+        return rotate_pdf(*args, **kwargs)
+
+    def stamp(self, *args, **kwargs):
+        from engine import stamp_pdf
+        return stamp_pdf(*args, **kwargs)
+
+
+class PopplerBackend:
+    '''Joining and splitting with the Poppler command line utilities.
+
+    Joined files get bookmarks as far as the installed `pdfunite` carries them over.
+
+    Args:
+        path (str): Search path for the tools, `PATH` if None (default: None)
+    '''
+
+    name = 'Poppler'
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def tool(self, name):
+        '''Full path of a Poppler utility.
+
+        Raises:
+            Unsupported: If the tool is not installed
+        '''
+        tool = shutil.which(name, path=self.path)
+        if tool is None:
+            raise Unsupported(f'{name} not found')
+        return tool
+
+    def run(self, args):
+        '''Run a Poppler utility.
+
+        Args:
+            args (list): Full path of the tool, as returned by `tool()`, and its arguments
+
+        Raises:
+            Unsupported: If the tool fails
+        '''
+        with span(os.path.basename(args[0])):
+            completed = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if completed.returncode != 0:
+            raise Unsupported(completed.stderr.decode(errors='replace').strip()
+                              or f'{os.path.basename(args[0])} failed')
+
+    def join(self, entries, output_filepath, import_bookmarks=True, deduplicate=False, compress_level=None,
+             progress=_no_progress):
+        entries = list(entries)
+        if (any(page_ranges is not None for _, page_ranges in entries) or not import_bookmarks or deduplicate
+                or compress_level is not None):
+            # pdfunite always keeps the bookmarks
+            raise Unsupported('pdfunite only joins whole files as they are')
+        pdfunite = self.tool('pdfunite')
+        total = sum(document_cache.pages(filepath) for filepath, _ in entries)
+        partial_filepath = f'{output_filepath}.part'
+        try:
+            self.run([pdfunite] + [filepath for filepath, _ in entries] + [partial_filepath])
+            os.replace(partial_filepath, output_filepath)
+        finally:
+            if os.path.exists(partial_filepath):
+                os.remove(partial_filepath)
+        progress(total, total)
+        return 0
+
+    def split(self, filepath, workers=1, shards_per_worker=4, compress_level=None, every=1, bookmarks=False,
+              max_bytes=None, archive=None, progress=_no_progress):
+        from engine import split_output_path
+
+        if compress_level is not None:
+            raise Unsupported('pdfseparate writes pages as they are')
+        if every != 1 or bookmarks or max_bytes is not None:
+            raise Unsupported('pdfseparate only writes single pages')
+        if archive is not None:
+            raise Unsupported('pdfseparate only writes files')
+        pdfseparate = self.tool('pdfseparate')
+        basepath = os.path.splitext(filepath)[0]
+        pages = document_cache.pages(filepath)
+        # pdfseparate can't zero-pad page numbers, so it writes into a directory next to
+        # the output, from where the pages get renamed
+        workdir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(filepath)), prefix='.split-')
+        try:
+            for first in range(1, pages + 1, POPPLER_SPLIT_CHUNK):
+                last = min(first + POPPLER_SPLIT_CHUNK - 1, pages)
+                self.run([pdfseparate, '-f', str(first), '-l', str(last), filepath,
+                            os.path.join(workdir, '%d.pdf')])
+                progress(last, pages)
+            output_paths = [split_output_path(basepath, p, pages) for p in range(pages)]
+            for p, output_path in enumerate(output_paths):
+                os.replace(os.path.join(workdir, f'{p + 1}.pdf'), output_path)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        return output_paths
+
+    def rotate(self, *args, **kwargs):
+        raise Unsupported('Poppler has no tool to rotate pages')
+
+    def stamp(self, *args, **kwargs):
+        raise Unsupported('Poppler has no tool to stamp pages')
+
+
+PYPDF2 = PyPDF2Backend()
+POPPLER = PopplerBackend()
+
+
+def backends(use_poppler_tools=False):
+    '''Backends to try in order.
+
+    Args:
+        use_poppler_tools (bool): Try the Poppler utilities first (default: False)
+
+    Returns:
+        list: Backend instances, always ending with the PyPDF2 backend
+    '''
+    return [POPPLER, PYPDF2] if use_poppler_tools else [PYPDF2]
+
+
+def run_operation(operation, *args, use_poppler_tools=False, **kwargs):
+    '''Run an operation on the first backend that supports it.
+
+    Args:
+        operation (str): `'join'`, `'split'`, `'rotate'` or `'stamp'`
+        *args: Arguments of the operation
+        use_poppler_tools (bool): Try the Poppler utilities first (default: False)
+        **kwargs: Keyword arguments of the operation
+
+    Returns:
+        Whatever the operation of the backend returns
+    '''
+    *preferred, fallback = backends(use_poppler_tools)
+    for backend in preferred:
+        try:
+            return getattr(backend, operation)(*args, **kwargs)
+        except Unsupported:
+            continue
+    return getattr(fallback, operation)(*args, **kwargs)
+
+
+def join_pdfs(entries, output_filepath, import_bookmarks=True, deduplicate=False, compress_level=None,
+              progress=_no_progress, use_poppler_tools=False, result_cache=None):
+    '''`engine.join_pdfs`, run with `pdfunite` if possible and wanted, or served from `result_cache`.'''
+    # a backend giving up must not leave the next one with a used up iterator
+    entries = list(entries)
+
+    def join():
+        return run_operation('join', entries, output_filepath, import_bookmarks=import_bookmarks,
+                             deduplicate=deduplicate, compress_level=compress_level, progress=progress,
+                             use_poppler_tools=use_poppler_tools)
+    if result_cache is None:
+        return join()
+    from resultcache import page_slices
+    params = {'pages': [page_slices(filepath, page_ranges) for filepath, page_ranges in entries],
+              'import_bookmarks': bool(import_bookmarks), 'deduplicate': bool(deduplicate),
+              'compress_level': compress_level, 'poppler': bool(use_poppler_tools)}
+    return result_cache.run('join', [filepath for filepath, _ in entries], params, output_filepath, join,
+                            progress=progress)
+
+
+def split_pdf(*args, use_poppler_tools=False, **kwargs):
+    '''`engine.split_pdf`, run with `pdfseparate` if possible and wanted.'''
+    return run_operation('split', *args, use_poppler_tools=use_poppler_tools, **kwargs)
+
+
+def rotate_pdf(filepath, output_filepath, page_range, degrees, extract_pages=False, incremental=False,
+               compress_level=None, progress=_no_progress, use_poppler_tools=False, result_cache=None):
+    '''`engine.rotate_pdf`, there is no Poppler implementation. May be served from `result_cache`.'''
+    def rotate():
+        return run_operation('rotate', filepath, output_filepath, page_range, degrees, extract_pages=extract_pages,
+                             incremental=incremental, compress_level=compress_level, progress=progress,
+                             use_poppler_tools=use_poppler_tools)
+    if result_cache is None:
+        return rotate()
+    from resultcache import clamp_page_range
+    # ranges reaching past the last page rotate the same pages, so they share an entry
+    page_range = clamp_page_range(filepath, page_range)
+    params = {'page_range': page_range, 'degrees': degrees % 360, 'extract_pages': bool(extract_pages),
+              'incremental': bool(incremental), 'compress_level': compress_level}
+    return result_cache.run('rotate', [filepath], params, output_filepath, rotate, progress=progress)
+
+
+def stamp_pdf(source_filepath, stamp_filepath, output_filepath, command='BG', only_first_page=False, numbering=None,
+              compress_level=None, progress=_no_progress, use_poppler_tools=False, result_cache=None):
+    '''`engine.stamp_pdf`, there is no Poppler implementation. May be served from `result_cache`.'''
+    def stamp():
+        return run_operation('stamp', source_filepath, stamp_filepath, output_filepath, command=command,
+                             only_first_page=only_first_page, numbering=numbering, compress_level=compress_level,
+                             progress=progress, use_poppler_tools=use_poppler_tools)
+    if result_cache is None:
+        return stamp()
+    params = {'command': command, 'only_first_page': bool(only_first_page), 'compress_level': compress_level,
+              'stamp': stamp_filepath is not None}
+    if numbering is not None:
+        params['numbering'] = {'format': numbering.format, 'position': numbering.position,
+                               'font_size': numbering.font_size, 'start': numbering.start}
+    filepaths = [source_filepath] if stamp_filepath is None else [source_filepath, stamp_filepath]
+    return result_cache.run('stamp', filepaths, params, output_filepath, stamp, progress=progress)
@@ -0,0 +1,210 @@
+'''Rotate or stamp many files at once.
+
+The functions of this module take a list of `(input, output)` path pairs and apply
+the same rotation or the same stamp to all of them, spread over a pool of worker
+processes:
+
+    report = batch_stamp(pairs, 'letterhead.pdf', workers=4)
+    print(report.summary())
+
+Every worker parses the stamp once and uses it for all the files it gets. A file
+that can't be processed doesn't stop the others; its error ends up in its
+`FileResult`. `engine`, and with it PyPDF2, is only imported once a batch runs.
+'''
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from settings import BATCH_FILE_RESULT, BATCH_SUMMARY
+from doccache import document_cache
+
+
+def _no_progress(done, total=None):
+    pass
+
+
+class FileResult:
+    '''Outcome of one file of a batch.
+
+    Attributes:
+        filepath (str): Path of the input file
+        output_filepath (str): Path of the output file
+        pages (int): Pages of the input, None if it couldn't be read
+        seconds (float): Time it took to process the file
+        error (str): What went wrong, None if the file was processed
+    '''
+
+    __slots__ = ('filepath', 'output_filepath', 'pages', 'seconds', 'error')
+
+    def __init__(self, filepath, output_filepath, pages=None, seconds=0.0, error=None):
+        self.filepath = filepath
+        self.output_filepath = output_filepath
+        self.pages = pages
+        self.seconds = seconds
+        self.error = error
+
+    def __str__(self):
+        if self.error is not None:
+            return f'{self.filepath}: {self.error}'
+        return BATCH_FILE_RESULT.format(self.output_filepath, self.pages, self.seconds)
+
+
+class BatchReport:
+    '''Results of all files of a batch, in the order of the inputs.
+
+    Attributes:
+        results (list): One `FileResult` per input
+        seconds (float): Wall time of the whole batch
+    '''
+
+    def __init__(self, results, seconds):
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def failed(self):
+        '''list: Results of the files that couldn't be processed'''
+        return [result for result in self.results if result.error is not None]
+
+    @property
+    def pages(self):
+        '''int: Pages of all files that were processed'''
+        return sum(result.pages for result in self.results if result.error is None)
+
+    @property
+    def pages_per_second(self):
+        '''float: Pages processed per second of wall time'''
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    def totals(self):
+        '''str: One line with the number of files, failures, pages and the throughput'''
+        return BATCH_SUMMARY.format(files=len(self.results), failed=len(self.failed),
+                                    pages=self.pages, seconds=self.seconds, pages_per_second=self.pages_per_second)
+
+    def summary(self):
+        '''str: One line per file followed by the totals'''
+        return '\n'.join([str(result) for result in self.results] + [self.totals()])
+
+
+def _run_file(operation, filepath, output_filepath, *args, **kwargs):
+    '''Run an engine operation on one file and record how it went.'''
+    start = time.perf_counter()
+    try:
+        pages = document_cache.pages(filepath)
+        operation(filepath, output_filepath, *args, **kwargs)
+    except Exception as e:
+        return FileResult(filepath, output_filepath, seconds=time.perf_counter() - start, error=str(e) or repr(e))
+    return FileResult(filepath, output_filepath, pages=pages, seconds=time.perf_counter() - start)
+
+
+# reader of the stamp in a worker process, parsed by `_init_stamp_worker` before the first file
+_stamp_reader = None
+
+
+def _init_stamp_worker(stamp_filepath):
+    global _stamp_reader
+    _stamp_reader = document_cache.open_reader(stamp_filepath) if stamp_filepath is not None else None
+
+
+def _stamp(filepath, output_filepath, **kwargs):
+    from engine import stamp_with_reader
+    stamp_with_reader(filepath, _stamp_reader, output_filepath, **kwargs)
+
+
+def _rotate(filepath, output_filepath, page_range, degrees, **kwargs):
+    from engine import rotate_pdf
+    # the same range for files of different lengths, cut to every file
+    start, stop = page_range
+    pages = document_cache.pages(filepath)
+    rotate_pdf(filepath, output_filepath, (start, pages if stop is None else min(stop, pages)), degrees, **kwargs)
+
+
+def _run_batch(operation, pairs, args, kwargs, workers, progress, initializer=None, initargs=()):
+    '''Run an operation over all pairs on a process pool and collect the results.
+
+    Progress is reported in pages after every file. Raising from `progress` drops the
+    files that haven't been started yet.
+    '''
+    pairs = list(pairs)
+    start = time.perf_counter()
+    totals = {}
+    for filepath, _ in pairs:
+        try:
+            totals[filepath] = document_cache.pages(filepath)
+        except Exception:
+            totals[filepath] = 0
+    total = sum(totals.values())
+    results = [None] * len(pairs)
+    done = 0
+    workers = min(workers or os.cpu_count() or 1, len(pairs)) or 1
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for n, (filepath, output_filepath) in enumerate(pairs):
+            results[n] = _run_file(operation, filepath, output_filepath, *args, **kwargs)
+            done += totals[filepath]
+            progress(done, total)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+            futures = {executor.submit(_run_file, operation, filepath, output_filepath, *args, **kwargs): n
+                       for n, (filepath, output_filepath) in enumerate(pairs)}
+            try:
+                for future in as_completed(futures):
+                    n = futures[future]
+                    results[n] = future.result()
+                    done += totals[pairs[n][0]]
+                    progress(done, total)
+            except BaseException:
+                executor.shutdown(cancel_futures=True)
+                raise
+    return BatchReport(results, time.perf_counter() - start)
+
+
+def batch_rotate(pairs, page_range, degrees, extract_pages=False, incremental=False, compress_level=None,
+                 workers=0, progress=_no_progress):
+    '''Rotate the same range of pages of many files clockwise.
+
+    Args:
+        pairs (iterable): `(input path, output path)` tuples
+        page_range (tuple): Zero-based `(start, stop)` of the pages to rotate in every
+            file, `stop` may be None for the last page and is cut to shorter files
+        degrees (int): Clockwise rotation, a multiple of 90 (see `ROTATE_DEGREES`)
+        extract_pages (bool): Leave out all pages outside of `page_range` (default: False)
+        incremental (bool): Append incremental updates, see `engine.rotate_pdf` (default: False)
+        compress_level (int): zlib level to optimize the output with (default: None)
+        workers (int): Number of processes; 0 or None uses every core (default: 0)
+        progress (callable): Called with `(done, total)` pages after every file. May
+            raise to abort the batch (default: no progress reporting)
+
+    Returns:
+        BatchReport: Per-file results and totals
+    '''
+    return _run_batch(_rotate, pairs, (page_range, degrees),
+                      {'extract_pages': extract_pages, 'incremental': incremental, 'compress_level': compress_level},
+                      workers, progress)
+
+
+def batch_stamp(pairs, stamp_filepath, command='BG', only_first_page=False, numbering=None, compress_level=None,
+                workers=0, progress=_no_progress):
+    '''Put the first page of one PDF behind or on top of the pages of many files.
+
+    Args:
+        pairs (iterable): `(input path, output path)` tuples
+        stamp_filepath (str): Path to PDF File whose first page is the stamp/background,
+            None to only number the pages
+        command (str): `'STAMP'` or `'BG'`, see `engine.stamp_pdf` (default: `'BG'`)
+        only_first_page (bool): Only stamp the first page of every file (default: False)
+        numbering (PageNumberer): Number the pages of every file, see `numbering` (default: None)
+        compress_level (int): zlib level to optimize the output with (default: None)
+        workers (int): Number of processes; 0 or None uses every core (default: 0)
+        progress (callable): Called with `(done, total)` pages after every file. May
+            raise to abort the batch (default: no progress reporting)
+
+    Returns:
+        BatchReport: Per-file results and totals
+    '''
+    return _run_batch(_stamp, pairs, (),
+                      {'command': command, 'only_first_page': only_first_page, 'numbering': numbering,
+                       'compress_level': compress_level},
+                      workers, progress, initializer=_init_stamp_worker, initargs=(stamp_filepath,))
@@ -0,0 +1,84 @@
+'''Compare the backends per operation and input size.
+
+Usage:
+    python benchmarks/bench_backends.py [--sizes 10 100 1000] [--repeat N]
+
+Joins three generated text PDFs of every size into one and splits one of them
+into single pages, once per backend. Backends whose tools are not installed are
+reported as such. Every run starts from a fresh document cache, so page counting
+and parsing are part of the measurement.
+'''
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from corpus import make_pdf
+from backends import POPPLER, PYPDF2, Unsupported
+from doccache import document_cache
+
+TOOLS = {'join': 'pdfunite', 'split': 'pdfseparate'}
+
+
+def run_case(backend, operation, filepaths, workdir):
+    '''Time one operation of a backend in a scratch directory.
+
+    Returns:
+        float: Wall time in seconds
+    '''
+    document_cache.invalidate()
+    if operation == 'join':
+        start = time.perf_counter()
+        backend.join([(filepath, None) for filepath in filepaths], os.path.join(workdir, 'joined.pdf'))
+        return time.perf_counter() - start
+    filepath = shutil.copy(filepaths[0], workdir)
+    start = time.perf_counter()
+    backend.split(filepath)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help='pages per input file')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, the fastest is kept (default: 3)')
+    args = parser.parse_args(argv)
+
+    print(f'{"operation":<10} {"pages":>6} {PYPDF2.name + " s":>10} {POPPLER.name + " s":>10} {"faster":>8}')
+    with tempfile.TemporaryDirectory(prefix='pypdfbuilder-backends-') as directory:
+        for pages in args.sizes:
+            filepaths = [os.path.join(directory, f'{pages}-{n}.pdf') for n in range(3)]
+            for seed, filepath in enumerate(filepaths):
+                make_pdf(filepath, pages, seed=seed)
+            for operation, tool in TOOLS.items():
+                timings = {}
+                for backend in (PYPDF2, POPPLER):
+                    seconds = []
+                    try:
+                        if backend is POPPLER:
+                            backend.tool(tool)
+                        for _ in range(args.repeat):
+                            with tempfile.TemporaryDirectory(dir=directory) as workdir:
+                                seconds.append(run_case(backend, operation, filepaths, workdir))
+                    except Unsupported:
+                        continue
+                    timings[backend.name] = min(seconds)
+                columns = [f'{timings[b.name]:>10.3f}' if b.name in timings else f'{"n/a":>10}'
+                           for b in (PYPDF2, POPPLER)]
+                faster = min(timings, key=timings.get) if len(timings) > 1 else ''
+                print(f'{operation:<10} {pages * (3 if operation == "join" else 1):>6} {" ".join(columns)} '
+                      f'{faster:>8}')
+    try:
+        POPPLER.tool('pdfunite')
+        POPPLER.tool('pdfseparate')
+    except Unsupported as exception:
+        print(f'n/a: {exception}, install Poppler to compare')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+'''Stamp a folder of files one by one and as a batch on a pool of processes.
+
+Usage:
+    python benchmarks/bench_batch.py [--files 24] [--pages 50] [--workers 0]
+
+Generates `--files` documents and a stamp into a temporary directory and stamps them
+three ways: with `stamp_pdf` per file, which parses the stamp for every file, with
+`batch_stamp` in a single process, which parses it once, and with `batch_stamp` on
+`--workers` processes (0 uses every core), which parses it once per process.
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from corpus import make_pdf
+from batch import batch_stamp
+from doccache import document_cache
+from engine import stamp_pdf
+
+
+def per_file(pairs, stamp_filepath):
+    for filepath, output_filepath in pairs:
+        stamp_pdf(filepath, stamp_filepath, output_filepath)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=24, help='number of generated files (default: 24)')
+    parser.add_argument('--pages', type=int, default=50, help='pages per file (default: 50)')
+    parser.add_argument('--workers', type=int, default=0, help='processes of the parallel batch (default: 0)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='pypdfbuilder-batch-') as directory:
+        stamp_filepath = os.path.join(directory, 'stamp.pdf')
+        make_pdf(stamp_filepath, 1, label='CONFIDENTIAL', profile='image')
+        pairs = []
+        for n in range(args.files):
+            filepath = os.path.join(directory, f'input-{n}.pdf')
+            make_pdf(filepath, args.pages, label=f'Document {n}', profile='mixed', seed=n)
+            pairs.append((filepath, os.path.join(directory, f'output-{n}.pdf')))
+        pages = args.files * args.pages
+        print(f'{"run":<24} {"seconds":>9} {"pages/s":>9}')
+        for name, run in (('stamp_pdf per file', lambda: per_file(pairs, stamp_filepath)),
+                          ('batch, in-process', lambda: batch_stamp(pairs, stamp_filepath, workers=1)),
+                          (f'batch, {args.workers or os.cpu_count()} workers',
+                           lambda: batch_stamp(pairs, stamp_filepath, workers=args.workers))):
+            document_cache.invalidate()
+            start = time.perf_counter()
+            run()
+            seconds = time.perf_counter() - start
+            print(f'{name:<24} {seconds:>9.3f} {pages / seconds:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+'''Time the operations of the Join tab's list model on a long list.
+
+Usage:
+    python benchmarks/bench_joinlist.py [--entries 10000]
+
+Runs without Tk: it measures the model alone, which is all that saving and the
+bookkeeping of moving and removing rows cost on top of updating the changed rows.
+'''
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from joinlist import JoinList
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=10000, help='length of the list (default: 10000)')
+    args = parser.parse_args(argv)
+
+    join_list = JoinList()
+    seconds, entry_ids = timed(join_list.extend, (f'/scans/{n:05}.pdf' for n in range(args.entries)))
+    print(f'{"operation":<28} {"ms":>8} {"rows changed":>13}')
+    print(f'{"add":<28} {seconds * 1000:>8.2f} {len(entry_ids):>13}')
+    every_other = entry_ids[1::2]
+    last_tenth = entry_ids[-args.entries // 10:]
+    for name, func, selection in (
+            ('move up, every other entry', join_list.move_up, every_other),
+            ('move down, every other entry', join_list.move_down, every_other),
+            ('move up, last tenth', join_list.move_up, last_tenth)):
+        seconds, changed = timed(func, selection)
+        print(f'{name:<28} {seconds * 1000:>8.2f} {len(changed):>13}')
+    seconds, entries = timed(join_list.entries)
+    print(f'{"entries to save":<28} {seconds * 1000:>8.2f} {"":>13}')
+    seconds, _ = timed(join_list.remove, every_other)
+    print(f'{"remove every other entry":<28} {seconds * 1000:>8.2f} {len(every_other):>13}')
+
+
+if __name__ == '__main__':
+    main()
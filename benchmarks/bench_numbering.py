@@ -0,0 +1,46 @@
+'''Measure what numbering the pages of a long document costs.
+
+Usage:
+    python benchmarks/bench_numbering.py [--pages 10000] [--format "Page {page} of {pages}"]
+
+Generates a text PDF with `--pages` pages, writes it once without changes and once
+with page numbers, and prints the time and the bytes every numbered page added.
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from corpus import make_pdf
+from engine import stamp_pdf
+from numbering import PageNumberer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=10000, help='pages of the generated file (default: 10000)')
+    parser.add_argument('--format', default='Page {page} of {pages}', help='page number format')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='pypdfbuilder-numbering-') as directory:
+        filepath = os.path.join(directory, 'document.pdf')
+        make_pdf(filepath, args.pages)
+        print(f'{"run":<10} {"seconds":>9} {"bytes":>12} {"bytes/page":>11}')
+        sizes = {}
+        for name, numbering in (('plain', None), ('numbered', PageNumberer(args.format))):
+            output_filepath = os.path.join(directory, f'{name}.pdf')
+            start = time.perf_counter()
+            stamp_pdf(filepath, None, output_filepath, numbering=numbering)
+            seconds = time.perf_counter() - start
+            sizes[name] = os.path.getsize(output_filepath)
+            added = (sizes[name] - sizes['plain']) / args.pages
+            print(f'{name:<10} {seconds:>9.3f} {sizes[name]:>12} {added:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
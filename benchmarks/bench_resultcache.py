@@ -0,0 +1,48 @@
+'''Join the same files again with and without the result cache.
+
+Usage:
+    python benchmarks/bench_resultcache.py [--files 10] [--pages 200]
+
+Generates `--files` text PDFs with `--pages` pages each and joins them without a
+cache, into an empty result cache and again from it, once served as a copy and once
+as a hardlink, and prints the time of each run.
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from corpus import make_pdf
+from backends import join_pdfs
+from resultcache import ResultCache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=10, help='number of files to join (default: 10)')
+    parser.add_argument('--pages', type=int, default=200, help='pages per file (default: 200)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='pypdfbuilder-resultcache-') as directory:
+        entries = []
+        for n in range(args.files):
+            filepath = os.path.join(directory, f'part-{n}.pdf')
+            make_pdf(filepath, args.pages, label=f'Part {n}', seed=n)
+            entries.append((filepath, None))
+        copying = ResultCache(os.path.join(directory, 'results'))
+        linking = ResultCache(os.path.join(directory, 'results'), link=True)
+        print(f'{"run":<16} {"seconds":>9}')
+        for name, cache in (('no cache', None), ('miss', copying), ('hit, copy', copying), ('hit, hardlink', linking)):
+            output_filepath = os.path.join(directory, f'{name.replace(" ", "").replace(",", "-")}.pdf')
+            start = time.perf_counter()
+            join_pdfs(entries, output_filepath, result_cache=cache)
+            print(f'{name:<16} {time.perf_counter() - start:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
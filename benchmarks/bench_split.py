@@ -0,0 +1,49 @@
+'''Split a long document into single pages, into parts and into a ZIP archive.
+
+Usage:
+    python benchmarks/bench_split.py [--pages 5000] [--every 500]
+
+Generates a text PDF with `--pages` pages and splits it into single pages, into parts
+of `--every` pages and into such parts streamed into a ZIP archive, and prints the
+time, the number of files written and their total size for each.
+'''
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from corpus import make_pdf
+from engine import split_pdf
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=5000, help='pages of the generated file (default: 5000)')
+    parser.add_argument('--every', type=int, default=500, help='pages per part (default: 500)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='pypdfbuilder-split-') as directory:
+        filepath = os.path.join(directory, 'document.pdf')
+        make_pdf(filepath, args.pages)
+        print(f'{"run":<16} {"seconds":>9} {"files":>7} {"bytes":>12}')
+        workdir = os.path.join(directory, 'out')
+        for name, options in (('single pages', {}), (f'every {args.every}', {'every': args.every}),
+                              ('zip archive', {'every': args.every, 'archive': os.path.join(workdir, 'parts.zip')})):
+            os.makedirs(workdir)
+            start = time.perf_counter()
+            split_pdf(shutil.copy(filepath, workdir), **options)
+            seconds = time.perf_counter() - start
+            os.remove(os.path.join(workdir, 'document.pdf'))
+            outputs = [os.path.join(workdir, f) for f in os.listdir(workdir)]
+            print(f'{name:<16} {seconds:>9.3f} {len(outputs):>7} {sum(map(os.path.getsize, outputs)):>12}')
+            shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+'''Compare the parse-once stamping engine against the old per-page merge path.
+
+Usage:
+    python benchmarks/bench_stamp.py [--pages N] [--command STAMP|BG]
+
+Both a source document and a stamp are generated into a temporary directory, so
+the benchmark runs offline and always measures the same input.
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from PyPDF2 import PdfFileReader, PdfFileWriter
+
+from corpus import make_pdf
+from engine import stamp_pdf
+
+
+def legacy_stamp_pdf(source_filepath, stamp_filepath, output_filepath, command='BG', only_first_page=False):
+    '''The stamping loop `BgTabManager.save_as` used before the engine existed.'''
+    out_pdf = PdfFileWriter()
+    with open(source_filepath, 'rb') as source_pdf_stream, open(stamp_filepath, 'rb') as bg_pdf_stream:
+        for p in range(PdfFileReader(source_pdf_stream).getNumPages()):
+            source_pdf = PdfFileReader(source_pdf_stream)
+            bg_pdf = PdfFileReader(bg_pdf_stream)
+            if not only_first_page or p < 1:
+                if command == 'STAMP':
+                    top_page = bg_pdf.getPage(0)
+                    bottom_page = source_pdf.getPage(p)
+                else:
+                    top_page = source_pdf.getPage(p)
+                    bottom_page = bg_pdf.getPage(0)
+                bottom_page.mergePage(top_page)
+            else:
+                bottom_page = source_pdf.getPage(p)
+            out_pdf.addPage(bottom_page)
+        with open(output_filepath, 'wb') as out_pdf_stream:
+            out_pdf.write(out_pdf_stream)
+
+
+def run(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=500, help='number of pages to stamp (default: 500)')
+    parser.add_argument('--command', choices=('STAMP', 'BG'), default='STAMP')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source_filepath = os.path.join(tmpdir, 'source.pdf')
+        stamp_filepath = os.path.join(tmpdir, 'stamp.pdf')
+        make_pdf(source_filepath, args.pages, 'Page')
+        make_pdf(stamp_filepath, 1, 'CONFIDENTIAL')
+
+        print(f'{"path":<8} {"pages":>6} {"seconds":>9} {"output bytes":>13}')
+        for label, func in (('legacy', legacy_stamp_pdf), ('engine', stamp_pdf)):
+            output_filepath = os.path.join(tmpdir, f'{label}.pdf')
+            seconds = run(func, source_filepath, stamp_filepath, output_filepath, command=args.command)
+            print(f'{label:<8} {args.pages:>6} {seconds:>9.3f} {os.path.getsize(output_filepath):>13}')
+
+
+if __name__ == '__main__':
+    main()
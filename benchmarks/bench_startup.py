@@ -0,0 +1,69 @@
+'''Measure how long the application and the command line interface take to start.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat N]
+
+Every measurement runs in a fresh interpreter. `import` is the time the import of
+`pypdfbuilder` takes as measured by the module itself, `process` the wall time of
+the whole interpreter run. The window is only opened if a display is available;
+it quits on its own once the main loop is idle (see `STARTUP_TIMING_VARIABLE`).
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from settings import STARTUP_TIMING_VARIABLE
+
+
+def run(args, env=None):
+    '''Run the interpreter with `args` in the repository root.
+
+    Returns:
+        tuple: Wall time in seconds and everything written to stdout and stderr
+    '''
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable] + args, cwd=ROOT, env=env, check=True, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, universal_newlines=True)
+    return time.perf_counter() - start, completed.stdout
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement, the fastest is kept (default: 5)')
+    args = parser.parse_args(argv)
+
+    cases = {
+        'import pypdfbuilder': (['-c', 'import pypdfbuilder; print(pypdfbuilder.IMPORT_SECONDS)'], None),
+        'import engine': (['-c', 'import engine'], None),
+        'cli --version': (['cli.py', '--version'], None),
+    }
+    if os.environ.get('DISPLAY') or sys.platform in ('win32', 'darwin'):
+        cases['application window'] = (['pypdfbuilder.py'], dict(os.environ, **{STARTUP_TIMING_VARIABLE: 'exit'}))
+
+    print(f'{"case":<20} {"process s":>10} {"import s":>9} {"window s":>9}')
+    for case, (case_args, env) in cases.items():
+        process, imported, window = [], [], []
+        for _ in range(args.repeat):
+            seconds, output = run(case_args, env=env)
+            process.append(seconds)
+            last_line = output.strip().splitlines()[-1] if output.strip() else ''
+            if case == 'import pypdfbuilder':
+                imported.append(float(last_line))
+            elif case == 'application window':
+                timing = json.loads(last_line)
+                imported.append(timing['import_seconds'])
+                window.append(timing['startup_seconds'])
+        imported = f'{min(imported):.3f}' if imported else ''
+        window = f'{min(window):.3f}' if window else ''
+        print(f'{case:<20} {min(process):>10.3f} {imported:>9} {window:>9}')
+
+
+if __name__ == '__main__':
+    main()
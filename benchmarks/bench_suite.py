@@ -0,0 +1,206 @@
+'''Time join, split, rotate and stamp on a synthetic corpus and compare against a baseline.
+
+Usage:
+    python benchmarks/bench_suite.py [--corpus DIR] [--pages N] [--files N] [--repeat N]
+                                     [--only CASE ...] [--baseline FILE] [--save-baseline]
+
+The corpus from `corpus.py` is generated on first use and reused afterwards. Every
+case runs in a fresh interpreter, so its peak resident set size is not inflated by
+the cases before it. Wall time, peak RSS and output size of each case are printed
+and checked against the stored baseline; the exit status is 1 if any of them got
+worse by more than its threshold.
+
+Wall times are only comparable on the same machine, so after a hardware change
+re-record the baseline with `--save-baseline` before relying on the time check.
+'''
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from corpus import make_corpus
+
+CASES = ('join', 'join-dedup', 'split', 'rotate', 'rotate-incremental', 'stamp', 'stamp-optimized')
+METRICS = ('seconds', 'peak_rss_mb', 'output_bytes')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_CORPUS = os.path.join(tempfile.gettempdir(), 'pypdfbuilder-bench-corpus')
+
+
+def run_case(case, corpus, workdir):
+    '''Run a single case in this process.
+
+    Args:
+        case (str): One of `CASES`
+        corpus (dict): Corpus as returned by `make_corpus()`
+        workdir (str): Empty directory outputs are written to
+
+    Returns:
+        list: Paths of all files the case wrote
+    '''
+    # imported here, so that the parent process never loads PyPDF2 documents
+    from engine import join_pdfs, rotate_pdf, split_pdf, stamp_pdf
+    from settings import COMPRESS_LEVEL
+
+    filepaths = [filepath for profile in ('text', 'image', 'mixed') for filepath in corpus[profile]]
+    if case in ('join', 'join-dedup'):
+        output_filepath = os.path.join(workdir, 'joined.pdf')
+        join_pdfs([(filepath, None) for filepath in filepaths], output_filepath, deduplicate=case == 'join-dedup')
+        return [output_filepath]
+    if case == 'split':
+        outputs = []
+        for filepath in filepaths:
+            # split writes next to its input, so it gets a copy of its own
+            outputs.extend(split_pdf(shutil.copy(filepath, workdir)))
+        return outputs
+    outputs = [os.path.join(workdir, os.path.basename(filepath)) for filepath in filepaths]
+    if case in ('rotate', 'rotate-incremental'):
+        from doccache import document_cache
+        for filepath, output_filepath in zip(filepaths, outputs):
+            rotate_pdf(filepath, output_filepath, (0, document_cache.pages(filepath)), 90,
+                       incremental=case == 'rotate-incremental')
+        return outputs
+    if case in ('stamp', 'stamp-optimized'):
+        for filepath, output_filepath in zip(filepaths, outputs):
+            stamp_pdf(filepath, corpus['stamp'], output_filepath, command='STAMP',
+                      compress_level=COMPRESS_LEVEL if case == 'stamp-optimized' else None)
+        return outputs
+    raise ValueError(f'unknown case {case}')
+
+
+def peak_rss_mb():
+    '''Peak resident set size of this process in MB.'''
+    # Linux carries ru_maxrss over from the parent across exec, VmHWM starts afresh
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def measure(case, corpus_dir, pages, files, seed):
+    '''Run a case in a child interpreter and collect its metrics.
+
+    Returns:
+        dict: `seconds`, `peak_rss_mb` and `output_bytes` of the case
+    '''
+    with tempfile.TemporaryDirectory() as workdir:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--case', case, '--corpus', corpus_dir, '--workdir', workdir,
+             '--pages', str(pages), '--files', str(files), '--seed', str(seed)],
+            check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def compare(results, baseline, thresholds, slack):
+    '''Find the metrics that got worse than the baseline allows.
+
+    Args:
+        results (dict): Metrics by case
+        baseline (dict): Metrics by case of the baseline
+        thresholds (dict): Allowed relative increase by metric
+        slack (dict): Absolute increase by metric that is never reported, to ignore timer noise
+
+    Returns:
+        list: Descriptions of the regressions
+    '''
+    regressions = []
+    for case, metrics in results.items():
+        if case not in baseline:
+            continue
+        for metric in METRICS:
+            before, after = baseline[case][metric], metrics[metric]
+            if before and after > before * (1 + thresholds[metric]) and after - before > slack.get(metric, 0):
+                regressions.append(f'{case}: {metric} {before:.6g} -> {after:.6g} '
+                                   f'(+{(after / before - 1) * 100:.1f}%, threshold {thresholds[metric] * 100:.0f}%)')
+    return regressions
+
+
+def print_table(results, baseline):
+    print(f'{"case":<20} {"seconds":>9} {"peak MB":>9} {"output bytes":>13}  {"vs. baseline":<}')
+    for case, metrics in results.items():
+        change = ''
+        if case in baseline:
+            change = ' '.join(
+                f'{(metrics[m] / baseline[case][m] - 1) * 100:+.1f}%' if baseline[case][m] else 'n/a' for m in METRICS)
+        print(f'{case:<20} {metrics["seconds"]:>9.3f} {metrics["peak_rss_mb"]:>9.1f} '
+              f'{metrics["output_bytes"]:>13}  {change}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='corpus directory (default: %(default)s)')
+    parser.add_argument('--pages', type=int, default=100, help='pages per corpus document (default: 100)')
+    parser.add_argument('--files', type=int, default=3, help='corpus documents per profile (default: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='corpus random seed (default: 0)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per case, the fastest time and largest RSS are kept (default: 3)')
+    parser.add_argument('--only', nargs='+', choices=CASES, metavar='CASE', help='cases to run (default: all)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--max-time', type=float, default=0.25,
+                        help='allowed relative increase of wall time (default: 0.25)')
+    parser.add_argument('--max-rss', type=float, default=0.20,
+                        help='allowed relative increase of peak RSS (default: 0.20)')
+    parser.add_argument('--max-size', type=float, default=0.05,
+                        help='allowed relative increase of output size (default: 0.05)')
+    parser.add_argument('--min-time-delta', type=float, default=0.25,
+                        help='seconds a case may always get slower, to ignore timer noise (default: 0.25)')
+    parser.add_argument('--case', choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    corpus = make_corpus(args.corpus, args.pages, args.files, args.seed)
+    if args.case:
+        start = time.perf_counter()
+        outputs = run_case(args.case, corpus, args.workdir)
+        seconds = time.perf_counter() - start
+        print(json.dumps({'seconds': seconds, 'peak_rss_mb': peak_rss_mb(),
+                          'output_bytes': sum(os.path.getsize(f) for f in outputs)}))
+        return 0
+
+    corpus_params = {'pages': args.pages, 'files': args.files, 'seed': args.seed}
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            stored = json.load(baseline_file)
+        if stored['corpus'] == corpus_params:
+            baseline = stored['results']
+        else:
+            print(f'baseline was recorded on a different corpus {stored["corpus"]}, not comparing', file=sys.stderr)
+
+    results = {}
+    for case in args.only or CASES:
+        runs = [measure(case, args.corpus, args.pages, args.files, args.seed) for _ in range(args.repeat)]
+        results[case] = {'seconds': min(r['seconds'] for r in runs),
+                         'peak_rss_mb': max(r['peak_rss_mb'] for r in runs),
+                         'output_bytes': max(r['output_bytes'] for r in runs)}
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump({'corpus': corpus_params, 'results': results}, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        return 0
+    regressions = compare(results, baseline, {'seconds': args.max_time, 'peak_rss_mb': args.max_rss,
+                                              'output_bytes': args.max_size},
+                          {'seconds': args.min_time_delta})
+    for regression in regressions:
+        print(f'REGRESSION {regression}', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
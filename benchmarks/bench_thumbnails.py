@@ -0,0 +1,55 @@
+'''Measure how fast thumbnails come back cold, from memory and from disk.
+
+Usage:
+    python benchmarks/bench_thumbnails.py [--pages 1000] [--strip 40]
+
+Generates a text PDF with `--pages` pages and asks for the thumbnails of the first
+`--strip` pages three times: rendered by `pdftoppm` into an empty cache, from the
+memory of the same cache, and from disk by a new cache, as after reopening the file
+in a new session. Needs Poppler's `pdftoppm`.
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from corpus import make_pdf
+from backends import POPPLER, Unsupported
+from thumbnails import ThumbnailCache
+
+
+def timed(cache, filepath, pages):
+    start = time.perf_counter()
+    images = cache.thumbnails(filepath, pages)
+    return time.perf_counter() - start, len(images)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=1000, help='pages of the generated file (default: 1000)')
+    parser.add_argument('--strip', type=int, default=40, help='thumbnails asked for (default: 40)')
+    args = parser.parse_args(argv)
+
+    try:
+        POPPLER.tool('pdftoppm')
+    except Unsupported as exception:
+        sys.exit(f'{exception}, install Poppler to run this benchmark')
+    with tempfile.TemporaryDirectory(prefix='pypdfbuilder-thumbnails-') as directory:
+        filepath = os.path.join(directory, 'document.pdf')
+        make_pdf(filepath, args.pages)
+        cache_directory = os.path.join(directory, 'cache')
+        pages = range(min(args.strip, args.pages))
+        cache = ThumbnailCache(cache_directory)
+        print(f'{"source":<8} {"thumbnails":>10} {"seconds":>9}')
+        for source, run_cache in (('render', cache), ('memory', cache), ('disk', ThumbnailCache(cache_directory))):
+            seconds, thumbnails = timed(run_cache, filepath, pages)
+            print(f'{source:<8} {thumbnails:>10} {seconds:>9.4f}')
+
+
+if __name__ == '__main__':
+    main()
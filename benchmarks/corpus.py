@@ -0,0 +1,173 @@
+'''Deterministic synthetic PDF corpus for the benchmarks.
+
+Usage:
+    python benchmarks/corpus.py DIRECTORY [--pages N] [--files N] [--seed N]
+
+Every document is generated from a seeded random number generator, so the same
+arguments always produce byte-identical files, without network access or any
+external tools. Three page profiles are available:
+
+* `text`: forty lines of text per page, set in fonts shared by all pages
+* `image`: one Flate compressed RGB image per page plus a caption
+* `mixed`: alternating text and image pages
+
+All pages of all documents draw the same vector logo Form XObject and use the same
+font dictionaries, which is what documents made by the same generator look like.
+'''
+
+import argparse
+import os
+import random
+import sys
+import zlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from PyPDF2 import PdfFileWriter
+from PyPDF2.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, EncodedStreamObject, FloatObject,
+                            NameObject, NumberObject)
+
+PROFILES = ('text', 'image', 'mixed')
+FONTS = {'/F1': '/Helvetica', '/F2': '/Times-Roman', '/F3': '/Courier'}
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore '
+         'et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip '
+         'ex ea commodo consequat duis aute irure in reprehenderit voluptate velit esse cillum').split()
+IMAGE_SIZE = 256
+LOGO_SEED = 4711
+GRADIENT_ROWS = [bytes(c for x in range(IMAGE_SIZE) for c in ((x + y) & 0xFF, 128, 255 - ((x + y) & 0xFF)))
+                 for y in range(256)]
+LOW_NIBBLE = bytes(b & 0x0F for b in range(256))
+
+
+def _logo(rng):
+    '''Content of a vector logo: a few hundred random bezier curves.'''
+    ops = []
+    for _ in range(400):
+        points = ' '.join(f'{rng.uniform(0, 100):.2f}' for _ in range(8))
+        x0, y0, x1, y1, x2, y2, x3, y3 = points.split()
+        ops.append(f'{x0} {y0} m {x1} {y1} {x2} {y2} {x3} {y3} c S')
+    return ('0.2 0.3 0.6 RG 0.5 w\n' + '\n'.join(ops)).encode()
+
+
+def _image(rng):
+    '''A compressible RGB image: a diagonal gradient with a bit of noise.'''
+    shift = rng.randrange(256)
+    rows = []
+    for y in range(IMAGE_SIZE):
+        row = GRADIENT_ROWS[(y + shift) & 0xFF]
+        noise = rng.randbytes(len(row)).translate(LOW_NIBBLE)
+        rows.append((int.from_bytes(row, 'big') ^ int.from_bytes(noise, 'big')).to_bytes(len(row), 'big'))
+    image = EncodedStreamObject()
+    image._data = zlib.compress(b''.join(rows))
+    image.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Image'),
+        NameObject('/Width'): NumberObject(IMAGE_SIZE),
+        NameObject('/Height'): NumberObject(IMAGE_SIZE),
+        NameObject('/ColorSpace'): NameObject('/DeviceRGB'),
+        NameObject('/BitsPerComponent'): NumberObject(8),
+        NameObject('/Filter'): NameObject('/FlateDecode'),
+    })
+    return image
+
+
+def _text(rng, label, page):
+    lines = [f'BT /F1 18 Tf 72 740 Td ({label} {page}) Tj ET']
+    for line in range(40):
+        font = ('/F1', '/F2', '/F3')[line % 3]
+        words = ' '.join(rng.choice(WORDS) for _ in range(12))
+        lines.append(f'BT {font} 10 Tf 72 {710 - line * 16} Td ({words}) Tj ET')
+    return lines
+
+
+def make_pdf(filepath, pages, label='Page', profile='text', seed=0):
+    '''Write a synthetic PDF.
+
+    Args:
+        filepath (str): Path the PDF is written to
+        pages (int): Number of pages
+        label (str): Text shown at the top of every page, followed by the page number
+        profile (str): One of `PROFILES` (default: 'text')
+        seed (int): Seed for everything random in the document (default: 0)
+    '''
+    rng = random.Random(f'{seed}-{profile}-{label}')
+    out_pdf = PdfFileWriter()
+    fonts = DictionaryObject()
+    for name, base_font in FONTS.items():
+        fonts[NameObject(name)] = out_pdf._addObject(DictionaryObject({
+            NameObject('/Type'): NameObject('/Font'),
+            NameObject('/Subtype'): NameObject('/Type1'),
+            NameObject('/BaseFont'): NameObject(base_font),
+        }))
+    logo = DecodedStreamObject()
+    logo.setData(_logo(random.Random(LOGO_SEED)))
+    logo = logo.flateEncode()
+    logo.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Form'),
+        NameObject('/BBox'): ArrayObject(FloatObject(v) for v in (0, 0, 100, 100)),
+    })
+    logo = out_pdf._addObject(logo)
+
+    for p in range(pages):
+        page = out_pdf.addBlankPage(612, 792)
+        xobjects = DictionaryObject({NameObject('/Logo'): logo})
+        content = ['q 0.5 0 0 0.5 500 730 cm /Logo Do Q']
+        if profile == 'image' or (profile == 'mixed' and p % 2):
+            xobjects[NameObject('/Im0')] = out_pdf._addObject(_image(rng))
+            content.append('q 400 0 0 400 106 250 cm /Im0 Do Q')
+            content.append(f'BT /F1 18 Tf 72 700 Td ({label} {p + 1}) Tj ET')
+        else:
+            content.extend(_text(rng, label, p + 1))
+        stream = DecodedStreamObject()
+        stream.setData('\n'.join(content).encode())
+        page[NameObject('/Contents')] = out_pdf._addObject(stream)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): fonts,
+            NameObject('/XObject'): xobjects,
+        })
+    with open(filepath, 'wb') as out_pdf_stream:
+        out_pdf.write(out_pdf_stream)
+
+
+def make_corpus(directory, pages=100, files=3, seed=0):
+    '''Generate the benchmark corpus, unless it is already there.
+
+    Args:
+        directory (str): Directory the files are written to
+        pages (int): Pages per document (default: 100)
+        files (int): Documents per profile (default: 3)
+        seed (int): Seed for everything random in the corpus (default: 0)
+
+    Returns:
+        dict: Paths of the generated documents by profile, plus the one-page `stamp`
+    '''
+    os.makedirs(directory, exist_ok=True)
+    corpus = {}
+    for profile in PROFILES:
+        corpus[profile] = []
+        for n in range(files):
+            filepath = os.path.join(directory, f'{profile}-{pages}p-{seed}-{n + 1}.pdf')
+            if not os.path.exists(filepath):
+                make_pdf(filepath, pages, label=f'{profile} {n + 1}', profile=profile, seed=seed)
+            corpus[profile].append(filepath)
+    corpus['stamp'] = os.path.join(directory, f'stamp-{seed}.pdf')
+    if not os.path.exists(corpus['stamp']):
+        make_pdf(corpus['stamp'], 1, label='CONFIDENTIAL', seed=seed)
+    return corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', help='directory the corpus is written to')
+    parser.add_argument('--pages', type=int, default=100, help='pages per document (default: 100)')
+    parser.add_argument('--files', type=int, default=3, help='documents per profile (default: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    args = parser.parse_args(argv)
+    for profile, filepaths in make_corpus(args.directory, args.pages, args.files, args.seed).items():
+        for filepath in filepaths if isinstance(filepaths, list) else [filepaths]:
+            print(filepath)
+
+
+if __name__ == '__main__':
+    main()
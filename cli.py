@@ -0,0 +1,387 @@
+'''Command line interface of PyPDF Builder.
+
+Runs the same operations as the tabs of the application without Tk or Pygubu, which
+makes it usable on headless machines:
+
+    pypdfbuilder join -o joined.pdf cover.pdf report.pdf@1-3,7 appendix/
+    pypdfbuilder split scans/
+    pypdfbuilder split --every 500 --zip - archive.pdf > parts.zip
+    pypdfbuilder rotate --rotate RIGHT --from 2 --to 4 -d rotated/ scans/
+    pypdfbuilder rotate --rotate LEFT --from 3 --to 3 --in-place scan.pdf
+    pypdfbuilder stamp --stamp draft.pdf -d stamped/ reports/
+    pypdfbuilder stamp --stamp letterhead.pdf --background -j 0 -d stamped/ letters/
+    pypdfbuilder stamp --number 'Page {page} of {pages}' --number-position bottom-right -o numbered.pdf report.pdf
+    pypdfbuilder run monthly-packet.json
+    pypdfbuilder --cache run monthly-packet.json
+    pypdfbuilder --cache-dir /srv/results join -o joined.pdf cover.pdf report.pdf
+    pypdfbuilder watch hotfolders.json
+    pypdfbuilder --profile --trace join.json join -o joined.pdf scans/
+
+Wherever input files are expected, a directory stands for all PDF files in it, so a
+whole folder is processed in a single invocation of the interpreter.
+'''
+
+import argparse
+import os
+import re
+import sys
+from contextlib import nullcontext
+
+import appdirs
+
+from settings import (APPNAME, APPVERSION, COMPRESS_LEVEL, HOT_FOLDER_REPORT_INTERVAL, NUMBER_FONT_SIZE, NUMBER_FORMAT,
+                      NUMBER_POSITION, NUMBER_POSITIONS, ROTATE_DEGREES)
+from doccache import document_cache
+from backends import join_pdfs, rotate_pdf, split_pdf, stamp_pdf
+from batch import batch_rotate, batch_stamp
+from pageselect import PageSelectError, parse_page_select
+from hotfolder import HotFolderDaemon, load_config
+from numbering import PageNumberer
+from pipeline import load_manifest
+from resultcache import ResultCache
+from tracing import span, tracing
+
+RESULT_CACHE_DIR = os.path.join(appdirs.user_data_dir(APPNAME), 'results')
+PAGE_SELECT_SUFFIX = re.compile(r'^(?P<filepath>.+)@(?P<page_select>[\w\s,!-]+)$')
+
+
+class CommandError(Exception):
+    '''Raised for command line arguments that make no sense together.'''
+
+
+def expand_inputs(inputs):
+    '''Replace directories in a list of paths with the PDF files they contain.
+
+    Args:
+        inputs (list): Paths to PDF files or directories
+
+    Returns:
+        list: Paths to PDF files, directory contents in alphabetical order
+    '''
+    filepaths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            filepaths.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith('.pdf') and os.path.isfile(os.path.join(path, name))))
+        else:
+            filepaths.append(path)
+    return filepaths
+
+
+def output_paths(filepaths, output, output_dir):
+    '''Pair every input file with the path its result is written to.
+
+    Args:
+        filepaths (list): Paths to input PDF files
+        output (str): Output file, only allowed for a single input
+        output_dir (str): Directory results are written to under their input's name
+
+    Returns:
+        list: `(input path, output path)` tuples
+    '''
+    if output:
+        if len(filepaths) != 1:
+            raise CommandError('--output only works with a single input file, use --output-dir instead')
+        return [(filepaths[0], output)]
+    if not output_dir:
+        raise CommandError('either --output or --output-dir is required')
+    os.makedirs(output_dir, exist_ok=True)
+    return [(filepath, os.path.join(output_dir, os.path.basename(filepath))) for filepath in filepaths]
+
+
+def join_entry(path):
+    '''Split a join input like `report.pdf@1-3,7` into path and page selection.'''
+    match = PAGE_SELECT_SUFFIX.match(path)
+    if match and not os.path.exists(path):
+        # only the syntax can be checked before the file's page count is known
+        try:
+            parse_page_select(match['page_select'])
+        except PageSelectError as e:
+            raise CommandError(f'{path}: {e}')
+        return (match['filepath'], match['page_select'])
+    return (path, None)
+
+
+def result_cache(args):
+    '''The `ResultCache` asked for by --cache or --cache-dir, or None.'''
+    if args.cache_dir is not None:
+        return ResultCache(args.cache_dir)
+    return ResultCache(RESULT_CACHE_DIR) if args.cache else None
+
+
+def error_message(e):
+    '''One line describing why an input could not be processed.'''
+    if isinstance(e, (OSError, ValueError)) and str(e):
+        return str(e)
+    # damaged files make PyPDF2 fail in all kinds of ways, e.g. with a KeyError
+    return f'{type(e).__name__}: {e}' if str(e) else type(e).__name__
+
+
+def run_join(args):
+    entries = []
+    for path in args.inputs:
+        filepath, page_ranges = join_entry(path)
+        entries.extend((f, page_ranges) for f in expand_inputs([filepath]))
+    yield args.output, args.output, lambda: saved_bytes(join_pdfs(
+        entries, args.output, import_bookmarks=not args.no_bookmarks, deduplicate=args.deduplicate,
+        compress_level=args.compress_level, use_poppler_tools=args.poppler, result_cache=result_cache(args)))
+
+
+def saved_bytes(bytes_saved):
+    '''Note on the output of a deduplicating join, if it saved anything.'''
+    return f'{bytes_saved} bytes saved by deduplication' if bytes_saved else None
+
+
+def split_file(args, filepath, archive=None):
+    max_bytes = None if args.max_size is None else int(args.max_size * 1024 * 1024)
+    parts = split_pdf(filepath, workers=args.workers, compress_level=args.compress_level, every=args.every,
+                      bookmarks=args.bookmarks, max_bytes=max_bytes, archive=archive, use_poppler_tools=args.poppler)
+    if archive is not None or args.every != 1 or args.bookmarks or max_bytes is not None:
+        return f'{len(parts)} parts'
+    return None
+
+
+def run_split(args):
+    filepaths = expand_inputs(args.inputs)
+    if args.zip is None:
+        for filepath in filepaths:
+            yield filepath, filepath, lambda filepath=filepath: split_file(args, filepath)
+        return
+    if len(filepaths) != 1:
+        raise CommandError('--zip needs exactly one input file')
+    if args.zip == '-':
+        # the archive is the output, nothing else may go to stdout
+        args.quiet = True
+        yield filepaths[0], '-', lambda: split_file(args, filepaths[0], sys.stdout.buffer)
+    else:
+        yield filepaths[0], args.zip, lambda: split_file(args, filepaths[0], args.zip)
+
+
+def run_batch(args, run):
+    '''Run a batch, print a line per file and return the totals.
+
+    Raises:
+        ValueError: If any file of the batch failed, with the totals as message
+    '''
+    report = run()
+    for result in report.results:
+        if result.error is not None:
+            print(f'{APPNAME}: {result}', file=sys.stderr)
+        elif not args.quiet:
+            print(result)
+    if report.failed:
+        raise ValueError(report.totals())
+    return report.totals()
+
+
+def rotate_file(args, filepath, output_filepath):
+    stop = args.to_page if args.to_page is not None else document_cache.pages(filepath)
+    rotate_pdf(filepath, output_filepath, (args.from_page - 1, stop), ROTATE_DEGREES[args.rotate],
+               extract_pages=args.extract, incremental=args.incremental or args.in_place,
+               compress_level=args.compress_level, use_poppler_tools=args.poppler, result_cache=result_cache(args))
+
+
+def run_rotate(args):
+    filepaths = expand_inputs(args.inputs)
+    if args.in_place:
+        if args.output or args.output_dir or args.extract:
+            raise CommandError('--in-place cannot be combined with --output, --output-dir or --extract')
+        pairs = [(filepath, filepath) for filepath in filepaths]
+    else:
+        pairs = output_paths(filepaths, args.output, args.output_dir)
+    if args.jobs != 1:
+        destination = args.output or args.output_dir or ', '.join(args.inputs)
+        yield destination, destination, lambda: run_batch(
+            args, lambda: batch_rotate(
+                pairs, (args.from_page - 1, args.to_page), ROTATE_DEGREES[args.rotate], extract_pages=args.extract,
+                incremental=args.incremental or args.in_place, compress_level=args.compress_level,
+                workers=args.jobs))
+        return
+    for filepath, output_filepath in pairs:
+        yield filepath, output_filepath, lambda f=filepath, o=output_filepath: rotate_file(args, f, o)
+
+
+def page_numberer(args):
+    '''The `PageNumberer` asked for by the --number options, or None.'''
+    if args.number is None:
+        return None
+    try:
+        return PageNumberer(format=args.number, position=args.number_position, font_size=args.number_size,
+                            start=args.number_start)
+    except ValueError as e:
+        raise CommandError(str(e))
+
+
+def run_stamp(args):
+    if args.stamp is None and args.number is None:
+        raise CommandError('either --stamp or --number is required')
+    command = 'BG' if args.background else 'STAMP'
+    numbering = page_numberer(args)
+    pairs = output_paths(expand_inputs(args.inputs), args.output, args.output_dir)
+    if args.jobs != 1:
+        destination = args.output or args.output_dir
+        yield destination, destination, lambda: run_batch(
+            args, lambda: batch_stamp(pairs, args.stamp, command=command, only_first_page=args.first_page_only,
+                                      numbering=numbering, compress_level=args.compress_level, workers=args.jobs))
+        return
+    for filepath, output_filepath in pairs:
+        yield filepath, output_filepath, lambda f=filepath, o=output_filepath: stamp_pdf(
+            f, args.stamp, o, command=command, only_first_page=args.first_page_only, numbering=numbering,
+            compress_level=args.compress_level, use_poppler_tools=args.poppler, result_cache=result_cache(args))
+
+
+def run_manifests(args):
+    for manifest_filepath in args.manifests:
+        yield manifest_filepath, manifest_filepath, lambda m=manifest_filepath: run_manifest(m, result_cache(args))
+
+
+def run_manifest(manifest_filepath, result_cache=None):
+    pipeline, output_filepath = load_manifest(manifest_filepath)
+    return saved_bytes(pipeline.run(output_filepath, result_cache=result_cache))
+
+
+def run_watch(args):
+    rules, workers = load_config(args.config)
+    daemon = HotFolderDaemon(rules, workers=args.workers if args.workers is not None else workers,
+                             report_interval=args.report_interval, report=None if args.quiet else print,
+                             error=lambda line: print(f'{APPNAME}: {line}', file=sys.stderr))
+    yield args.config, args.config, lambda: daemon.run(once=args.once)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog=APPNAME, description='Join, split, rotate and stamp PDF files.')
+    parser.add_argument('--version', action='version', version=f'%(prog)s {APPVERSION}')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only report errors')
+    parser.add_argument('--poppler', action='store_true',
+                        help='join and split with the Poppler utilities pdfunite and pdfseparate where possible')
+    parser.add_argument('--cache', action='store_true',
+                        help='serve joins, rotations, stamps and manifests that ran before with the same inputs '
+                             'and options from a result cache')
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help=f'directory of the result cache, implies --cache (default: {RESULT_CACHE_DIR})')
+    parser.add_argument('--profile', action='store_true',
+                        help='print where the time went (parsing, page handling, writing) when done')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write a Chrome trace (chrome://tracing, ui.perfetto.dev) of the run to FILE')
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    subparsers.required = True
+
+    join = subparsers.add_parser('join', help='join PDF files into one')
+    join.add_argument('inputs', nargs='+', metavar='INPUT',
+                      help='PDF file, optionally with a page selection like file.pdf@1-3,7,end-9 '
+                           'or file.pdf@odd,!5, or directory')
+    join.add_argument('-o', '--output', required=True, help='joined PDF file')
+    join.add_argument('--no-bookmarks', action='store_true', help="don't carry over bookmarks")
+    join.add_argument('--dedup', dest='deduplicate', action='store_true',
+                      help='write fonts, images and other objects shared by the inputs only once')
+    join.set_defaults(func=run_join)
+
+    split = subparsers.add_parser('split', help='split PDF files into single pages or parts next to the originals')
+    split.add_argument('inputs', nargs='+', metavar='INPUT', help='PDF file or directory')
+    split.add_argument('-w', '--workers', type=int, default=0,
+                       help='number of worker processes per file, 0 uses every core (default: 0)')
+    parts = split.add_mutually_exclusive_group()
+    parts.add_argument('-n', '--every', type=int, default=1, metavar='N',
+                       help='write parts of N pages each (default: 1)')
+    parts.add_argument('--bookmarks', action='store_true', help='start a part at every top-level bookmark')
+    parts.add_argument('--max-size', type=float, metavar='MB',
+                       help='fill parts up to an estimated size of MB megabytes')
+    split.add_argument('-z', '--zip', metavar='ARCHIVE',
+                       help='stream all parts of a single input into the ZIP file ARCHIVE instead of writing '
+                            'files, - for stdout')
+    split.set_defaults(func=run_split)
+
+    rotate = subparsers.add_parser('rotate', help='rotate a range of pages')
+    rotate.add_argument('inputs', nargs='+', metavar='INPUT', help='PDF file or directory')
+    rotate.add_argument('-r', '--rotate', choices=sorted(ROTATE_DEGREES), default='RIGHT',
+                        help='direction to rotate the pages in (default: RIGHT)')
+    rotate.add_argument('--from', dest='from_page', type=int, default=1, help='first page to rotate (default: 1)')
+    rotate.add_argument('--to', dest='to_page', type=int, help='last page to rotate (default: last page)')
+    rotate.add_argument('--extract', action='store_true', help='leave out the pages that are not rotated')
+    rotate.add_argument('--incremental', action='store_true',
+                        help='append the rotated pages as an incremental update instead of rewriting the file')
+    rotate.add_argument('--in-place', action='store_true',
+                        help='append an incremental update to the input files themselves')
+    rotate.set_defaults(func=run_rotate)
+
+    stamp = subparsers.add_parser('stamp', help='put a stamp on top of or a background behind pages, number pages')
+    stamp.add_argument('inputs', nargs='+', metavar='INPUT', help='PDF file or directory')
+    stamp.add_argument('-s', '--stamp', help='PDF whose first page is the stamp/background')
+    stamp.add_argument('--background', action='store_true', help='put the stamp behind the page contents')
+    stamp.add_argument('--first-page-only', action='store_true', help='only stamp the first page')
+    stamp.add_argument('--number', nargs='?', const=NUMBER_FORMAT, metavar='FORMAT',
+                       help='number all pages in the same pass, {page} and {pages} in FORMAT are replaced by '
+                            'the number of the page and of the last page (default: %(const)s)')
+    stamp.add_argument('--number-position', choices=NUMBER_POSITIONS, default=NUMBER_POSITION,
+                       help='where the page numbers go (default: %(default)s)')
+    stamp.add_argument('--number-size', type=float, default=NUMBER_FONT_SIZE, metavar='POINTS',
+                       help='font size of the page numbers (default: %(default)s)')
+    stamp.add_argument('--number-start', type=int, default=1, metavar='N',
+                       help='number of the first page (default: %(default)s)')
+    stamp.set_defaults(func=run_stamp)
+
+    run = subparsers.add_parser('run', help='run JSON job manifests chaining join, rotate and stamp')
+    run.add_argument('manifests', nargs='+', metavar='MANIFEST', help='JSON job manifest, see pipeline.py')
+    run.set_defaults(func=run_manifests)
+
+    watch = subparsers.add_parser('watch', help='process every PDF dropped into the hot folders of a config')
+    watch.add_argument('config', metavar='CONFIG', help='JSON hot folder config, see hotfolder.py')
+    watch.add_argument('-w', '--workers', type=int,
+                       help='number of worker processes, 0 uses every core (default: from the config, '
+                            'or every core)')
+    watch.add_argument('--report-interval', type=float, default=HOT_FOLDER_REPORT_INTERVAL, metavar='SECONDS',
+                       help='seconds between two throughput reports (default: %(default)s)')
+    watch.add_argument('--once', action='store_true',
+                       help='process the files that are in the folders already and exit')
+    watch.set_defaults(func=run_watch)
+
+    for subparser in (rotate, stamp):
+        subparser.add_argument('-o', '--output', help='output PDF file, for a single input only')
+        subparser.add_argument('-d', '--output-dir', help='directory output files are written to')
+        subparser.add_argument('-j', '--jobs', type=int, default=1,
+                               help='number of files processed in parallel, 0 uses every core (default: 1)')
+    for subparser in (join, split, rotate, stamp):
+        subparser.add_argument('-O', '--optimize', dest='compress_level', type=int, nargs='?',
+                               const=COMPRESS_LEVEL, choices=range(1, 10), metavar='LEVEL',
+                               help='recompress streams at zlib LEVEL (default: %(const)s) and write '
+                                    'object and cross reference streams')
+    return parser
+
+
+def main(argv=None):
+    '''Run the command line interface.
+
+    Args:
+        argv (list): Command line arguments without the program name (default: `sys.argv[1:]`)
+
+    Returns:
+        int: Exit status, 1 if any input could not be processed
+    '''
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        tasks = list(args.func(args))
+    except CommandError as e:
+        parser.error(str(e))
+    status = 0
+    with tracing() if args.profile or args.trace else nullcontext() as tracer:
+        for filepath, result, task in tasks:
+            try:
+                with span(args.command, file=filepath):
+                    note = task()
+            except Exception as e:
+                print(f'{APPNAME}: {filepath}: {error_message(e)}', file=sys.stderr)
+                status = 1
+            else:
+                if not args.quiet:
+                    print(result if note is None else f'{result} ({note})')
+    if args.profile:
+        print(tracer.summary(), file=sys.stderr)
+    if args.trace:
+        tracer.write_chrome_trace(args.trace)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
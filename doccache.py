@@ -0,0 +1,252 @@
+'''Process-wide cache of parsed PDF documents.
+
+Opening a PDF with PyPDF2 means reading the cross reference table and flattening the
+page tree, which gets expensive for large scans. The tab managers used to do that
+again every time they needed a page count or a reader, so this module keeps parsed
+documents around and hands them out to whoever asks.
+
+Entries are keyed on the absolute path, size and modification time of a file, so a
+file that changes on disk is re-parsed automatically on its next access.
+
+Page counts of files that haven't been parsed are read with the lightweight probe
+from `pdfprobe` and cached separately, so listing files never parses them in full
+and doesn't even need PyPDF2 to be imported.
+'''
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from settings import CONTENT_HASH_CACHE_SIZE, DOC_CACHE_MAX_BYTES, PAGE_COUNT_CACHE_SIZE
+from pdfprobe import ProbeError, probe_pages
+from tracing import count, span
+
+
+def file_key(filepath):
+    '''Build the cache key of a file as it currently is on disk.
+
+    Args:
+        filepath (str): Path to PDF File
+
+    Returns:
+        tuple: `(absolute path, size in bytes, modification time in ns)`
+    '''
+    abspath = os.path.abspath(filepath)
+    stat = os.stat(abspath)
+    return (abspath, stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=CONTENT_HASH_CACHE_SIZE)
+def _content_hash(key):
+    digest = hashlib.sha256()
+    with span('content hash'), open(key[0], 'rb') as pdf_file:
+        for block in iter(lambda: pdf_file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_hash(filepath):
+    '''SHA-256 hash of a file, computed once per version of the file on disk.
+
+    Args:
+        filepath (str): Path to PDF File
+
+    Returns:
+        str: Hex digest of the file contents
+    '''
+    return _content_hash(file_key(filepath))
+
+
+class CachedDocument:
+    '''A parsed PDF document held by a `DocumentCache`.
+
+    The shared `reader` must be treated as read-only: PyPDF2 rewrites the objects of
+    a reader while writing its pages into a `PdfFileWriter`, and rotating or merging
+    pages changes them in place. Anything that is going to modify or write pages
+    has to get its own reader from `open_reader()`, which re-uses the cached file
+    contents and therefore never touches the disk.
+
+    Args:
+        key (tuple): Cache key as returned by `file_key()`
+        data (bytes): Raw contents of the PDF file
+    '''
+
+    def __init__(self, key, data):
+        self.key = key
+        self.data = data
+        self.reader = self.open_reader()
+        self.pages = self.reader.getNumPages()
+
+    @property
+    def filepath(self):
+        '''str: Absolute path of the cached PDF file'''
+        return self.key[0]
+
+    @property
+    def size(self):
+        '''int: Number of bytes the document is accounted for in the cache budget'''
+        return len(self.data)
+
+    def open_reader(self):
+        '''Create a private reader for this document.
+
+        Returns:
+            PdfFileReader: Reader backed by the cached file contents
+        '''
+        # PyPDF2 is imported on first use, so that the application starts without it
+        from PyPDF2 import PdfFileReader
+
+        with span('PdfFileReader', file=os.path.basename(self.key[0])):
+            return PdfFileReader(io.BytesIO(self.data), strict=False)
+
+
+class DocumentCache:
+    '''LRU cache of parsed PDF documents with a memory budget.
+
+    The budget is measured in bytes of raw file contents, which is a good enough
+    estimate of what the parsed object graph of a document costs. Documents larger
+    than the whole budget are parsed and returned, but never retained.
+
+    Args:
+        max_bytes (int): Memory budget of the cache (default: `DOC_CACHE_MAX_BYTES`)
+        max_page_counts (int): Number of probed page counts to remember (default: `PAGE_COUNT_CACHE_SIZE`)
+    '''
+
+    def __init__(self, max_bytes=DOC_CACHE_MAX_BYTES, max_page_counts=PAGE_COUNT_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self.max_page_counts = max_page_counts
+        self.__documents = OrderedDict()
+        self.__page_counts = OrderedDict()
+        self.__size = 0
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__documents)
+
+    def __contains__(self, filepath):
+        with self.__lock:
+            document = self.__documents.get(os.path.abspath(filepath))
+        try:
+            return document is not None and document.key == file_key(filepath)
+        except OSError:
+            return False
+
+    @property
+    def size(self):
+        '''int: Number of bytes currently accounted for in the cache'''
+        return self.__size
+
+    def get(self, filepath):
+        '''Fetch the parsed document for a file, parsing it if necessary.
+
+        Args:
+            filepath (str): Path to PDF File
+
+        Returns:
+            CachedDocument: Parsed document matching the current state of the file
+        '''
+        key = file_key(filepath)
+        with self.__lock:
+            document = self.__documents.get(key[0])
+            if document is not None and document.key == key:
+                self.__documents.move_to_end(key[0])
+                return document
+        # parse outside of the lock so that several threads can load files at once
+        with open(key[0], 'rb') as in_pdf:
+            data = in_pdf.read()
+        count('bytes_read', len(data))
+        document = CachedDocument(key, data)
+        with self.__lock:
+            self.__discard(key[0])
+            if document.size <= self.max_bytes:
+                self.__documents[key[0]] = document
+                self.__size += document.size
+                self.__evict()
+        return document
+
+    def pages(self, filepath):
+        '''Number of pages of a PDF file.
+
+        Parsed documents already know their page count. For all other files it is
+        probed from the page tree root, and only files the probe can't handle get
+        parsed (and cached) in full.
+
+        Args:
+            filepath (str): Path to PDF File
+
+        Returns:
+            int: Number of pages contained in PDF file
+        '''
+        key = file_key(filepath)
+        with self.__lock:
+            document = self.__documents.get(key[0])
+            if document is not None and document.key == key:
+                self.__documents.move_to_end(key[0])
+                return document.pages
+            page_count = self.__page_counts.get(key[0])
+            if page_count is not None and page_count[0] == key:
+                self.__page_counts.move_to_end(key[0])
+                return page_count[1]
+        try:
+            pages = probe_pages(key[0])
+        except ProbeError:
+            return self.get(filepath).pages
+        with self.__lock:
+            self.__page_counts[key[0]] = (key, pages)
+            self.__page_counts.move_to_end(key[0])
+            while len(self.__page_counts) > self.max_page_counts:
+                self.__page_counts.popitem(last=False)
+        return pages
+
+    def reader(self, filepath):
+        '''Shared, read-only reader of a PDF file. See `CachedDocument`.
+
+        Args:
+            filepath (str): Path to PDF File
+
+        Returns:
+            PdfFileReader: Cached reader of the PDF file
+        '''
+        return self.get(filepath).reader
+
+    def open_reader(self, filepath):
+        '''Private reader of a PDF file that may be modified and written.
+
+        Args:
+            filepath (str): Path to PDF File
+
+        Returns:
+            PdfFileReader: Reader backed by the cached file contents
+        '''
+        return self.get(filepath).open_reader()
+
+    def invalidate(self, filepath=None):
+        '''Drop a single file or, if no `filepath` is given, everything from the cache.
+
+        Args:
+            filepath (str): Path to PDF File (default: None)
+        '''
+        with self.__lock:
+            if filepath is None:
+                self.__documents.clear()
+                self.__page_counts.clear()
+                self.__size = 0
+            else:
+                self.__discard(os.path.abspath(filepath))
+                self.__page_counts.pop(os.path.abspath(filepath), None)
+
+    def __discard(self, abspath):
+        document = self.__documents.pop(abspath, None)
+        if document is not None:
+            self.__size -= document.size
+
+    def __evict(self):
+        while self.__size > self.max_bytes and self.__documents:
+            _, document = self.__documents.popitem(last=False)
+            self.__size -= document.size
+
+
+document_cache = DocumentCache()
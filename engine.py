@@ -0,0 +1,722 @@
+'''PDF operations of PyPDF Builder that don't depend on the user interface.
+
+The tab managers in `pypdfbuilder` collect file paths and options from the user and
+hand the actual work over to the functions in this module.
+'''
+
+import gc
+import io
+import mmap
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PyPDF2 import PdfFileReader
+from PyPDF2.pdf import PageObject
+from PyPDF2.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject,
+                            NumberObject, StreamObject)
+
+from settings import JOIN_GC_BYTES, JOIN_GC_SOURCES
+from doccache import document_cache
+from pdfprobe import last_startxref
+from pageselect import compile_page_select
+from pdfwriter import StreamingPdfWriter, streaming_output
+from splitting import DirectorySink, ZipSink, bookmark_parts, page_chunks, size_budget_parts, title_slug
+from tracing import count, span
+
+STAMP_XOBJECT_NAME = '/PyPDFBuilderStamp'
+
+
+def no_progress(done, total=None):
+    '''Default progress callback of all operations, does nothing.'''
+
+
+def content_streams(page):
+    '''Yield the raw (unresolved) content stream references of a page.'''
+    if '/Contents' not in page:
+        return
+    contents = page.raw_get('/Contents')
+    if isinstance(contents.getObject(), ArrayObject):
+        yield from contents.getObject()
+    else:
+        yield contents
+
+
+def _add_stream(out_pdf, data):
+    stream = DecodedStreamObject()
+    stream.setData(data)
+    return out_pdf._addObject(stream)
+
+
+def form_xobject(page):
+    '''Wrap a page into a Form XObject that can be drawn onto other pages.
+
+    Args:
+        page (PageObject): Page to wrap
+
+    Returns:
+        EncodedStreamObject: Form XObject with the page's contents and resources
+    '''
+    data = b'\n'.join(c.getObject().getData() for c in content_streams(page))
+    content = DecodedStreamObject()
+    content.setData(data)
+    xobject = content.flateEncode()
+    xobject.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Form'),
+        NameObject('/BBox'): page.mediaBox,
+    })
+    if '/Resources' in page:
+        xobject[NameObject('/Resources')] = page.raw_get('/Resources')
+    return xobject
+
+
+class PageStamper:
+    '''Draws a single Form XObject onto or underneath pages.
+
+    The XObject is stored in the output file once and every stamped page only gets
+    a reference to it in its resources plus two tiny shared content streams around
+    its own contents, so neither the stamp nor the page contents are ever decoded
+    or copied per page.
+
+    Args:
+        out_pdf (PdfFileWriter): Writer the stamped pages are going to be added to
+        stamp_page (PageObject): Page to draw onto or underneath other pages
+        command (str): `'STAMP'` draws on top of the pages, `'BG'` underneath them
+    '''
+
+    def __init__(self, out_pdf, stamp_page, command='BG'):
+        self.__out_pdf = out_pdf
+        self.__command = command
+        xobject = form_xobject(stamp_page)
+        # copy what the stamp refers to right away, so it never depends on its reader again
+        out_pdf.stack = []
+        out_pdf._sweepIndirectReferences({}, xobject)
+        del out_pdf.stack
+        self.__xobject = out_pdf._addObject(xobject)
+        self.__streams = {}
+
+    def __xobject_name(self, xobjects):
+        name, n = STAMP_XOBJECT_NAME, 0
+        while name in xobjects and xobjects.raw_get(name) != self.__xobject:
+            n += 1
+            name = f'{STAMP_XOBJECT_NAME}{n}'
+        return NameObject(name)
+
+    def __wrapping_streams(self, name):
+        # pages sharing a resource dictionary all end up with the same name, so
+        # in practice there is exactly one pair of wrapping streams per job
+        if name not in self.__streams:
+            draw = f'q {name} Do Q\n'.encode()
+            if self.__command == 'STAMP':
+                self.__streams[name] = (_add_stream(self.__out_pdf, b'q\n'),
+                                        _add_stream(self.__out_pdf, b'\nQ\n' + draw))
+            else:
+                self.__streams[name] = (_add_stream(self.__out_pdf, draw), None)
+        return self.__streams[name]
+
+    def stamp(self, page):
+        '''Stamp a page in place. The page must belong to a private reader.
+
+        Args:
+            page (PageObject): Page to stamp
+
+        Returns:
+            PageObject: The stamped page
+        '''
+        if '/Resources' not in page:
+            page[NameObject('/Resources')] = DictionaryObject()
+        resources = page['/Resources']
+        if '/XObject' not in resources:
+            resources[NameObject('/XObject')] = DictionaryObject()
+        xobjects = resources['/XObject']
+        name = self.__xobject_name(xobjects)
+        xobjects[name] = self.__xobject
+
+        before, after = self.__wrapping_streams(name)
+        contents = ArrayObject([before])
+        contents.extend(content_streams(page))
+        if after is not None:
+            contents.append(after)
+        page[NameObject('/Contents')] = contents
+        return page
+
+
+def rotate_pdf(filepath, output_filepath, page_range, degrees, extract_pages=False, incremental=False,
+               compress_level=None, progress=no_progress):
+    '''Rotate a range of pages of a PDF clockwise.
+
+    Args:
+        filepath (str): Path to PDF File
+        output_filepath (str): Path the new PDF File is written to
+        page_range (tuple): Zero-based `(start, stop)` of the pages to rotate
+        degrees (int): Clockwise rotation, a multiple of 90 (see `ROTATE_DEGREES`)
+        extract_pages (bool): Leave out all pages outside of `page_range` (default: False)
+        incremental (bool): Append an incremental update instead of rewriting the file, see
+            `rotate_pdf_incremental`. Ignored when extracting pages (default: False)
+        compress_level (int): zlib level to optimize the output with, see `StreamingPdfWriter`.
+            Not used for incremental updates (default: None)
+        progress (callable): Called with `(done, total)` after every page. May raise
+            to abort the operation (default: no progress reporting)
+    '''
+    if incremental and not extract_pages:
+        return rotate_pdf_incremental(filepath, output_filepath, page_range, degrees, progress=progress)
+    in_pdf = document_cache.open_reader(filepath)
+    pages = in_pdf.getNumPages()
+    with streaming_output(output_filepath, compress_level=compress_level) as out_pdf:
+        for p in range(pages):
+            if p in range(*page_range) or not extract_pages:
+                with span('getPage', page=p):
+                    page = in_pdf.getPage(p)
+                if degrees != 0 and p in range(*page_range):
+                    with span('rotateClockwise', page=p):
+                        page.rotateClockwise(degrees)
+                out_pdf.addPage(page)
+            progress(p + 1, pages)
+
+
+def _xref_subsections(idnums):
+    '''Group sorted object numbers into runs of consecutive numbers.'''
+    subsections = []
+    for idnum in idnums:
+        if subsections and subsections[-1][0] + len(subsections[-1][1]) == idnum:
+            subsections[-1][1].append(idnum)
+        else:
+            subsections.append((idnum, [idnum]))
+    return subsections
+
+
+def _xref_size(reader):
+    '''/Size of a file's cross reference data, which PyPDF2 drops for xref streams.'''
+    if '/Size' in reader.trailer:
+        return reader.trailer['/Size']
+    idnums = list(reader.xref_objStm)
+    for section in reader.xref.values():
+        idnums.extend(section)
+    return max(idnums, default=0) + 1
+
+
+def incremental_update(start, objects, trailer, size, prev_xref, xref_stream=False):
+    '''Serialize changed objects into an incremental update section.
+
+    Args:
+        start (int): Offset in the file the section is going to be written at
+        objects (dict): New versions of objects as `{idnum: (generation, object)}`
+        trailer (DictionaryObject): Trailer of the file being updated
+        size (int): Number of objects (`/Size`) of the file being updated
+        prev_xref (int): Offset of the file's current cross reference section
+        xref_stream (bool): Write a cross reference stream instead of a classic
+            table, for files that use them (default: False)
+
+    Returns:
+        bytes: Objects, cross reference section and trailer to append to the file
+    '''
+    stream = io.BytesIO()
+    offsets = {}
+    for idnum, (generation, obj) in sorted(objects.items()):
+        offsets[idnum] = (start + stream.tell(), generation)
+        stream.write(f'{idnum} {generation} obj\n'.encode())
+        obj.writeToStream(stream, None)
+        stream.write(b'\nendobj\n')
+    xref_offset = start + stream.tell()
+    size = max(size, max(offsets, default=0) + 1)
+    if xref_stream:
+        offsets[size] = (xref_offset, 0)
+        size += 1
+    new_trailer = DictionaryObject({NameObject(key): trailer.raw_get(key)
+                                    for key in ('/Root', '/Info', '/ID') if key in trailer})
+    new_trailer[NameObject('/Size')] = NumberObject(size)
+    new_trailer[NameObject('/Prev')] = NumberObject(prev_xref)
+    subsections = _xref_subsections(sorted(offsets))
+    if xref_stream:
+        width = max(1, (xref_offset.bit_length() + 7) // 8)
+        xref = DecodedStreamObject()
+        xref.setData(b''.join(
+            b'\x01' + offsets[idnum][0].to_bytes(width, 'big') + offsets[idnum][1].to_bytes(2, 'big')
+            for _, idnums in subsections for idnum in idnums))
+        xref.update(new_trailer)
+        xref.update({
+            NameObject('/Type'): NameObject('/XRef'),
+            NameObject('/W'): ArrayObject(NumberObject(w) for w in (1, width, 2)),
+            NameObject('/Index'): ArrayObject(
+                NumberObject(n) for first, idnums in subsections for n in (first, len(idnums))),
+        })
+        stream.write(f'{size - 1} 0 obj\n'.encode())
+        xref.writeToStream(stream, None)
+        stream.write(b'\nendobj\n')
+    else:
+        # the head of the free list first, readers like PyPDF2 take a table that
+        # doesn't start at object 0 for a wrongly numbered one
+        stream.write(b'xref\n0 1\n0000000000 65535 f\r\n')
+        for first, idnums in subsections:
+            stream.write(f'{first} {len(idnums)}\n'.encode())
+            for idnum in idnums:
+                stream.write('{:010d} {:05d} n\r\n'.format(*offsets[idnum]).encode())
+        stream.write(b'trailer\n')
+        new_trailer.writeToStream(stream, None)
+        stream.write(b'\n')
+    stream.write(f'startxref\n{xref_offset}\n%%EOF\n'.encode())
+    return stream.getvalue()
+
+
+def rotate_pdf_incremental(filepath, output_filepath, page_range, degrees, progress=no_progress):
+    '''Rotate a range of pages of a PDF clockwise by appending an incremental update.
+
+    Instead of rewriting every object of the file, only the dictionaries of the
+    rotated pages are written again, together with a new cross reference section,
+    after an unchanged copy of the original. If `output_filepath` is the source file
+    itself, the update is appended to it in place, so rotating a few pages of a huge
+    scan only costs as much I/O as those pages.
+
+    Args:
+        filepath (str): Path to PDF File
+        output_filepath (str): Path the updated PDF File is written to, may be `filepath`
+        page_range (tuple): Zero-based `(start, stop)` of the pages to rotate
+        degrees (int): Clockwise rotation, a multiple of 90 (see `ROTATE_DEGREES`)
+        progress (callable): Called with `(done, total)` after every page. May raise
+            to abort the operation (default: no progress reporting)
+    '''
+    in_place = os.path.exists(output_filepath) and os.path.samefile(filepath, output_filepath)
+    with open(filepath, 'rb') as in_pdf:
+        # the reader only loads the objects it is asked for, the rest of the file is never read
+        with span('PdfFileReader', file=os.path.basename(filepath)):
+            in_reader = PdfFileReader(in_pdf, strict=False)
+        if in_reader.isEncrypted:
+            raise ValueError('encrypted PDFs cannot be updated incrementally')
+        pages = range(max(page_range[0], 0), min(page_range[1], in_reader.getNumPages()))
+        objects = {}
+        for done, p in enumerate(pages if degrees % 360 else (), start=1):
+            with span('getPage', page=p):
+                page = in_reader.getPage(p)
+            rotation = page.get('/Rotate', 0)
+            rotation = rotation if isinstance(rotation, int) else rotation.getObject()
+            page_dict = DictionaryObject(in_reader.getObject(page.indirectRef))
+            page_dict[NameObject('/Rotate')] = NumberObject((rotation + degrees) % 360)
+            objects[page.indirectRef.idnum] = (page.indirectRef.generation, page_dict)
+            count('pages')
+            progress(done, len(pages))
+        update = b''
+        if objects:
+            with mmap.mmap(in_pdf.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                prev_xref = last_startxref(data)
+                xref_stream = data[prev_xref:prev_xref + 4] != b'xref'
+                update = b'' if data[-1:] in b'\r\n' else b'\n'
+                update += incremental_update(len(data) + len(update), objects, in_reader.trailer,
+                                             _xref_size(in_reader), prev_xref, xref_stream=xref_stream)
+    with span('write', bytes=len(update)):
+        if not in_place:
+            shutil.copyfile(filepath, output_filepath)
+        if update:
+            with open(output_filepath, 'ab') as out_pdf_stream:
+                out_pdf_stream.write(update)
+    count('bytes_written', len(update))
+
+
+def split_output_path(basepath, page, pages, title=None):
+    '''Path of the file for `page` of a split document.
+
+    Args:
+        basepath (str): Path of the split PDF File without extension
+        page (int): Zero-based page number, or number of the part
+        pages (int): Total number of pages of the split PDF File, or of parts
+        title (str): Bookmark title the part starts at, to append (default: None)
+
+    Returns:
+        str: `basepath` with the one-based, zero-padded page number appended
+    '''
+    # in spite of discussion here https://stackoverflow.com/a/2189814
+    # we'll just go the lazy way to count the number of needed digits:
+    num_length = len(str(abs(pages)))
+    slug = title_slug(title)
+    suffix = f'_{slug}' if slug else ''
+    return f"{basepath}_{str(page+1).rjust(num_length, '0')}{suffix}.pdf"
+
+
+def _write_parts(in_pdf, basepath, parts, first, total, sink, compress_level=None, progress=no_progress):
+    '''Write `parts`, the ones from number `first` on of `total`, into `sink`.'''
+    names = []
+    for n, (start, stop, title) in enumerate(parts, first):
+        output_path = split_output_path(basepath, n, total, title)
+        with sink.output(output_path, compress_level=compress_level) as out_pdf:
+            for p in range(start, stop):
+                with span('getPage', page=p):
+                    page = in_pdf.getPage(p)
+                out_pdf.addPage(copy_direct_objects(page))
+        # writing sweeps the objects of the reader in place, so that they point into
+        # the writer of this part. Let the next part read fresh copies of them.
+        in_pdf.resolvedObjects.clear()
+        names.append(sink.name(output_path))
+        progress(stop, in_pdf.getNumPages())
+    return names
+
+
+def _split_parts(filepath, basepath, parts, first, total, compress_level=None):
+    '''Write parts of a PDF into files of their own.
+
+    This runs in worker processes, which is why it gets its own reader.
+    '''
+    return _write_parts(document_cache.open_reader(filepath), basepath, parts, first, total, DirectorySink(),
+                        compress_level=compress_level)
+
+
+def split_pdf(filepath, workers=1, shards_per_worker=4, compress_level=None, every=1, bookmarks=False,
+              max_bytes=None, archive=None, progress=no_progress):
+    '''Split a PDF into single pages or larger parts next to the original or into a ZIP archive.
+
+    By default, every page becomes a file of its own. `every`, `bookmarks` and
+    `max_bytes` cut the document into larger parts instead (see `splitting`), of
+    which only one can be used at a time. Parts are named like single pages, by
+    their number, with the title of their bookmark appended when splitting at
+    bookmarks.
+
+    With more than one worker, the parts are cut into contiguous shards that are
+    written by a pool of processes, each with its own reader. Output names and file
+    contents don't depend on the number of workers. Parts going into an archive are
+    written one after the other by the calling process.
+
+    Args:
+        filepath (str): Path to PDF File
+        workers (int): Number of processes; 0 or None uses every core (default: 1)
+        shards_per_worker (int): Shards handed to each worker, to even out
+            slow pages (default: 4)
+        compress_level (int): zlib level to optimize the output with, see
+            `StreamingPdfWriter` (default: None)
+        every (int): Pages per part (default: 1)
+        bookmarks (bool): Start a part at every top-level bookmark (default: False)
+        max_bytes (int): Fill parts up to this estimated size in bytes (default: None)
+        archive: Path of a ZIP archive, or a binary file object like
+            `sys.stdout.buffer`, to stream all parts into instead of writing files
+            (default: None)
+        progress (callable): Called with `(done, total)` pages after every part, or
+            after every shard when using workers. May raise to abort the operation;
+            shards that haven't started yet are dropped then (default: no progress reporting)
+
+    Returns:
+        list: Paths of the written files, or names of the archive members, in page order
+
+    Raises:
+        ValueError: If the options contradict each other or the document has no
+            bookmarks to split at
+    '''
+    if (every != 1) + bool(bookmarks) + (max_bytes is not None) > 1:
+        raise ValueError('split every N pages, at bookmarks or by size, not several at once')
+    basepath = os.path.splitext(filepath)[0]
+    # the parts index the pages of a reader, so they are planned with its page
+    # count rather than the probed one
+    in_pdf = document_cache.open_reader(filepath)
+    pages = in_pdf.getNumPages()
+    if bookmarks or max_bytes is not None:
+        with span('plan parts'):
+            parts = bookmark_parts(in_pdf) if bookmarks else size_budget_parts(in_pdf, max_bytes)
+    else:
+        parts = page_chunks(pages, every)
+    total = len(parts)
+
+    workers = min(workers or os.cpu_count() or 1, total)
+    if archive is not None or workers <= 1:
+        sink = ZipSink(archive) if archive is not None else DirectorySink()
+        try:
+            names = _write_parts(in_pdf, basepath, parts, 0, total, sink, compress_level=compress_level,
+                                 progress=progress)
+        except BaseException:
+            sink.abort()
+            raise
+        sink.close()
+        return names
+    shard_size = -(-total // (workers * shards_per_worker))
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        shards = {executor.submit(_split_parts, filepath, basepath, parts[first:first + shard_size], first, total,
+                                  compress_level=compress_level): parts[first:first + shard_size]
+                  for first in range(0, total, shard_size)}
+        try:
+            for shard in as_completed(shards):
+                shard.result()
+                done += sum(stop - start for start, stop, _ in shards[shard])
+                progress(done, pages)
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+    return [name for shard in shards for name in shard.result()]
+
+
+def stamp_pdf(source_filepath, stamp_filepath, output_filepath, command='BG', only_first_page=False,
+              numbering=None, compress_level=None, progress=no_progress):
+    '''Put the first page of one PDF behind or on top of the pages of another.
+
+    Both files are parsed exactly once and the output contains a single copy of
+    the stamp, no matter how many pages are stamped.
+
+    Args:
+        source_filepath (str): Path to PDF File whose pages get stamped
+        stamp_filepath (str): Path to PDF File whose first page is the stamp/background,
+            None to only number the pages
+        output_filepath (str): Path the new PDF File is written to
+        command (str): `'STAMP'` to stamp on top of the pages, `'BG'` to put a
+            background underneath them (default: `'BG'`)
+        only_first_page (bool): Only apply stamp/background to the first page (default: False)
+        numbering (PageNumberer): Number all pages in the same pass, see `numbering`
+            (default: None)
+        compress_level (int): zlib level to optimize the output with, see
+            `StreamingPdfWriter` (default: None)
+        progress (callable): Called with `(done, total)` after every page. May raise
+            to abort the operation (default: no progress reporting)
+    '''
+    stamp_reader = document_cache.open_reader(stamp_filepath) if stamp_filepath is not None else None
+    stamp_with_reader(source_filepath, stamp_reader, output_filepath, command=command,
+                      only_first_page=only_first_page, numbering=numbering, compress_level=compress_level,
+                      progress=progress)
+
+
+def stamp_with_reader(source_filepath, stamp_reader, output_filepath, command='BG', only_first_page=False,
+                      numbering=None, compress_level=None, progress=no_progress):
+    '''`stamp_pdf` with a reader of the stamp that can be used for many files.
+
+    Writing the output copies the objects the stamp refers to and leaves the reader's
+    resolved objects pointing into the output, so they are dropped afterwards and the
+    next call reads fresh copies from the already parsed file.
+
+    Args:
+        stamp_reader (PdfFileReader): Private reader of the PDF File whose first page
+            is the stamp/background, see `DocumentCache.open_reader`, or None
+
+    See `stamp_pdf` for the other arguments.
+    '''
+    source_pdf = document_cache.open_reader(source_filepath)
+    pages = source_pdf.getNumPages()
+    with streaming_output(output_filepath, compress_level=compress_level) as out_pdf:
+        stamper = PageStamper(out_pdf, stamp_reader.getPage(0), command=command) if stamp_reader else None
+        if numbering is not None:
+            numbering.prepare(out_pdf, pages)
+        for p in range(pages):
+            with span('getPage', page=p):
+                page = source_pdf.getPage(p)
+            if stamper is not None and (not only_first_page or p < 1):
+                with span('PageStamper.stamp', page=p):
+                    page = stamper.stamp(page)
+            if numbering is not None:
+                with span('PageNumberer', page=p):
+                    page = numbering(page, p)
+            out_pdf.addPage(page)
+            progress(p + 1, pages)
+    if stamp_reader is not None:
+        stamp_reader.resolvedObjects.clear()
+        stamp_reader.flattenedPages = None
+
+
+def resolve_page_ranges(filepath, page_ranges, pages=None):
+    '''Turn the page selection of a join entry into page slices.
+
+    Args:
+        filepath (str): Path to PDF File
+        page_ranges: None for all pages, a page selection string (see `pageselect`) or
+            zero-based `(start, stop)` / `(start, stop, step)` tuples
+        pages (int): Number of pages of the reader the slices are going to index. The
+            probed page count is only good for estimates (default: probe the file)
+
+    Returns:
+        tuple: Zero-based `(start, stop[, step])` tuples, every one usable as `range(*page_slice)`
+
+    Raises:
+        PageSelectError: If a page selection string doesn't fit the file
+    '''
+    if pages is None and (page_ranges is None or isinstance(page_ranges, str)):
+        pages = document_cache.pages(filepath)
+    if page_ranges is None:
+        return ((0, pages),)
+    if isinstance(page_ranges, str):
+        return compile_page_select(page_ranges, pages)
+    return tuple(page_ranges)
+
+
+class _JoinSource:
+    '''Private reader of one join source plus the output pages taken from it.'''
+
+    def __init__(self, filepath):
+        self.reader = document_cache.open_reader(filepath)
+        self.page_refs = []
+        self.transformed = set()
+
+
+def _detach_source(out_pdf, source):
+    '''Copy everything the pages taken from `source` refer to into `out_pdf`.
+
+    Once swept, the pages only reference objects owned by the writer, so the reader
+    and its file contents can be dropped long before the output is written.
+    '''
+    extern_map = {}
+    for page_ref in source.page_refs:
+        original = out_pdf.getObject(page_ref).indirectRef
+        if original is None:
+            continue
+        # pages referencing themselves (e.g. through annotations) must point to
+        # the copy in the output instead of pulling in the original page again
+        extern_map.setdefault(original.pdf, {}).setdefault(original.generation, {})[original.idnum] = page_ref
+    # never follow /Parent into the page tree, it belongs to the writer anyway
+    out_pdf.stack = [out_pdf._pages.idnum]
+    for page_ref in source.page_refs:
+        out_pdf._sweepIndirectReferences(extern_map, page_ref)
+    del out_pdf.stack
+    for page_ref in source.page_refs:
+        page = out_pdf.getObject(page_ref)
+        page.pdf = page.indirectRef = None
+
+
+def _copy_outline(out_pdf, reader, outline, page_map, parent=None):
+    '''Re-create the bookmarks of `outline` that point to pages in `page_map`.'''
+    bookmark = None
+    for item in outline:
+        if isinstance(item, list):
+            _copy_outline(out_pdf, reader, item, page_map, parent=bookmark if bookmark is not None else parent)
+            continue
+        page_number = page_map.get(reader.getDestinationPageNumber(item))
+        if page_number is None:
+            bookmark = None
+        else:
+            bookmark = out_pdf.addBookmark(item.title, page_number, parent=parent)
+
+
+def copy_page(page, keep_reference=True):
+    '''Shallow copy of a page, so it can be changed without touching the original.
+
+    Args:
+        page (PageObject): Page to copy
+        keep_reference (bool): Let the copy stand in for the original wherever the
+            source document refers to the page, e.g. in annotations. Only one copy
+            of a page may do so (default: True)
+
+    Returns:
+        PageObject: New page object sharing contents and resources with `page`
+    '''
+    copy = PageObject(page.pdf, page.indirectRef if keep_reference else None)
+    copy.update(page)
+    return copy
+
+
+def _copy_direct(data):
+    if isinstance(data, DictionaryObject) and not isinstance(data, StreamObject):
+        copy = DictionaryObject()
+        for key, value in dict.items(data):
+            copy[key] = _copy_direct(value)
+        return copy
+    if isinstance(data, ArrayObject):
+        return ArrayObject(_copy_direct(value) for value in data)
+    return data
+
+
+def copy_direct_objects(page):
+    '''Deep copy of a page that stops at references to other objects.
+
+    Inherited resources are shared by all pages of a reader, so a page whose direct
+    objects get swept into a writer has to be a copy of them.
+
+    Args:
+        page (PageObject): Page to copy
+
+    Returns:
+        PageObject: New page object with its own copies of all direct objects
+    '''
+    copy = PageObject(page.pdf, page.indirectRef)
+    for key, value in dict.items(page):
+        copy[key] = _copy_direct(value)
+    return copy
+
+
+def join_pages(out_pdf, entries, import_bookmarks=True, transform=None, progress=no_progress):
+    '''Add pages of several PDF files to a writer. See `join_pdfs`.
+
+    A `StreamingPdfWriter` gets flushed whenever a source has been detached, keeping
+    back the pages of sources that are used again later.
+
+    Args:
+        out_pdf (PdfFileWriter): Writer the pages are added to
+        entries (iterable): `(filepath, page_ranges)` tuples in output order, see `join_pdfs`
+        import_bookmarks (bool): Carry over bookmarks pointing to joined pages (default: True)
+        transform (callable): Called with `(page, output page number)` for every page
+            before it is added, returns the page to add instead (default: None)
+        progress (callable): Called with `(done, total)` after every page. May raise
+            to abort the operation (default: no progress reporting)
+    '''
+    entries = [(os.path.abspath(filepath), page_ranges) for filepath, page_ranges in entries]
+    last_use = {filepath: i for i, (filepath, _) in enumerate(entries)}
+    # probed page counts are good enough to check the selections and estimate the
+    # total up front, the pages themselves are picked with the counts of the readers
+    estimates = [sum(len(range(*page_slice)) for page_slice in resolve_page_ranges(filepath, page_ranges))
+                 for filepath, page_ranges in entries]
+    total = sum(estimates)
+    sources = {}
+    # object numbers of the pages of attached sources, kept back from flushing
+    attached_pages = set()
+    dropped_bytes = dropped_sources = 0
+    for i, (filepath, page_ranges) in enumerate(entries):
+        if filepath not in sources:
+            sources[filepath] = _JoinSource(filepath)
+        source = sources[filepath]
+        reader = source.reader
+        page_ranges = resolve_page_ranges(filepath, page_ranges, reader.getNumPages())
+        total += sum(len(range(*page_slice)) for page_slice in page_ranges) - estimates[i]
+        page_map = {}
+        for page_slice in page_ranges:
+            for p in range(*page_slice):
+                with span('getPage', page=p):
+                    page = reader.getPage(p)
+                if transform is not None:
+                    # transform a copy, so a page selected twice starts out unchanged again
+                    page = transform(copy_page(page, keep_reference=p not in source.transformed),
+                                     out_pdf.getNumPages())
+                    source.transformed.add(p)
+                page_map.setdefault(p, out_pdf.getNumPages())
+                out_pdf.addPage(page)
+                source.page_refs.append(IndirectObject(len(out_pdf._objects), 0, out_pdf))
+                attached_pages.add(len(out_pdf._objects))
+                progress(out_pdf.getNumPages(), total)
+        if import_bookmarks:
+            _copy_outline(out_pdf, reader, reader.getOutlines(), page_map)
+        if last_use[filepath] == i:
+            source = sources.pop(filepath)
+            with span('detach', file=os.path.basename(filepath)):
+                _detach_source(out_pdf, source)
+            attached_pages.difference_update(ref.idnum for ref in source.page_refs)
+            if isinstance(out_pdf, StreamingPdfWriter):
+                out_pdf.flush(keep=attached_pages)
+                # PyPDF2 readers are full of reference cycles, free the dropped ones (and
+                # their file contents) before they pile up instead of whenever the
+                # collector gets to them, but not after every source, as a full
+                # collection walks the whole heap
+                dropped_bytes += os.path.getsize(filepath)
+                dropped_sources += 1
+                if dropped_bytes >= JOIN_GC_BYTES or dropped_sources >= JOIN_GC_SOURCES:
+                    gc.collect()
+                    dropped_bytes = dropped_sources = 0
+
+
+def join_pdfs(entries, output_filepath, import_bookmarks=True, deduplicate=False, compress_level=None,
+              progress=no_progress):
+    '''Join pages of several PDF files into a new one.
+
+    Every distinct source file is parsed exactly once, no matter how many entries or
+    page ranges refer to it, and no file handle is kept open while joining. As soon
+    as a source is not referenced by any later entry, its pages are copied into the
+    output and its reader is dropped, so only the sources still needed are held in
+    memory. The copied pages are written to disk right away, and the output only
+    replaces `output_filepath` once it is complete.
+
+    Args:
+        entries (iterable): `(filepath, page_ranges)` tuples in output order. `page_ranges`
+            is a page selection string like `'1-3, 7, end'` (see `pageselect`), a list of
+            zero-based `(start, stop)` or `(start, stop, step)` tuples, or None for all pages.
+        output_filepath (str): Path the joined PDF File is written to
+        import_bookmarks (bool): Carry over bookmarks pointing to joined pages (default: True)
+        deduplicate (bool): Write fonts, images and other objects that are identical
+            across the sources only once (default: False)
+        compress_level (int): zlib level to optimize the output with, see
+            `StreamingPdfWriter` (default: None)
+        progress (callable): Called with `(done, total)` after every page. May raise
+            to abort the operation (default: no progress reporting)
+
+    Returns:
+        int: Number of bytes saved by deduplication
+    '''
+    with streaming_output(output_filepath, deduplicate=deduplicate, compress_level=compress_level) as out_pdf:
+        join_pages(out_pdf, entries, import_bookmarks=import_bookmarks, progress=progress)
+    return out_pdf.bytes_saved
@@ -0,0 +1,495 @@
+'''Watch folders and process every PDF file dropped into them.
+
+Scanners and other programs drop files into input folders, each of which has a
+rule saying what to do with them. The rules are read from a JSON config file:
+
+    {
+        "workers": 4,
+        "folders": [
+            {"input": "incoming/rotate", "output": "done/rotated", "op": "rotate",
+             "rotate": "RIGHT", "from": 2, "to": 3},
+            {"input": "incoming/letters", "output": "done/letters", "op": "stamp",
+             "stamp": "letterhead.pdf", "command": "BG", "only_first_page": true},
+            {"input": "incoming/split", "output": "done/pages", "op": "split"},
+            {"input": "incoming/archives", "output": "done/parts", "op": "split",
+             "every": 500, "zip": true},
+            {"input": "incoming/reports", "output": "done/packets", "op": "join",
+             "before": ["cover.pdf"], "after": ["terms.pdf"], "pages": "1-end, !2",
+             "deduplicate": true}
+        ]
+    }
+
+A split rule writes single pages unless it sets `every` (pages per part),
+`bookmarks` (true to start a part at every top-level bookmark) or `max_size` (MB per
+part), see `splitting`. With `zip`, all parts of a file go into one archive
+`name.zip` in the output folder instead of files of their own.
+
+Every rule may also set `compress_level` (see `pdfwriter`) and `poppler` to use the
+Poppler utilities where possible (see `backends`). Relative paths are relative to
+the config file, output folders are created when needed.
+
+New files are picked up as soon as they are closed after writing or moved into a
+folder, using inotify on Linux. Elsewhere, folders are listed every
+`HOT_FOLDER_POLL_INTERVAL` seconds and a file is taken once its size and
+modification time haven't changed between two looks. Files whose names start with a
+dot are ignored, so a program can write `.scan.pdf` and rename it when it is done.
+
+Files are processed by a pool of worker processes, which is never handed more than
+`HOT_FOLDER_QUEUE_PER_WORKER` files per worker ahead of time. Results are written
+under a temporary name in the output folder and renamed once they are complete, so
+nobody ever sees half a file. Next to every processed input, a marker is written:
+`scan.pdf.done` with the output paths, pages and seconds as JSON, or
+`scan.pdf.failed` with the error. Inputs with a marker are skipped, also after a
+restart; delete the marker to process a file again.
+'''
+
+import ctypes
+import json
+import os
+import select
+import shutil
+import signal
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from settings import (HOT_FOLDER_DONE_SUFFIX, HOT_FOLDER_FAILED_SUFFIX, HOT_FOLDER_POLL_INTERVAL,
+                      HOT_FOLDER_QUEUE_PER_WORKER, HOT_FOLDER_REPORT, HOT_FOLDER_REPORT_INTERVAL, ROTATE_DEGREES)
+from backends import join_pdfs, rotate_pdf, split_pdf, stamp_pdf
+from doccache import document_cache
+from pageselect import PageSelectError, parse_page_select
+
+OPS = ('join', 'split', 'rotate', 'stamp')
+
+# from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+class ConfigError(ValueError):
+    '''Raised for hot folder configs that can't be turned into rules.'''
+
+
+def is_candidate(filename):
+    '''bool: True if a file in an input folder is a PDF to be processed'''
+    return filename.lower().endswith('.pdf') and not filename.startswith('.')
+
+
+def marker_paths(filepath):
+    '''tuple: Paths of the done and the failed marker of an input file'''
+    return filepath + HOT_FOLDER_DONE_SUFFIX, filepath + HOT_FOLDER_FAILED_SUFFIX
+
+
+def is_marked(filepath):
+    '''bool: True if an input file has been processed, successfully or not'''
+    return any(os.path.exists(marker) for marker in marker_paths(filepath))
+
+
+def _write_atomically(filepath, text):
+    partial_filepath = os.path.join(os.path.dirname(filepath), f'.{os.path.basename(filepath)}.part')
+    with open(partial_filepath, 'w') as marker_file:
+        marker_file.write(text)
+    os.replace(partial_filepath, filepath)
+
+
+def load_config(config_filepath):
+    '''Read the rules of the hot folders from a JSON config file.
+
+    Args:
+        config_filepath (str): Path of the config, see the module documentation
+
+    Returns:
+        tuple: List of rules, dicts with absolute paths, and the number of workers
+        from the config, None if it doesn't say
+
+    Raises:
+        ConfigError: If a rule is incomplete or contradicts itself
+    '''
+    with open(config_filepath, 'r') as config_file:
+        config = json.load(config_file)
+    basedir = os.path.dirname(os.path.abspath(config_filepath))
+
+    def path(filepath):
+        return os.path.abspath(os.path.join(basedir, os.path.expanduser(filepath)))
+
+    rules = []
+    inputs = set()
+    for folder in config.get('folders', []):
+        rule = dict(folder)
+        if not rule.get('input') or not rule.get('output'):
+            raise ConfigError('every folder needs "input" and "output"')
+        rule['input'], rule['output'] = path(rule['input']), path(rule['output'])
+        if not os.path.isdir(rule['input']):
+            raise ConfigError(f'input folder not found: {rule["input"]}')
+        if rule['input'] == rule['output']:
+            raise ConfigError(f'input and output folder are the same: {rule["input"]}')
+        if rule['input'] in inputs:
+            raise ConfigError(f'input folder used twice: {rule["input"]}')
+        inputs.add(rule['input'])
+        if rule.get('op') not in OPS:
+            raise ConfigError(f'unknown op {rule.get("op")!r}, use one of {", ".join(OPS)}')
+        compress_level = rule.get('compress_level')
+        if compress_level is not None and compress_level not in range(1, 10):
+            raise ConfigError(f'compress_level must be between 1 and 9: {compress_level}')
+        if rule['op'] == 'rotate':
+            if rule.setdefault('rotate', 'RIGHT') not in ROTATE_DEGREES:
+                raise ConfigError(f'unknown rotation: {rule["rotate"]}')
+            for key in ('from', 'to'):
+                if key in rule and (not isinstance(rule[key], int) or rule[key] < 1):
+                    raise ConfigError(f'{key} must be a page number, starting at 1: {rule[key]!r}')
+        if rule['op'] == 'stamp':
+            if not rule.get('stamp'):
+                raise ConfigError('a stamp folder needs "stamp"')
+            rule['stamp'] = path(rule['stamp'])
+            if rule.setdefault('command', 'STAMP') not in ('STAMP', 'BG'):
+                raise ConfigError(f'unknown stamp command: {rule["command"]}')
+        if rule['op'] == 'split':
+            every, max_size = rule.setdefault('every', 1), rule.get('max_size')
+            if not isinstance(every, int) or every < 1:
+                raise ConfigError(f'every must be a positive number of pages: {every!r}')
+            if max_size is not None and (not isinstance(max_size, (int, float)) or max_size <= 0):
+                raise ConfigError(f'max_size must be a positive number of MB: {max_size!r}')
+            if (every != 1) + bool(rule.get('bookmarks')) + (max_size is not None) > 1:
+                raise ConfigError('a split folder takes only one of "every", "bookmarks" and "max_size"')
+        if rule['op'] == 'join':
+            rule['before'] = [path(filepath) for filepath in rule.get('before', [])]
+            rule['after'] = [path(filepath) for filepath in rule.get('after', [])]
+            if rule.get('pages'):
+                try:
+                    parse_page_select(rule['pages'])
+                except PageSelectError as e:
+                    raise ConfigError(f'{rule["input"]}: {e}')
+        os.makedirs(rule['output'], exist_ok=True)
+        rules.append(rule)
+    if not rules:
+        raise ConfigError('no folders to watch')
+    return rules, config.get('workers')
+
+
+def process(rule, filepath):
+    '''Apply a rule to an input file. Runs in the worker processes.
+
+    Args:
+        rule (dict): Rule of the folder the file is in, as returned by `load_config()`
+        filepath (str): Path to PDF File
+
+    Returns:
+        dict: `outputs` (list of written files), `pages` (of the input) and `seconds`
+    '''
+    start = time.perf_counter()
+    op = rule['op']
+    options = {'compress_level': rule.get('compress_level'), 'use_poppler_tools': bool(rule.get('poppler'))}
+    if op == 'split':
+        outputs = _split(rule, filepath, options)
+    else:
+        output_filepath = os.path.join(rule['output'], os.path.basename(filepath))
+        partial_filepath = os.path.join(rule['output'], f'.{os.path.basename(filepath)}.part')
+        try:
+            if op == 'join':
+                entries = ([(f, None) for f in rule['before']] + [(filepath, rule.get('pages') or None)]
+                           + [(f, None) for f in rule['after']])
+                join_pdfs(entries, partial_filepath, deduplicate=bool(rule.get('deduplicate')), **options)
+            elif op == 'rotate':
+                # the same range for scans of different lengths, cut to every file
+                pages = document_cache.pages(filepath)
+                stop = min(rule.get('to') or pages, pages)
+                rotate_pdf(filepath, partial_filepath, (rule.get('from', 1) - 1, stop),
+                           ROTATE_DEGREES[rule['rotate']], extract_pages=bool(rule.get('extract')), **options)
+            else:
+                stamp_pdf(filepath, rule['stamp'], partial_filepath, command=rule['command'],
+                          only_first_page=bool(rule.get('only_first_page')), **options)
+            os.replace(partial_filepath, output_filepath)
+        finally:
+            if os.path.exists(partial_filepath):
+                os.remove(partial_filepath)
+        outputs = [output_filepath]
+    return {'outputs': outputs, 'pages': document_cache.pages(filepath), 'seconds': time.perf_counter() - start}
+
+
+def _split(rule, filepath, options):
+    '''Split a file in a hidden folder next to the output, then rename its parts into place.
+
+    With `zip`, the parts are streamed into a hidden archive that is renamed instead.
+    '''
+    max_size = rule.get('max_size')
+    options = dict(options, every=rule.get('every', 1), bookmarks=bool(rule.get('bookmarks')),
+                   max_bytes=None if max_size is None else int(max_size * 1024 * 1024))
+    if rule.get('zip'):
+        name = f'{os.path.splitext(os.path.basename(filepath))[0]}.zip'
+        archive = os.path.join(rule['output'], name)
+        partial_archive = os.path.join(rule['output'], f'.{name}')
+        try:
+            split_pdf(filepath, archive=partial_archive, **options)
+            os.replace(partial_archive, archive)
+        finally:
+            if os.path.exists(partial_archive):
+                os.remove(partial_archive)
+        return [archive]
+    workdir = tempfile.mkdtemp(dir=rule['output'], prefix='.split-')
+    try:
+        copy_filepath = os.path.join(workdir, os.path.basename(filepath))
+        try:
+            os.link(filepath, copy_filepath)
+        except OSError:
+            shutil.copyfile(filepath, copy_filepath)
+        outputs = []
+        for part_filepath in split_pdf(copy_filepath, **options):
+            output_filepath = os.path.join(rule['output'], os.path.basename(part_filepath))
+            os.replace(part_filepath, output_filepath)
+            outputs.append(output_filepath)
+        return outputs
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _ignore_interrupts():
+    # Ctrl+C goes to the whole process group; the daemon decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class PollingWatcher:
+    '''Finds new files by listing folders every `interval` seconds.
+
+    A file is reported once its size and modification time are the same on two
+    consecutive looks, and only once.
+
+    Args:
+        directories (list): Folders to watch
+        interval (float): Seconds between two looks (default: HOT_FOLDER_POLL_INTERVAL)
+    '''
+
+    def __init__(self, directories, interval=HOT_FOLDER_POLL_INTERVAL):
+        self.directories = directories
+        self.interval = interval
+        self.__next_look = 0
+        self.__sizes = {}
+        self.__reported = set()
+
+    def files(self, timeout):
+        '''New files that are ready, waiting at most `timeout` seconds for them.
+
+        Returns:
+            list: Paths of the new files
+        '''
+        wait = self.__next_look - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0, wait))
+        self.__next_look = time.monotonic() + self.interval
+        ready = []
+        sizes = {}
+        for directory in self.directories:
+            for entry in os.scandir(directory):
+                if not is_candidate(entry.name) or entry.path in self.__reported or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                sizes[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                if self.__sizes.get(entry.path) == sizes[entry.path]:
+                    ready.append(entry.path)
+                    self.__reported.add(entry.path)
+        self.__sizes = sizes
+        return ready
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    '''Finds files that are closed after writing or moved into folders, using the
+    inotify API of Linux through ctypes.
+
+    Args:
+        directories (list): Folders to watch
+
+    Raises:
+        OSError: If inotify isn't available or a folder can't be watched
+    '''
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(None, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.__fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.__directories = {}
+        for directory in directories:
+            watch = libc.inotify_add_watch(self.__fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if watch < 0:
+                self.close()
+                raise OSError(ctypes.get_errno(), 'inotify_add_watch failed', directory)
+            self.__directories[watch] = directory
+
+    def files(self, timeout):
+        '''New files that are ready, waiting at most `timeout` seconds for them.
+
+        Returns:
+            list: Paths of the new files
+        '''
+        if not select.select([self.__fd], [], [], timeout)[0]:
+            return []
+        data = os.read(self.__fd, 64 * 1024)
+        ready = []
+        offset = 0
+        while offset < len(data):
+            watch, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if watch in self.__directories and is_candidate(name):
+                ready.append(os.path.join(self.__directories[watch], name))
+        return ready
+
+    def close(self):
+        os.close(self.__fd)
+
+
+def watcher(directories, poll_interval=HOT_FOLDER_POLL_INTERVAL):
+    '''An `InotifyWatcher` where inotify is available, a `PollingWatcher` elsewhere.'''
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directories)
+        except OSError:
+            pass
+    return PollingWatcher(directories, interval=poll_interval)
+
+
+class HotFolderDaemon:
+    '''Processes the files dropped into the input folders of a set of rules.
+
+    Args:
+        rules (list): Rules as returned by `load_config()`
+        workers (int): Number of worker processes; 0 or None uses every core (default: None)
+        poll_interval (float): Seconds between two looks into folders that can't be
+            watched with inotify (default: HOT_FOLDER_POLL_INTERVAL)
+        report_interval (float): Seconds between two throughput reports (default:
+            HOT_FOLDER_REPORT_INTERVAL)
+        report (callable): Called with every line reporting a processed file or the
+            throughput, None to stay quiet (default: None)
+        error (callable): Called with every line reporting a failed file (default: None)
+    '''
+
+    def __init__(self, rules, workers=None, poll_interval=HOT_FOLDER_POLL_INTERVAL,
+                 report_interval=HOT_FOLDER_REPORT_INTERVAL, report=None, error=None):
+        self.rules = {rule['input']: rule for rule in rules}
+        self.workers = workers or os.cpu_count() or 1
+        self.poll_interval = poll_interval
+        self.report_interval = report_interval
+        self.__report = report
+        self.__error = error
+        self.__stopping = False
+        self.files = 0
+        self.failed = 0
+        self.pages = 0
+        self.__recent = deque()
+        self.__started = None
+        self.__busy_seconds = 0
+        self.__busy_since = None
+
+    def stop(self, *args):
+        '''Stop taking new files. Files being processed are finished first.'''
+        self.__stopping = True
+
+    def __existing(self):
+        '''Files that were dropped while the daemon wasn't running.'''
+        for directory in self.rules:
+            for name in sorted(os.listdir(directory)):
+                filepath = os.path.join(directory, name)
+                if is_candidate(name) and os.path.isfile(filepath):
+                    yield filepath
+
+    def throughput(self):
+        '''str: Files and pages processed so far, the pages per second over the time
+        files were being processed and over the last report interval'''
+        now = time.monotonic()
+        while self.__recent and self.__recent[0][0] < now - self.report_interval:
+            self.__recent.popleft()
+        seconds = now - self.__started if self.__started is not None else 0
+        busy_seconds = self.__busy_seconds + (now - self.__busy_since if self.__busy_since is not None else 0)
+        recent_seconds = min(seconds, self.report_interval)
+        return HOT_FOLDER_REPORT.format(
+            files=self.files, failed=self.failed, pages=self.pages, seconds=seconds,
+            pages_per_second=self.pages / busy_seconds if busy_seconds else 0,
+            recent_pages_per_second=sum(pages for _, pages in self.__recent) / recent_seconds if recent_seconds else 0)
+
+    def __finish(self, filepath, future):
+        done_marker, failed_marker = marker_paths(filepath)
+        try:
+            result = future.result()
+        except Exception as e:
+            self.failed += 1
+            _write_atomically(failed_marker, f'{type(e).__name__}: {e}\n')
+            if self.__error:
+                self.__error(f'{filepath}: {e}')
+            return
+        self.files += 1
+        self.pages += result['pages']
+        self.__recent.append((time.monotonic(), result['pages']))
+        _write_atomically(done_marker, json.dumps(result, indent=4))
+        if self.__report:
+            outputs = result['outputs']
+            more = f' and {len(outputs) - 1} more' if len(outputs) > 1 else ''
+            self.__report(f'{filepath} -> {outputs[0]}{more}')
+
+    def run(self, once=False):
+        '''Process files until stopped by `stop()`, SIGTERM or Ctrl+C.
+
+        Args:
+            once (bool): Only process the files that are there already and return (default: False)
+
+        Returns:
+            str: The final throughput report
+        '''
+        self.__started = time.monotonic()
+        if not once and sys.platform != 'win32' and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+        # watch before looking at what is there, so that no file slips through in between
+        files_watcher = None if once else watcher(list(self.rules), poll_interval=self.poll_interval)
+        pending = deque(filepath for filepath in self.__existing() if not is_marked(filepath))
+        queued = set(pending)
+        in_flight = {}
+        ahead = self.workers * HOT_FOLDER_QUEUE_PER_WORKER
+        next_report = time.monotonic() + self.report_interval
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_ignore_interrupts) as pool:
+                while True:
+                    try:
+                        while pending and not self.__stopping and len(in_flight) < ahead:
+                            filepath = pending.popleft()
+                            rule = self.rules[os.path.dirname(filepath)]
+                            in_flight[pool.submit(process, rule, filepath)] = filepath
+                            if self.__busy_since is None:
+                                self.__busy_since = time.monotonic()
+                        if self.__stopping or once:
+                            if not in_flight:
+                                break
+                            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        else:
+                            finished = [future for future in in_flight if future.done()]
+                            if not finished:
+                                for filepath in files_watcher.files(timeout=0.1 if in_flight else 1.0):
+                                    if filepath not in queued and not is_marked(filepath):
+                                        queued.add(filepath)
+                                        pending.append(filepath)
+                        for future in finished:
+                            filepath = in_flight.pop(future)
+                            queued.discard(filepath)
+                            self.__finish(filepath, future)
+                        if not in_flight and self.__busy_since is not None:
+                            self.__busy_seconds += time.monotonic() - self.__busy_since
+                            self.__busy_since = None
+                        if self.__report and time.monotonic() >= next_report:
+                            self.__report(self.throughput())
+                            next_report = time.monotonic() + self.report_interval
+                    except KeyboardInterrupt:
+                        self.stop()
+        finally:
+            if files_watcher is not None:
+                files_watcher.close()
+        return self.throughput()
@@ -0,0 +1,177 @@
+'''Background jobs for long running PDF operations.
+
+The Tk mainloop must never wait for a PDF to be written, so the tab managers wrap
+their work into `Job` instances and submit them to a `JobQueue`. The queue runs one
+job at a time on a worker thread, while the user interface keeps polling it with
+`after()` to show progress and to pick up finished jobs.
+'''
+
+import threading
+import time
+from collections import deque
+from queue import Queue
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class JobCancelled(Exception):
+    '''Raised inside a running job once it has been cancelled.'''
+
+
+class Job:
+    '''A single PDF operation to be run by a `JobQueue`.
+
+    `func` gets called with `*args`, `**kwargs` and a `progress` keyword argument. The
+    operation is expected to call `progress(done, total)` after every page, which
+    is also where a cancelled job gets aborted by raising `JobCancelled`.
+
+    Args:
+        func (callable): Operation to run, e.g. one of the functions in `engine`
+        title (str): Short description shown in the status bar (default: 'Job')
+        on_success (callable): Called with the job on the Tk thread once it is done (default: None)
+        on_failure (callable): Called with the job on the Tk thread if it failed (default: None)
+    '''
+
+    def __init__(self, func, *args, title='Job', on_success=None, on_failure=None, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.title = title
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.status = PENDING
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.seconds = None
+        self.__cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        '''bool: True if the job has been asked to stop'''
+        return self.__cancel_event.is_set()
+
+    def cancel(self):
+        '''Ask the job to stop after the page it is currently working on.'''
+        self.__cancel_event.set()
+
+    def report_progress(self, done, total=None):
+        '''Progress callback handed to the operation.
+
+        Args:
+            done (int): Number of pages processed so far
+            total (int): Total number of pages, if known (default: None)
+
+        Raises:
+            JobCancelled: If the job has been cancelled in the meantime
+        '''
+        self.done = done
+        if total is not None:
+            self.total = total
+        if self.cancelled:
+            raise JobCancelled(self.title)
+
+    @property
+    def pages_per_second(self):
+        '''float: Throughput of a finished job, None if unknown'''
+        if self.seconds and self.done:
+            return self.done / self.seconds
+        return None
+
+    def progress_text(self):
+        '''str: Human readable progress, e.g. `Joining… 12/80 pages`'''
+        if self.total:
+            return f'{self.title}… {self.done}/{self.total} pages'
+        return f'{self.title}…'
+
+    def run(self):
+        '''Run the operation and record its outcome. Called by the worker thread.'''
+        if self.cancelled:
+            self.status = CANCELLED
+            return
+        self.status = RUNNING
+        start = time.perf_counter()
+        try:
+            self.result = self.func(*self.args, progress=self.report_progress, **self.kwargs)
+            self.seconds = time.perf_counter() - start
+        except JobCancelled:
+            self.status = CANCELLED
+        except Exception as e:
+            self.error = e
+            self.status = FAILED
+        else:
+            self.status = DONE
+
+
+class JobQueue:
+    '''First in, first out queue of jobs processed by a single worker thread.
+
+    Jobs are run one after another, so a new job can be set up and submitted while
+    another one is still running. Apart from `submit()` and `cancel_all()`, the queue
+    is meant to be used from one thread only, usually the Tk mainloop calling
+    `poll()` periodically.
+    '''
+
+    def __init__(self):
+        self.__queue = Queue()
+        self.__jobs = deque()
+        self.__finished = deque()
+        self.__lock = threading.Lock()
+        self.__worker = threading.Thread(target=self.__work, name='JobQueue', daemon=True)
+        self.__worker.start()
+
+    def __work(self):
+        while True:
+            job = self.__queue.get()
+            job.run()
+            with self.__lock:
+                self.__jobs.remove(job)
+                self.__finished.append(job)
+
+    def submit(self, job):
+        '''Queue a job to be run after all previously submitted ones.
+
+        Args:
+            job (Job): Job to run
+
+        Returns:
+            Job: The submitted job
+        '''
+        with self.__lock:
+            self.__jobs.append(job)
+        self.__queue.put(job)
+        return job
+
+    @property
+    def current(self):
+        '''Job: The job being run right now, or None'''
+        with self.__lock:
+            return next((job for job in self.__jobs if job.status == RUNNING), None)
+
+    @property
+    def pending(self):
+        '''int: Number of jobs waiting to be run'''
+        with self.__lock:
+            return sum(1 for job in self.__jobs if job.status == PENDING)
+
+    def cancel_all(self):
+        '''Cancel the running job and every job still waiting in the queue.'''
+        with self.__lock:
+            for job in self.__jobs:
+                job.cancel()
+
+    def poll(self):
+        '''Collect the jobs that have finished since the last call.
+
+        Returns:
+            list: Finished jobs in the order they finished
+        '''
+        with self.__lock:
+            finished = list(self.__finished)
+            self.__finished.clear()
+        return finished
@@ -0,0 +1,158 @@
+'''Model of the list of files in the Join tab.
+
+The Treeview of the Join tab only displays a `JoinList`, it doesn't hold any state
+of its own: rows are inserted with the ids of the model as item ids, and after a
+change only the rows the model reports as changed are moved, updated or deleted.
+Saving reads the entries straight from the model without a single call into Tk.
+
+The order of the list is a plain list of ids, so moving a selection of `k` entries
+swaps `k` pairs and removing entries rebuilds the order in a single pass, no matter
+how many entries are removed.
+'''
+
+import os
+from itertools import count
+
+from settings import PAGE_COUNT_ERROR, PAGE_COUNT_PLACEHOLDER, PDF_FILENAME, PDF_FILEPATH, PDF_PAGES, PDF_PAGESELECT
+
+
+class JoinEntry:
+    '''A file in the join list.
+
+    Attributes:
+        filepath (str): Path to PDF File
+        page_select (str): Page selection as entered, empty for all pages
+        pages (int): Number of pages, None while they are being counted
+        unreadable (bool): True if the pages couldn't be counted
+    '''
+
+    __slots__ = ('filepath', 'page_select', 'pages', 'unreadable')
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.page_select = ''
+        self.pages = None
+        self.unreadable = False
+
+    @property
+    def values(self):
+        '''tuple: Values of the row showing the entry, indexed by `PDF_FILENAME` etc.'''
+        values = [None] * 4
+        values[PDF_FILENAME] = os.path.basename(self.filepath)
+        values[PDF_PAGESELECT] = self.page_select
+        values[PDF_FILEPATH] = self.filepath
+        if self.pages is not None:
+            values[PDF_PAGES] = self.pages
+        else:
+            values[PDF_PAGES] = PAGE_COUNT_ERROR if self.unreadable else PAGE_COUNT_PLACEHOLDER
+        return tuple(values)
+
+
+class JoinList:
+    '''Ordered entries of the join list, addressed by ids that never change.'''
+
+    def __init__(self):
+        self.__order = []
+        self.__entries = {}
+        self.__positions = {}
+        self.__ids = (f'J{n}' for n in count())
+
+    def __len__(self):
+        return len(self.__order)
+
+    def __contains__(self, entry_id):
+        return entry_id in self.__entries
+
+    def __getitem__(self, entry_id):
+        return self.__entries[entry_id]
+
+    def __iter__(self):
+        return iter(self.__order)
+
+    def index(self, entry_id):
+        '''int: Position of an entry in the list'''
+        return self.__positions[entry_id]
+
+    def extend(self, filepaths):
+        '''Append files to the list.
+
+        Args:
+            filepaths (iterable): Paths to PDF Files
+
+        Returns:
+            list: Ids of the new entries
+        '''
+        entry_ids = []
+        for filepath in filepaths:
+            entry_id = next(self.__ids)
+            self.__entries[entry_id] = JoinEntry(filepath)
+            self.__positions[entry_id] = len(self.__order)
+            self.__order.append(entry_id)
+            entry_ids.append(entry_id)
+        return entry_ids
+
+    def remove(self, entry_ids):
+        '''Remove entries from the list.
+
+        Args:
+            entry_ids (iterable): Ids of the entries to remove, unknown ids are ignored
+        '''
+        removed = {entry_id for entry_id in entry_ids if entry_id in self.__entries}
+        if not removed:
+            return
+        for entry_id in removed:
+            del self.__entries[entry_id]
+        self.__order = [entry_id for entry_id in self.__order if entry_id not in removed]
+        self.__positions = {entry_id: position for position, entry_id in enumerate(self.__order)}
+
+    def __swap(self, position, other):
+        first, second = self.__order[position], self.__order[other]
+        self.__order[position], self.__order[other] = second, first
+        self.__positions[first], self.__positions[second] = other, position
+        return first, second
+
+    def move_up(self, entry_ids):
+        '''Move entries up by one, unless the first of them is at the top already.
+
+        Args:
+            entry_ids (iterable): Ids of the entries to move
+
+        Returns:
+            set: Ids of all entries whose position changed
+        '''
+        positions = sorted(self.__positions[entry_id] for entry_id in entry_ids)
+        if not positions or positions[0] == 0:
+            return set()
+        changed = set()
+        for position in positions:
+            changed.update(self.__swap(position, position - 1))
+        return changed
+
+    def move_down(self, entry_ids):
+        '''Move entries down by one, unless the last of them is at the bottom already.
+
+        Args:
+            entry_ids (iterable): Ids of the entries to move
+
+        Returns:
+            set: Ids of all entries whose position changed
+        '''
+        positions = sorted((self.__positions[entry_id] for entry_id in entry_ids), reverse=True)
+        if not positions or positions[0] == len(self.__order) - 1:
+            return set()
+        changed = set()
+        for position in positions:
+            changed.update(self.__swap(position, position + 1))
+        return changed
+
+    def entries(self):
+        '''The list as taken by `join_pdfs`.
+
+        Returns:
+            list: `(filepath, page selection or None)` tuples in list order
+        '''
+        entries = []
+        for entry_id in self.__order:
+            entry = self.__entries[entry_id]
+            entries.append((entry.filepath, entry.page_select if entry.page_select.strip() else None))
+        return entries
@@ -0,0 +1,279 @@
+'''Page numbers drawn from cached glyph templates.
+
+Numbering pages with a separate tool means one more full parse and write of the
+document. A `PageNumberer` numbers the pages on their way into the output instead,
+in the same pass as stamping (see `engine.stamp_pdf`) or as a stage of a `Pipeline`.
+
+The output gets a single font resource, Helvetica, one of the standard fonts every
+PDF viewer has, so nothing is embedded, and one Form XObject per character that
+occurs in the numbers, each drawing that character at a size of one unit. The parts
+of the text that are the same on every page, like `Page ` and ` of 120` in
+`Page {page} of {pages}`, get one Form XObject each, drawn from the glyphs. A page
+number is a content stream of a few dozen bytes that scales and places these
+templates, so numbering 10,000 pages adds 10,000 tiny streams and nothing else.
+
+PyPDF2 and `engine` are only imported once numbers get drawn, so a `PageNumberer`
+can describe a job that is served from a `ResultCache` without loading them.
+'''
+
+from collections import namedtuple
+from string import Formatter
+
+from settings import NUMBER_FONT_SIZE, NUMBER_FORMAT, NUMBER_MARGIN, NUMBER_POSITION, NUMBER_POSITIONS
+
+# short, since they are repeated in every number
+GLYPH_XOBJECT_NAME = '/PBG'
+RUN_XOBJECT_NAME = '/PBR'
+
+# advance widths of the printable ASCII characters in Helvetica, in thousandths of the font size
+HELVETICA_WIDTHS = dict(zip(
+    ' !"#$%&\'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_`abcdefghijklmnopqrstuvwxyz{|}~',
+    (278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+     556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+     1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+     667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+     333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+     556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584)))
+
+# text drawn at once, from a template if `xobject` isn't None, and its width at a font size of 1
+_Run = namedtuple('_Run', 'text xobject width')
+# where the page number goes into the text, and how it is formatted
+_PageField = namedtuple('_PageField', 'spec conversion')
+
+# how a page's /Rotate turns its displayed x and y axes in user space
+ROTATIONS = {0: (1, 0, 0, 1), 90: (0, 1, -1, 0), 180: (-1, 0, 0, -1), 270: (0, -1, 1, 0)}
+
+
+def _number(value):
+    '''Shortest PDF notation of a coordinate.'''
+    text = f'{value:.3f}'.rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+
+def _pdf_string(char):
+    return '(\\' + char + ')' if char in '()\\' else f'({char})'
+
+
+def _width(text):
+    '''Advance width of `text` at a font size of 1.'''
+    return sum(HELVETICA_WIDTHS[char] for char in text) / 1000
+
+
+def _xobject_name(xobjects, prefix, xobject):
+    '''Add `xobject` to a page's XObjects under a name starting with `prefix` and return the name.'''
+    from PyPDF2.generic import NameObject
+
+    name, n = prefix, 0
+    while name in xobjects and xobjects.raw_get(name) != xobject:
+        n += 1
+        name = f'{prefix}_{n}'
+    xobjects[NameObject(name)] = xobject
+    return name
+
+
+class PageNumberer:
+    '''Draws page numbers on top of pages.
+
+    An instance is a `Pipeline` stage: `prepare()` binds it to an output, after which
+    calling it with a page and its zero-based number in the output numbers the page.
+    It can be prepared again for the next output.
+
+    Args:
+        format (str): Text of a page number, `{page}` is replaced by the number of the
+            page and `{pages}` by the number of the last page (default: `NUMBER_FORMAT`)
+        position (str): One of `NUMBER_POSITIONS` (default: `NUMBER_POSITION`)
+        font_size (float): Font size in points (default: `NUMBER_FONT_SIZE`)
+        start (int): Number of the first page (default: 1)
+
+    Raises:
+        ValueError: If the format is broken or contains characters that can't be drawn,
+            or the position or font size make no sense
+    '''
+
+    def __init__(self, format=NUMBER_FORMAT, position=NUMBER_POSITION, font_size=NUMBER_FONT_SIZE, start=1):
+        if position not in NUMBER_POSITIONS:
+            raise ValueError(f'unknown number position: {position}')
+        if font_size <= 0:
+            raise ValueError(f'font size must be positive: {font_size}')
+        try:
+            literal = format.format(page='', pages='')
+        except (IndexError, KeyError, ValueError) as e:
+            raise ValueError(f'invalid number format {format!r}: {e!r}')
+        unsupported = set(literal) - set(HELVETICA_WIDTHS)
+        if unsupported:
+            raise ValueError(f'number format {format!r} contains characters that can\'t be drawn: '
+                             f'{"".join(sorted(unsupported))}')
+        self.format = format
+        self.position = position
+        self.font_size = font_size
+        self.start = start
+        self.__out_pdf = None
+
+    def prepare(self, out_pdf, pages):
+        '''Add the font to an output and forget the templates of the previous one.
+
+        Args:
+            out_pdf (PdfFileWriter): Writer the numbered pages are going to be added to
+            pages (int): Number of pages of the output, for `{pages}`
+        '''
+        from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+        self.__out_pdf = out_pdf
+        self.__last = self.start + pages - 1
+        font = out_pdf._addObject(DictionaryObject({
+            NameObject('/Type'): NameObject('/Font'),
+            NameObject('/Subtype'): NameObject('/Type1'),
+            NameObject('/BaseFont'): NameObject('/Helvetica'),
+            NameObject('/Encoding'): NameObject('/WinAnsiEncoding'),
+        }))
+        self.__glyph_resources = out_pdf._addObject(DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F'): font}),
+        }))
+        self.__glyphs = {}
+        stream = DecodedStreamObject()
+        stream.setData(b'q\n')
+        self.__save_state = out_pdf._addObject(stream)
+        segments = []
+        formatter = Formatter()
+        for literal, field, spec, conversion in formatter.parse(self.format):
+            constant = literal
+            if field == 'pages':
+                constant += formatter.format_field(formatter.convert_field(self.__last, conversion), spec)
+            if constant:
+                if segments and isinstance(segments[-1], str):
+                    segments[-1] += constant
+                else:
+                    segments.append(constant)
+            if field == 'page':
+                segments.append(_PageField(spec, conversion))
+        self.__segments = [self.__run(segment) if isinstance(segment, str) else segment for segment in segments]
+
+    def text(self, page_number):
+        '''str: Page number shown on the page with the zero-based number `page_number`'''
+        return self.format.format(page=self.start + page_number, pages=self.__last)
+
+    def __glyph(self, char):
+        '''Form XObject drawing `char` at a font size of 1, added to the output once.'''
+        if char not in self.__glyphs:
+            from PyPDF2.generic import ArrayObject, DecodedStreamObject, FloatObject, NameObject
+
+            stream = DecodedStreamObject()
+            stream.setData(f'BT /F 1 Tf {_pdf_string(char)} Tj ET'.encode('latin-1'))
+            stream.update({
+                NameObject('/Type'): NameObject('/XObject'),
+                NameObject('/Subtype'): NameObject('/Form'),
+                NameObject('/BBox'): ArrayObject(FloatObject(v) for v in (0, -0.25, HELVETICA_WIDTHS[char] / 1000, 1)),
+                NameObject('/Resources'): self.__glyph_resources,
+            })
+            self.__glyphs[char] = self.__out_pdf._addObject(stream)
+        return self.__glyphs[char]
+
+    def __glyph_name(self, xobjects, char):
+        return _xobject_name(xobjects, f'{GLYPH_XOBJECT_NAME}{ord(char)}', self.__glyph(char))
+
+    def __draw(self, text, xobjects):
+        '''Operators drawing `text` from the glyphs, which are added to `xobjects`.
+
+        Returns:
+            tuple: The operators and how far they moved the origin
+        '''
+        operators = []
+        moved = advance = 0
+        for char in text:
+            if char != ' ':
+                if advance:
+                    operators.append(f'1 0 0 1 {_number(advance)} 0 cm')
+                    moved += advance
+                    advance = 0
+                operators.append(f'{self.__glyph_name(xobjects, char)} Do')
+            advance += HELVETICA_WIDTHS[char] / 1000
+        return operators, moved
+
+    def __run(self, text):
+        '''`_Run` of a text that is the same on every page, drawn by a Form XObject.'''
+        from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+
+        width = _width(text)
+        if not text.strip():
+            return _Run(text, None, width)
+        glyphs = DictionaryObject()
+        stream = DecodedStreamObject()
+        operators, _ = self.__draw(text, glyphs)
+        stream.setData(' '.join(operators).encode())
+        stream.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): ArrayObject(FloatObject(v) for v in (0, -0.25, width, 1)),
+            NameObject('/Resources'): DictionaryObject({NameObject('/XObject'): glyphs}),
+        })
+        return _Run(text, self.__out_pdf._addObject(stream), width)
+
+    def __origin(self, page, width):
+        '''Where the text starts in user space and how its axes run, honoring /Rotate.'''
+        box = page.cropBox
+        llx, lly = float(box.getLowerLeft_x()), float(box.getLowerLeft_y())
+        w, h = float(box.getWidth()), float(box.getHeight())
+        # /Rotate may be an indirect object, which only the item lookup resolves
+        rotation = int(page['/Rotate']) % 360 if '/Rotate' in page else 0
+        if rotation not in ROTATIONS:
+            rotation = 0
+        display_width, display_height = (w, h) if rotation in (0, 180) else (h, w)
+        vertical, horizontal = self.position.split('-')
+        dx = {'left': NUMBER_MARGIN, 'center': (display_width - width) / 2,
+              'right': display_width - NUMBER_MARGIN - width}[horizontal]
+        dy = NUMBER_MARGIN if vertical == 'bottom' else display_height - NUMBER_MARGIN - self.font_size
+        x, y = {0: (dx, dy), 90: (w - dy, dx), 180: (w - dx, h - dy), 270: (dy, h - dx)}[rotation]
+        return llx + x, lly + y, ROTATIONS[rotation]
+
+    def __call__(self, page, page_number):
+        '''Number a page in place. The page must belong to a private reader.
+
+        Args:
+            page (PageObject): Page to number
+            page_number (int): Zero-based number of the page in the output
+
+        Returns:
+            PageObject: The numbered page
+        '''
+        from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+        from engine import content_streams
+
+        if '/Resources' not in page:
+            page[NameObject('/Resources')] = DictionaryObject()
+        resources = page['/Resources']
+        if '/XObject' not in resources:
+            resources[NameObject('/XObject')] = DictionaryObject()
+        xobjects = resources['/XObject']
+
+        number = self.start + page_number
+        parts = []
+        formatter = Formatter()
+        for segment in self.__segments:
+            if isinstance(segment, _PageField):
+                text = formatter.format_field(formatter.convert_field(number, segment.conversion), segment.spec)
+                segment = _Run(text, None, _width(text))
+            parts.append(segment)
+
+        size = self.font_size
+        x, y, (a, b, c, d) = self.__origin(page, sum(part.width for part in parts) * size)
+        operators = [f'\nQ\nq {" ".join(_number(v) for v in (a * size, b * size, c * size, d * size, x, y))} cm']
+        for n, (text, run, width) in enumerate(parts):
+            moved = 0
+            if run is not None:
+                operators.append(f'{_xobject_name(xobjects, f"{RUN_XOBJECT_NAME}{n}", run)} Do')
+            else:
+                drawn, moved = self.__draw(text, xobjects)
+                operators.extend(drawn)
+            if n < len(parts) - 1:
+                operators.append(f'1 0 0 1 {_number(width - moved)} 0 cm')
+        operators.append('Q\n')
+
+        # the page's own contents run between a shared `q` and the number's `Q`, so
+        # whatever state they leave behind doesn't move or hide the number
+        stream = DecodedStreamObject()
+        stream.setData(' '.join(operators).encode())
+        contents = ArrayObject([self.__save_state])
+        contents.extend(content_streams(page))
+        contents.append(self.__out_pdf._addObject(stream))
+        page[NameObject('/Contents')] = contents
+        return page
@@ -0,0 +1,142 @@
+'''Page selections like `1-3, 7, 10-end, !8` turned into as few page slices as possible.
+
+A selection is a comma separated list of items, whitespace doesn't matter:
+
+* `7`: a single page, counted from 1
+* `3-9`: a range of pages, `9-3` is the same range in reverse order
+* `end`: the last page, allowed wherever a page number is, e.g. `5-end` or `end-1`
+* `odd`, `even`: every odd or even page, or, as in `1-20odd`, those of a range
+* `!…`: an item prefixed with `!` removes its pages from the selection, no matter
+  where in the list it appears
+
+Pages are selected in the order of the items. Items that overlap or touch the one
+before them in ascending order are merged, so a page in both `1-5` and `3-8` is
+only selected once, and `1,2,3,…,400` is a single range of 400 pages.
+
+The compiled selection is a tuple of zero-based `(start, stop)` tuples, or
+`(start, stop, step)` for reversed ranges and odd or even pages, so every slice is
+`range(*slice)`. Compiled selections are cached per selection and page count.
+'''
+
+import re
+from functools import lru_cache
+
+from settings import PAGE_SELECT_CACHE_SIZE
+
+ITEM = re.compile(r'^(?P<exclude>!)?(?:(?P<first>\d+|end)(?:-(?P<last>\d+|end))?)?(?P<parity>odd|even)?$')
+
+
+class PageSelectError(ValueError):
+    '''Raised for page selections that can't be parsed or don't fit the document.'''
+
+
+@lru_cache(maxsize=PAGE_SELECT_CACHE_SIZE)
+def parse_page_select(page_select):
+    '''Check the syntax of a page selection and split it into its items.
+
+    Args:
+        page_select (str): Page selection as described in the module documentation
+
+    Returns:
+        tuple: `(exclude, first, last, parity)` tuples, one per item, with `first` and
+        `last` being page numbers, `'end'` or None
+
+    Raises:
+        PageSelectError: If the selection is empty or an item can't be parsed
+    '''
+    items = []
+    for item in re.sub(r'\s+', '', page_select.lower()).split(','):
+        match = ITEM.match(item)
+        if not item or match is None or not (match['first'] or match['parity']):
+            raise PageSelectError(f'invalid page selection: {item or page_select!r}')
+        items.append((bool(match['exclude']), match['first'], match['last'] or match['first'], match['parity']))
+    return tuple(items)
+
+
+def _page_number(bound, pages):
+    if bound == 'end':
+        return pages
+    page = int(bound)
+    if not 1 <= page <= pages:
+        raise PageSelectError(f'page {page} is out of range 1-{pages}')
+    return page
+
+
+def _item_ranges(items, pages):
+    '''One-based `range`s of pages selected by the non-excluding items, overlapping
+    ascending neighbours merged.'''
+    ranges = []
+    for exclude, first, last, parity in items:
+        if exclude:
+            continue
+        first = _page_number(first, pages) if first else 1
+        last = _page_number(last, pages) if last else pages
+        step = 1 if first <= last else -1
+        if parity:
+            # start on the first page of the right parity in the direction of the range
+            if (first % 2 == 1) != (parity == 'odd'):
+                first += step
+            step *= 2
+        pages_range = range(first, last + (1 if step > 0 else -1), step)
+        previous = ranges[-1] if ranges else None
+        if (previous is not None and previous.step == step == 1 and pages_range
+                and previous.start <= pages_range.start <= previous.stop):
+            ranges[-1] = range(previous.start, max(previous.stop, pages_range.stop))
+        elif pages_range:
+            ranges.append(pages_range)
+    return ranges
+
+
+def _excluded(items, pages):
+    '''Set of one-based page numbers removed by the excluding items.'''
+    removing = tuple((False, first, last, parity) for exclude, first, last, parity in items if exclude)
+    return {page for pages_range in _item_ranges(removing, pages) for page in pages_range}
+
+
+def _slices(page_numbers):
+    '''Cut a sequence of one-based page numbers into runs with a constant step.'''
+    runs = []
+    for page in page_numbers:
+        if runs:
+            start, step, last = runs[-1]
+            if step is None and page - last in (1, -1, 2, -2):
+                runs[-1] = (start, page - last, page)
+                continue
+            if step is not None and page - last == step:
+                runs[-1] = (start, step, page)
+                continue
+        runs.append((page, None, page))
+    slices = []
+    for start, step, last in runs:
+        step = step or 1
+        # zero-based, `last - 1 + step` may be -1 for a reversed run down to the first page
+        slices.append((start - 1, last - 1 + step) if step == 1 else (start - 1, last - 1 + step, step))
+    return slices
+
+
+@lru_cache(maxsize=PAGE_SELECT_CACHE_SIZE)
+def compile_page_select(page_select, pages):
+    '''Compile a page selection for a document with `pages` pages.
+
+    Args:
+        page_select (str): Page selection as described in the module documentation
+        pages (int): Number of pages of the document
+
+    Returns:
+        tuple: Zero-based `(start, stop)` or `(start, stop, step)` tuples in selection order
+
+    Raises:
+        PageSelectError: If the selection can't be parsed, refers to pages the
+            document doesn't have or doesn't select any page
+    '''
+    items = parse_page_select(page_select)
+    ranges = _item_ranges(items, pages)
+    excluded = _excluded(items, pages)
+    if excluded:
+        page_numbers = (page for pages_range in ranges for page in pages_range if page not in excluded)
+    else:
+        page_numbers = (page for pages_range in ranges for page in pages_range)
+    slices = tuple(_slices(page_numbers))
+    if not slices:
+        raise PageSelectError(f'page selection {page_select!r} selects no pages')
+    return slices
@@ -0,0 +1,380 @@
+'''Read the page count of a PDF without parsing the whole document.
+
+PyPDF2 reads the complete cross reference table and flattens the page tree before it
+can tell how many pages a document has. For listing files that is a lot of work for
+a single integer, so `probe_pages()` memory-maps the file and only looks at what it
+needs: `startxref`, the trailer, the `/Root` catalog and the `/Count` entry of the
+root of the page tree.
+
+Classic cross reference tables (including incremental updates) and cross reference
+streams with Flate compression and PNG predictors are supported, as are objects
+stored in object streams. Anything else raises `ProbeError`, and callers are
+expected to fall back to PyPDF2 then.
+'''
+
+import mmap
+import re
+import zlib
+
+TAIL_SIZE = 2048
+MAX_XREF_SECTIONS = 64
+
+STARTXREF = re.compile(rb'startxref\s+(\d+)')
+OBJECT_HEADER = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b')
+SUBSECTION = re.compile(rb'\s*(\d+)\s+(\d+)\s*?[\r\n]+')
+ENTRY = re.compile(rb'(\d{10}) (\d{5}) ([nf])')
+INTEGER = re.compile(rb'[+-]?\d+')
+TOKEN = re.compile(rb'(?:[\x00\t\n\x0c\r ]|%[^\r\n]*)*'
+                   rb'(<<|>>|<[0-9A-Fa-f\x00\t\n\x0c\r ]*>|[\[\](){}]|/?[^\x00\t\n\x0c\r ()<>\[\]{}/%]+|/)')
+NUMBER_ARRAY = re.compile(rb'\[[\d\x00\t\n\x0c\r .+R-]*\]')
+FLATE_ONLY = re.compile(rb'/Filter\s*\[\s*/FlateDecode\s*\]')
+
+# stands in for nested dictionaries and arrays in parsed dictionaries
+NESTED = object()
+
+
+class ProbeError(Exception):
+    '''Raised if a file can't be probed and needs to be parsed properly.'''
+
+
+class Ref:
+    '''Indirect reference `n g R` found while probing.'''
+
+    def __init__(self, idnum, generation):
+        self.idnum = idnum
+        self.generation = generation
+
+
+def _tokens(data, pos):
+    '''Yield `(token, position after token)` from `data`, starting at `pos`.
+
+    Strings are skipped as a whole and yielded as `b'('`, hex strings as `b'<'`.
+    Arrays of numbers and references, like the `/Kids` of a page tree node, are
+    skipped as a whole as well and yielded as `b'[]'`.
+    '''
+    end = len(data)
+    while True:
+        match = TOKEN.match(data, pos)
+        if match is None or match.end() > end:
+            return
+        token, pos = match.group(1), match.end()
+        if token == b'[':
+            array = NUMBER_ARRAY.match(data, match.start(1))
+            if array:
+                yield b'[]', array.end()
+                pos = array.end()
+                continue
+        elif token == b'(':
+            depth = 1
+            while depth and pos < end:
+                c = data[pos:pos + 1]
+                if c == b'\\':
+                    pos += 1
+                elif c == b'(':
+                    depth += 1
+                elif c == b')':
+                    depth -= 1
+                pos += 1
+        elif token.startswith(b'<') and token != b'<<':
+            token = b'<'
+        yield token, pos
+
+
+def _parse_dict(data, pos):
+    '''Parse the top level of the dictionary starting at `pos`.
+
+    Integers, names and indirect references are kept as values, nested dictionaries
+    and arrays are skipped and stored as `NESTED`, anything else as its first token.
+
+    Returns:
+        tuple: The dictionary and the position after its closing `>>`
+    '''
+    tokens = _tokens(data, pos)
+    token, _ = next(tokens, (None, pos))
+    if token != b'<<':
+        raise ProbeError('dictionary expected')
+    items, depth = [], 0
+    for token, pos in tokens:
+        if depth:
+            if token in (b'<<', b'['):
+                depth += 1
+            elif token in (b'>>', b']'):
+                depth -= 1
+        elif token == b'[]':
+            items.append(NESTED)
+        elif token in (b'<<', b'['):
+            depth = 1
+            items.append(NESTED)
+        elif token == b'>>':
+            break
+        else:
+            items.append(token)
+    else:
+        raise ProbeError('unterminated dictionary')
+    result, i = {}, 0
+    while i + 1 < len(items):
+        key = items[i]
+        if key is NESTED or not key.startswith(b'/'):
+            raise ProbeError('malformed dictionary')
+        if items[i + 3:i + 4] == [b'R'] and all(_is_int(item) for item in items[i + 1:i + 3]):
+            result[key] = Ref(int(items[i + 1]), int(items[i + 2]))
+            i += 4
+        else:
+            value = items[i + 1]
+            result[key] = int(value) if _is_int(value) else value
+            i += 2
+    return result, pos
+
+
+def _is_int(token):
+    return token is not NESTED and INTEGER.fullmatch(token) is not None
+
+
+def last_startxref(data):
+    '''Offset of the newest cross reference section of a PDF.
+
+    Args:
+        data (bytes or mmap.mmap): Contents of the PDF file
+
+    Returns:
+        int: Offset the last `startxref` of the file points to
+    '''
+    matches = list(STARTXREF.finditer(data[-TAIL_SIZE:]))
+    if not matches:
+        raise ProbeError('startxref not found')
+    return int(matches[-1].group(1))
+
+
+class PDFProbe:
+    '''Reads single objects of a memory-mapped PDF through its cross reference data.
+
+    Args:
+        data (mmap.mmap): Contents of the PDF file
+    '''
+
+    def __init__(self, data):
+        self.__data = data
+        # where the objects looked up so far are, resolved from `__sections`
+        self.__offsets = {}
+        self.__compressed = {}
+        # cross reference sections, newest first: lists of the `(first, count, position)`
+        # subsections of classic tables and `{idnum: (type, field, field)}` of streams
+        self.__sections = []
+        self.trailer = {}
+        self.__read_xref()
+
+    def __read_xref(self):
+        offset = last_startxref(self.__data)
+        for _ in range(MAX_XREF_SECTIONS):
+            if self.__data[offset:offset + 4] == b'xref':
+                trailer = self.__read_xref_table(offset + 4)
+            else:
+                trailer = self.__read_xref_stream(offset)
+            for key, val in trailer.items():
+                self.trailer.setdefault(key, val)
+            # hybrid files keep the objects compressed in object streams in /XRefStm
+            if isinstance(trailer.get(b'/XRefStm'), int):
+                self.__read_xref_stream(trailer[b'/XRefStm'])
+            if not isinstance(trailer.get(b'/Prev'), int):
+                return
+            offset = trailer[b'/Prev']
+        raise ProbeError('too many cross reference sections')
+
+    def __read_xref_table(self, pos):
+        data = self.__data
+        subsections = []
+        self.__sections.append(subsections)
+        while True:
+            match = SUBSECTION.match(data, pos)
+            if not match:
+                break
+            first, count = int(match.group(1)), int(match.group(2))
+            pos = match.end()
+            # entries are only read when needed, all of them are exactly 20 bytes long
+            subsections.append((first, count, pos))
+            pos += 20 * count
+        pos = data.find(b'trailer', pos, pos + 1024)
+        if pos < 0:
+            raise ProbeError('trailer not found')
+        return _parse_dict(data, pos + 7)[0]
+
+    def __read_xref_stream(self, offset):
+        header, window, stream = self.__stream_at(offset)
+        if header.get(b'/Type') != b'/XRef':
+            raise ProbeError('cross reference stream expected')
+        widths = _int_array(window, b'/W')
+        index = _int_array(window, b'/Index') or [0, header.get(b'/Size', 0)]
+        if widths is None or len(widths) != 3:
+            raise ProbeError('unsupported cross reference stream')
+        entry_size = sum(widths)
+        entries = {}
+        self.__sections.append(entries)
+        pos = 0
+        for first, count in zip(index[::2], index[1::2]):
+            for idnum in range(first, first + count):
+                fields, field_pos = [], pos
+                for width in widths:
+                    fields.append(int.from_bytes(stream[field_pos:field_pos + width], 'big'))
+                    field_pos += width
+                if widths[0] == 0:
+                    fields[0] = 1
+                entries[idnum] = tuple(fields)
+                pos += entry_size
+        return header
+
+    def __stream_at(self, offset):
+        '''Dictionary, raw dictionary bytes and decoded data of the stream object at `offset`.'''
+        data = self.__data
+        match = OBJECT_HEADER.match(data, offset)
+        if not match:
+            raise ProbeError(f'no object at offset {offset}')
+        header, pos = _parse_dict(data, match.end())
+        window = data[match.end():pos]
+        length = header.get(b'/Length')
+        if isinstance(length, Ref):
+            length = self.get(length)
+        if not isinstance(length, int):
+            raise ProbeError('unsupported stream length')
+        pos = data.find(b'stream', pos) + 6
+        pos += 2 if data[pos:pos + 2] == b'\r\n' else 1
+        raw = data[pos:pos + length]
+        filter_name = header.get(b'/Filter')
+        if filter_name is None:
+            return header, window, raw
+        if filter_name != b'/FlateDecode' and not (filter_name is NESTED and FLATE_ONLY.search(window)):
+            raise ProbeError('unsupported stream filter')
+        try:
+            decoded = zlib.decompress(raw)
+        except zlib.error:
+            raise ProbeError('damaged stream')
+        predictor = re.search(rb'/Predictor\s+(\d+)', window)
+        if predictor is None or int(predictor.group(1)) == 1:
+            return header, window, decoded
+        if int(predictor.group(1)) < 10:
+            raise ProbeError('unsupported predictor')
+        columns = re.search(rb'/Columns\s+(\d+)', window)
+        return header, window, _png_unpredict(decoded, int(columns.group(1)) if columns else 1)
+
+    def __table_entry(self, subsections, idnum):
+        '''`(type, offset, generation)` of an object in a classic table, None if it isn't in there.'''
+        for first, count, pos in subsections:
+            if first <= idnum < first + count:
+                entry = ENTRY.match(self.__data, pos + 20 * (idnum - first))
+                if not entry:
+                    raise ProbeError('malformed cross reference table')
+                return 1 if entry.group(3) == b'n' else 0, int(entry.group(1)), int(entry.group(2))
+        return None
+
+    def __locate(self, idnum):
+        '''Look up an object in the newest section that has it, whatever kind of section that is.'''
+        if idnum in self.__offsets or idnum in self.__compressed:
+            return
+        for section in self.__sections:
+            if isinstance(section, dict):
+                entry = section.get(idnum)
+            else:
+                entry = self.__table_entry(section, idnum)
+            if entry is None:
+                continue
+            kind, field, index = entry
+            if kind == 1:
+                self.__offsets[idnum] = field
+            elif kind == 2:
+                self.__compressed[idnum] = (field, index)
+            # free in its newest section otherwise
+            return
+
+    def get(self, ref):
+        '''Resolve a reference to an integer or a dictionary.
+
+        Args:
+            ref (Ref): Reference to resolve
+
+        Returns:
+            int or dict: The object, reduced as described in `_parse_dict`
+        '''
+        self.__locate(ref.idnum)
+        if ref.idnum in self.__offsets:
+            match = OBJECT_HEADER.match(self.__data, self.__offsets[ref.idnum])
+            if not match or int(match.group(1)) != ref.idnum:
+                raise ProbeError(f'object {ref.idnum} not found at its offset')
+            return self.__object(self.__data, match.end())
+        if ref.idnum in self.__compressed:
+            return self.__compressed_object(*self.__compressed[ref.idnum])
+        raise ProbeError(f'object {ref.idnum} not in cross reference data')
+
+    def __object(self, data, pos):
+        token, _ = next(_tokens(data, pos), (None, pos))
+        if token == b'<<':
+            return _parse_dict(data, pos)[0]
+        if token is not None and re.fullmatch(rb'\d+', token):
+            return int(token)
+        raise ProbeError('unsupported object')
+
+    def __compressed_object(self, stream_idnum, index):
+        self.__locate(stream_idnum)
+        if stream_idnum not in self.__offsets:
+            raise ProbeError(f'object stream {stream_idnum} not found')
+        header, _, stream = self.__stream_at(self.__offsets[stream_idnum])
+        numbers = stream[:header[b'/First']].split()
+        offset = int(numbers[2 * index + 1])
+        return self.__object(stream, header[b'/First'] + offset)
+
+
+def _int_array(window, key):
+    '''Integers of the array stored under `key` in the raw dictionary `window`.'''
+    match = re.search(re.escape(key) + rb'\s*\[([\d\s]*)\]', window)
+    return [int(n) for n in match.group(1).split()] if match else None
+
+
+def _png_unpredict(data, columns):
+    '''Undo the PNG predictors (only `None` and `Up` are used for xref streams).'''
+    rows, prev = [], bytes(columns)
+    for pos in range(0, len(data), columns + 1):
+        kind, row = data[pos], bytearray(data[pos + 1:pos + 1 + columns])
+        if kind == 2:
+            for i in range(len(row)):
+                row[i] = (row[i] + prev[i]) & 0xFF
+        elif kind != 0:
+            raise ProbeError(f'unsupported PNG predictor {kind}')
+        rows.append(bytes(row))
+        prev = row
+    return b''.join(rows)
+
+
+def probe_pages(filepath):
+    '''Number of pages of a PDF file, read from the root of its page tree.
+
+    Args:
+        filepath (str): Path to PDF File
+
+    Returns:
+        int: Number of pages contained in PDF file
+
+    Raises:
+        ProbeError: If the file uses features the probe doesn't understand or is
+            damaged. Parse it with PyPDF2 instead.
+    '''
+    with open(filepath, 'rb') as in_pdf:
+        try:
+            data = mmap.mmap(in_pdf.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ProbeError('empty file')
+    try:
+        probe = PDFProbe(data)
+        root = probe.trailer.get(b'/Root')
+        if not isinstance(root, Ref):
+            raise ProbeError('no /Root in trailer')
+        pages = probe.get(root).get(b'/Pages')
+        if not isinstance(pages, Ref):
+            raise ProbeError('no /Pages in catalog')
+        count = probe.get(pages).get(b'/Count')
+        if isinstance(count, Ref):
+            count = probe.get(count)
+        if not isinstance(count, int) or count < 0:
+            raise ProbeError('no valid /Count in page tree root')
+        return count
+    except (IndexError, KeyError, TypeError, ValueError, AttributeError) as e:
+        raise ProbeError(f'damaged file: {e}')
+    finally:
+        data.close()
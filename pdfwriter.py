@@ -0,0 +1,390 @@
+'''Write PDF files while they are being put together.
+
+`PdfFileWriter` keeps every object of the output in memory until `write()` is called
+at the very end, so joining a few hundred large scans needs as much memory as the
+result is big. `StreamingPdfWriter` writes objects to its output as soon as they are
+complete and only remembers their offsets, which keeps memory use roughly constant
+no matter how large the output gets.
+
+Files made by the same generator tend to carry their own copies of identical fonts,
+logos and ICC profiles. With `deduplicate=True`, the writer hashes every object it
+writes and replaces copies of an object it has written before with references to
+the first one.
+
+Given a `compress_level`, the writer optimizes its output: streams that are
+uncompressed or Flate compressed get (re)compressed at that zlib level on a pool of
+threads, all other objects are packed into compressed object streams and the cross
+reference table is written as a compressed cross reference stream (PDF 1.5).
+'''
+
+import hashlib
+import io
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from PyPDF2 import PdfFileWriter
+from PyPDF2.pdf import PageObject
+from PyPDF2.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, EncodedStreamObject,
+                            IndirectObject, NameObject, NumberObject, StreamObject, TreeObject)
+
+from settings import COMPRESS_WORKERS, OBJECT_STREAM_SIZE
+from tracing import count, span
+
+# dictionaries that must stay separate objects even if they look exactly the same
+UNIQUE_TYPES = ('/Page', '/Pages', '/Catalog')
+
+_compressor = None
+_compressor_pid = None
+_compressor_lock = threading.Lock()
+
+
+def _compress_pool():
+    '''Thread pool shared by all writers. Forked worker processes get their own.'''
+    global _compressor, _compressor_pid
+    with _compressor_lock:
+        if _compressor is None or _compressor_pid != os.getpid():
+            _compressor = ThreadPoolExecutor(max_workers=COMPRESS_WORKERS, thread_name_prefix='Compressor')
+            _compressor_pid = os.getpid()
+        return _compressor
+
+
+class _Digest:
+    '''File-like object that hashes and counts what gets written to it.'''
+
+    def __init__(self):
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+
+
+def _replace_references(data, replace):
+    '''Pass every reference inside a direct object through `replace`, in place.'''
+    if isinstance(data, DictionaryObject):
+        for key, value in list(dict.items(data)):
+            if isinstance(value, IndirectObject):
+                data[key] = replace(value)
+            else:
+                _replace_references(value, replace)
+    elif isinstance(data, ArrayObject):
+        for i, value in enumerate(data):
+            if isinstance(value, IndirectObject):
+                data[i] = replace(value)
+            else:
+                _replace_references(value, replace)
+
+
+def _recompressed(stream, level):
+    '''Flate compress a stream at `level`, or return it unchanged if that doesn't pay off.
+
+    Only streams without a filter or with nothing but `/FlateDecode` are touched,
+    images in other formats are left alone. zlib releases the GIL, so this runs in
+    parallel on the compressor threads.
+    '''
+    filters = dict.get(stream, '/Filter')
+    if isinstance(filters, ArrayObject) and len(filters) == 1:
+        filters = filters[0]
+    if isinstance(stream, DecodedStreamObject) and filters is None:
+        data = stream._data
+    elif isinstance(stream, EncodedStreamObject) and filters == '/FlateDecode' and '/DecodeParms' not in stream:
+        try:
+            data = zlib.decompress(stream._data)
+        except zlib.error:
+            return stream
+    else:
+        return stream
+    compressed = zlib.compress(data, level)
+    if len(compressed) >= len(stream._data):
+        return stream
+    result = EncodedStreamObject()
+    result.update((key, value) for key, value in dict.items(stream) if key not in ('/Length', '/Filter'))
+    result[NameObject('/Filter')] = NameObject('/FlateDecode')
+    result._data = compressed
+    return result
+
+
+def _deduplicable(obj):
+    if isinstance(obj, DictionaryObject):
+        # annotations (the only dictionaries with a /Rect) belong to exactly one page
+        return dict.get(obj, '/Type') not in UNIQUE_TYPES and '/Rect' not in obj
+    return True
+
+
+class StreamingPdfWriter(PdfFileWriter):
+    '''A `PdfFileWriter` that writes finished objects to its output right away.
+
+    Pages and everything they refer to must be owned by the writer (e.g. swept with
+    `_sweepIndirectReferences`) before `flush()` writes them, as objects that have
+    been written are dropped and can't be swept or changed any more. The page tree
+    root, the document info and the bookmarks keep changing while pages are added,
+    so they stay in memory until `close()` writes them along with the cross reference
+    table and the trailer.
+
+    Without a call to `flush()`, it works like a `PdfFileWriter` whose `write()` is
+    `close()`, so it can be used for small outputs just as well.
+
+    Args:
+        stream: Binary file object the PDF is written to
+        deduplicate (bool): Write identical objects only once (default: False)
+        compress_level (int): zlib level (1-9) to optimize the output with, None to
+            write streams as they are and a classic cross reference table (default: None)
+    '''
+
+    def __init__(self, stream, deduplicate=False, compress_level=None):
+        super().__init__()
+        self.__stream = stream
+        self.__offsets = {}
+        self.__compressed = {}
+        self.__flushed = 0
+        self.__digests = {} if deduplicate else None
+        self.__duplicates = {}
+        self.__compress_level = compress_level
+        self.bytes_saved = 0
+        if compress_level is not None:
+            # object and cross reference streams need PDF 1.5
+            self._header = b'%PDF-1.5'
+        stream.write(self._header + b'\n%\xe2\xe3\xcf\xd3\n')
+
+    def addPage(self, page):
+        with span('addPage'):
+            super().addPage(page)
+        count('pages')
+
+    def __pinned(self, idnum, obj):
+        return isinstance(obj, TreeObject) or idnum in (self._pages.idnum, self._info.idnum)
+
+    def __write_object(self, idnum, obj):
+        self.__offsets[idnum] = self.__stream.tell()
+        self.__stream.write(f'{idnum} 0 obj\n'.encode())
+        obj.writeToStream(self.__stream, None)
+        self.__stream.write(b'\nendobj\n')
+
+    def __deduplicate(self, indices):
+        '''Find the objects at `indices` that have been written before.
+
+        Objects are hashed in reverse order, so the objects a dictionary refers to
+        (which get added after it while sweeping) are known by the time it is hashed
+        itself. Objects referred to before they have been hashed, i.e. the ones on
+        reference cycles, are always kept.
+        '''
+        batch_start = indices[0] + 1 if indices else 0
+        hashed, referenced_early = set(), set()
+
+        def replace(ref):
+            if ref.pdf is not self:
+                return ref
+            idnum = self.__duplicates.get(ref.idnum, ref.idnum)
+            if idnum >= batch_start and idnum not in hashed:
+                referenced_early.add(idnum)
+            return ref if idnum == ref.idnum else IndirectObject(idnum, 0, self)
+
+        for i in reversed(indices):
+            idnum, obj = i + 1, self._objects[i]
+            _replace_references(obj, replace)
+            hashed.add(idnum)
+            if self.__pinned(idnum, obj) or not _deduplicable(obj):
+                continue
+            digest = _Digest()
+            obj.writeToStream(digest, None)
+            key = digest.hash.digest()
+            original = self.__digests.get(key)
+            if original is not None and idnum not in referenced_early:
+                self.__duplicates[idnum] = original
+                self.bytes_saved += digest.size
+            else:
+                self.__digests.setdefault(key, idnum)
+
+    def __add_object_number(self):
+        self._objects.append(None)
+        return len(self._objects)
+
+    def __write_object_stream(self, idnums):
+        '''Pack the non-stream objects `idnums` into a compressed object stream.'''
+        header, body = [], io.BytesIO()
+        for idnum in idnums:
+            header.append(f'{idnum} {body.tell()}')
+            self._objects[idnum - 1].writeToStream(body, None)
+            body.write(b'\n')
+        header = ' '.join(header).encode() + b'\n'
+        object_stream = EncodedStreamObject()
+        object_stream.update({
+            NameObject('/Type'): NameObject('/ObjStm'),
+            NameObject('/N'): NumberObject(len(idnums)),
+            NameObject('/First'): NumberObject(len(header)),
+            NameObject('/Filter'): NameObject('/FlateDecode'),
+        })
+        object_stream._data = zlib.compress(header + body.getvalue(), self.__compress_level)
+        stream_idnum = self.__add_object_number()
+        self.__write_object(stream_idnum, object_stream)
+        for index, idnum in enumerate(idnums):
+            self.__compressed[idnum] = (stream_idnum, index)
+
+    def __write_optimized(self, indices):
+        streams = [i for i in indices if isinstance(self._objects[i], StreamObject)]
+        level = self.__compress_level
+        with span('recompress', streams=len(streams)):
+            recompressed = _compress_pool().map(lambda i: _recompressed(self._objects[i], level), streams)
+            for i, stream in zip(streams, recompressed):
+                self.__write_object(i + 1, stream)
+        others = [i + 1 for i in indices if not isinstance(self._objects[i], StreamObject)]
+        with span('object streams', objects=len(others)):
+            for start in range(0, len(others), OBJECT_STREAM_SIZE):
+                self.__write_object_stream(others[start:start + OBJECT_STREAM_SIZE])
+
+    def __write_objects(self, indices):
+        '''Write the objects at `indices` (ascending) and drop them from memory.'''
+        if self.__digests is not None:
+            with span('deduplicate', objects=len(indices)):
+                self.__deduplicate(indices)
+        unique = [i for i in indices if i + 1 not in self.__duplicates]
+        if self.__compress_level is None:
+            for i in unique:
+                self.__write_object(i + 1, self._objects[i])
+        else:
+            self.__write_optimized(unique)
+        for i in indices:
+            self._objects[i] = None
+
+    def flush(self, keep=()):
+        '''Write every object added since the last flush that can't change any more.
+
+        Args:
+            keep (iterable): Object numbers that must not be written yet, e.g. pages
+                that still refer to another document. A set is used as it is, without
+                a copy (default: none)
+        '''
+        if not isinstance(keep, (set, frozenset)):
+            keep = set(keep)
+        first_kept = None
+        indices = []
+        for i in range(self.__flushed, len(self._objects)):
+            obj = self._objects[i]
+            if i + 1 in keep:
+                first_kept = i if first_kept is None else first_kept
+            elif obj is not None and not self.__pinned(i + 1, obj):
+                indices.append(i)
+        with span('flush', objects=len(indices)):
+            self.__write_objects(indices)
+        self.__flushed = len(self._objects) if first_kept is None else first_kept
+
+    def write(self, stream):
+        '''Finish the output like `close()`, for code written against `PdfFileWriter`.
+
+        Args:
+            stream: The stream given to the constructor
+
+        Raises:
+            RuntimeError: If `stream` is any other stream
+        '''
+        if stream is not self.__stream:
+            raise RuntimeError('StreamingPdfWriter writes to its own stream, call close() instead')
+        self.close()
+
+    def close(self):
+        '''Write all remaining objects, the cross reference table and the trailer.
+
+        The stream given to the constructor is left open.
+        '''
+        with span('write'):
+            if not self._root:
+                self._root = self._addObject(self._root_object)
+            # like PdfFileWriter.write(), let references to the original pages (e.g. from
+            # annotations) point to their copies, and pull in whatever the catalog, page
+            # tree and bookmarks still refer to
+            extern_map = {}
+            for i, obj in enumerate(self._objects):
+                if isinstance(obj, PageObject) and obj.indirectRef is not None:
+                    original = obj.indirectRef
+                    extern_map.setdefault(original.pdf, {}).setdefault(original.generation, {})[original.idnum] = \
+                        IndirectObject(i + 1, 0, self)
+            self.stack = []
+            self._sweepIndirectReferences(extern_map, self._root)
+            del self.stack
+            self.__write_objects([i for i, obj in enumerate(self._objects) if obj is not None])
+
+            trailer = DictionaryObject({
+                NameObject('/Root'): self._root,
+                NameObject('/Info'): self._info,
+            })
+            if self.__compress_level is None:
+                self.__write_xref_table(trailer)
+            else:
+                self.__write_xref_stream(trailer)
+        count('bytes_written', self.__stream.tell())
+
+    def __write_xref_table(self, trailer):
+        xref_offset = self.__stream.tell()
+        size = len(self._objects) + 1
+        self.__stream.write(f'xref\n0 {size}\n'.encode())
+        self.__stream.write(b'0000000000 65535 f\r\n')
+        for idnum in range(1, size):
+            if idnum in self.__offsets:
+                self.__stream.write(f'{self.__offsets[idnum]:010d} 00000 n\r\n'.encode())
+            else:
+                self.__stream.write(b'0000000000 65535 f\r\n')
+        trailer[NameObject('/Size')] = NumberObject(size)
+        self.__stream.write(b'trailer\n')
+        trailer.writeToStream(self.__stream, None)
+        self.__stream.write(f'\nstartxref\n{xref_offset}\n%%EOF\n'.encode())
+
+    def __write_xref_stream(self, trailer):
+        xref_idnum = self.__add_object_number()
+        xref_offset = self.__stream.tell()
+        self.__offsets[xref_idnum] = xref_offset
+        size = len(self._objects) + 1
+        width = max(1, (max(xref_offset, size).bit_length() + 7) // 8)
+        rows = [b'\x00' + bytes(width) + b'\xff\xff']
+        for idnum in range(1, size):
+            if idnum in self.__offsets:
+                rows.append(b'\x01' + self.__offsets[idnum].to_bytes(width, 'big') + b'\x00\x00')
+            elif idnum in self.__compressed:
+                stream_idnum, index = self.__compressed[idnum]
+                rows.append(b'\x02' + stream_idnum.to_bytes(width, 'big') + index.to_bytes(2, 'big'))
+            else:
+                rows.append(b'\x00' + bytes(width) + b'\xff\xff')
+        xref = EncodedStreamObject()
+        xref.update(trailer)
+        xref.update({
+            NameObject('/Type'): NameObject('/XRef'),
+            NameObject('/Size'): NumberObject(size),
+            NameObject('/W'): ArrayObject(NumberObject(w) for w in (1, width, 2)),
+            NameObject('/Filter'): NameObject('/FlateDecode'),
+        })
+        xref._data = zlib.compress(b''.join(rows), self.__compress_level)
+        self.__write_object(xref_idnum, xref)
+        self.__stream.write(f'startxref\n{xref_offset}\n%%EOF\n'.encode())
+
+
+@contextmanager
+def streaming_output(output_filepath, deduplicate=False, compress_level=None):
+    '''Stream a PDF into a temporary file that replaces `output_filepath` once complete.
+
+    If the block raises, e.g. because the job got cancelled, the partial output is
+    removed and an existing file at `output_filepath` stays untouched.
+
+    Args:
+        output_filepath (str): Path the finished PDF File is moved to
+        deduplicate (bool): Write identical objects only once (default: False)
+        compress_level (int): zlib level to optimize the output with, see
+            `StreamingPdfWriter` (default: None)
+
+    Yields:
+        StreamingPdfWriter: Writer to add pages to
+    '''
+    partial_filepath = f'{output_filepath}.part'
+    try:
+        with open(partial_filepath, 'wb') as out_pdf_stream:
+            out_pdf = StreamingPdfWriter(
+                out_pdf_stream, deduplicate=deduplicate, compress_level=compress_level)
+            yield out_pdf
+            out_pdf.close()
+        os.replace(partial_filepath, output_filepath)
+    except BaseException:
+        if os.path.exists(partial_filepath):
+            os.remove(partial_filepath)
+        raise
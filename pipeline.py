@@ -0,0 +1,295 @@
+'''Chain several operations over one stream of pages.
+
+Joining files, rotating some of the pages and stamping the result used to mean one
+`save_as` per step, with a full PDF written to disk and parsed again in between. A
+`Pipeline` collects the pages to join, applies every stage to each page on its way
+into the output and writes the result once.
+
+Pipelines can also be described by a JSON job manifest:
+
+    {
+        "output": "packet.pdf",
+        "join": [
+            {"file": "cover.pdf"},
+            {"file": "report.pdf", "pages": "1-3, 7"}
+        ],
+        "stages": [
+            {"op": "rotate", "rotate": "RIGHT", "pages": "2-4"},
+            {"op": "stamp", "stamp": "draft.pdf", "command": "STAMP", "only_first_page": false},
+            {"op": "number", "format": "Page {page} of {pages}", "position": "bottom-right",
+             "font_size": 9, "start": 1}
+        ],
+        "deduplicate": true,
+        "compress_level": 9
+    }
+
+Relative paths in a manifest are relative to the manifest file. Page selections use
+the same syntax as the Join tab (see `pageselect`); for rotate stages they refer to pages of the joined
+output and default to all pages. Number stages take the options of `numbering.PageNumberer`,
+all of which are optional. `deduplicate` writes objects that are identical across
+the joined files only once, see `join_pdfs`, and `compress_level` optimizes the output
+as described in `pdfwriter`.
+
+`engine`, and with it PyPDF2, is only imported once a pipeline runs, so a run served
+from a `ResultCache` doesn't load it.
+'''
+
+import json
+import os
+
+from settings import NUMBER_FONT_SIZE, NUMBER_FORMAT, NUMBER_POSITION, ROTATE_DEGREES
+from doccache import document_cache
+from numbering import PageNumberer
+from pageselect import PageSelectError, compile_page_select, parse_page_select
+from resultcache import page_slices
+from tracing import span
+
+
+def _no_progress(done, total=None):
+    pass
+
+
+class ManifestError(ValueError):
+    '''Raised for job manifests that can't be turned into a pipeline.'''
+
+
+class RotateStage:
+    '''Rotate pages of the output clockwise.
+
+    Args:
+        degrees (int): Clockwise rotation, a multiple of 90 (see `ROTATE_DEGREES`)
+        page_ranges: Output pages to rotate as a page selection string (see `pageselect`)
+            or zero-based `(start, stop[, step])` tuples, None for all pages (default: None)
+    '''
+
+    def __init__(self, degrees, page_ranges=None):
+        self.degrees = degrees
+        self.page_ranges = page_ranges
+        self.__page_slices = None
+
+    def prepare(self, out_pdf, pages):
+        if isinstance(self.page_ranges, str):
+            self.__page_slices = compile_page_select(self.page_ranges, pages)
+        else:
+            self.__page_slices = self.page_ranges
+
+    def __call__(self, page, page_number):
+        if self.degrees and (self.__page_slices is None
+                             or any(page_number in range(*page_slice) for page_slice in self.__page_slices)):
+            with span('rotateClockwise', page=page_number):
+                page.rotateClockwise(self.degrees)
+        return page
+
+
+class StampStage:
+    '''Put the first page of a PDF on top of or behind the pages of the output.
+
+    Args:
+        stamp_filepath (str): Path to PDF File whose first page is the stamp/background
+        command (str): `'STAMP'` or `'BG'` (default: `'STAMP'`)
+        only_first_page (bool): Only stamp the first page of the output (default: False)
+    '''
+
+    def __init__(self, stamp_filepath, command='STAMP', only_first_page=False):
+        self.stamp_filepath = stamp_filepath
+        self.command = command
+        self.only_first_page = only_first_page
+        self.__stamper = None
+
+    def prepare(self, out_pdf, pages):
+        from engine import PageStamper
+
+        stamp_page = document_cache.open_reader(self.stamp_filepath).getPage(0)
+        self.__stamper = PageStamper(out_pdf, stamp_page, command=self.command)
+
+    def __call__(self, page, page_number):
+        if not self.only_first_page or page_number < 1:
+            with span('PageStamper.stamp', page=page_number):
+                page = self.__stamper.stamp(page)
+        return page
+
+
+class Pipeline:
+    '''Join pages of several PDF files and run them through a chain of stages.
+
+    Every source and stamp is parsed once, every page passes each stage exactly once
+    and the output is written in a single pass. Stages are callables taking
+    `(page, output page number)` and returning the page to continue with. Before the
+    first page, their `prepare()` gets called with the writer and the number of pages
+    of the output.
+
+    Args:
+        deduplicate (bool): Write objects that are identical across the joined
+            files only once (default: False)
+        compress_level (int): zlib level to optimize the output with, see
+            `StreamingPdfWriter` (default: None)
+    '''
+
+    def __init__(self, deduplicate=False, compress_level=None):
+        self.entries = []
+        self.stages = []
+        self.deduplicate = deduplicate
+        self.compress_level = compress_level
+
+    def join(self, filepath, page_ranges=None):
+        '''Append pages of a PDF file to the page stream.
+
+        Args:
+            filepath (str): Path to PDF File
+            page_ranges: Page selection string (see `pageselect`), zero-based `(start, stop[, step])`
+                tuples or None for all pages (default: None)
+
+        Returns:
+            Pipeline: The pipeline itself, to chain calls
+        '''
+        self.entries.append((filepath, page_ranges))
+        return self
+
+    def rotate(self, degrees, page_ranges=None):
+        '''Add a `RotateStage`. Returns the pipeline itself.'''
+        self.stages.append(RotateStage(degrees, page_ranges))
+        return self
+
+    def stamp(self, stamp_filepath, command='STAMP', only_first_page=False):
+        '''Add a `StampStage`. Returns the pipeline itself.'''
+        self.stages.append(StampStage(stamp_filepath, command=command, only_first_page=only_first_page))
+        return self
+
+    def number(self, format=NUMBER_FORMAT, position=NUMBER_POSITION, font_size=NUMBER_FONT_SIZE, start=1):
+        '''Add a `PageNumberer` numbering all pages of the output. Returns the pipeline itself.'''
+        self.stages.append(PageNumberer(format=format, position=position, font_size=font_size, start=start))
+        return self
+
+    def __transform(self, page, page_number):
+        for stage in self.stages:
+            page = stage(page, page_number)
+        return page
+
+    def __cache_params(self, import_bookmarks):
+        '''Input files and normalized parameters of a run, see `ResultCache.key`.'''
+        pages = [page_slices(filepath, page_ranges) for filepath, page_ranges in self.entries]
+        total = sum(len(range(*page_slice)) for page_ranges in pages for page_slice in page_ranges)
+        filepaths = [filepath for filepath, _ in self.entries]
+        stages = []
+        for stage in self.stages:
+            if isinstance(stage, RotateStage):
+                page_ranges = stage.page_ranges
+                if isinstance(page_ranges, str):
+                    page_ranges = compile_page_select(page_ranges, total)
+                stages.append({'op': 'rotate', 'degrees': stage.degrees % 360,
+                               'pages': None if page_ranges is None else [list(s) for s in page_ranges]})
+            elif isinstance(stage, StampStage):
+                # the stamp is identified by its place among the input files
+                filepaths.append(stage.stamp_filepath)
+                stages.append({'op': 'stamp', 'stamp': len(filepaths) - 1, 'command': stage.command,
+                               'only_first_page': bool(stage.only_first_page)})
+            else:
+                stages.append({'op': 'number', 'format': stage.format, 'position': stage.position,
+                               'font_size': stage.font_size, 'start': stage.start})
+        params = {'pages': pages, 'stages': stages, 'import_bookmarks': bool(import_bookmarks),
+                  'deduplicate': bool(self.deduplicate), 'compress_level': self.compress_level}
+        return filepaths, params
+
+    def run(self, output_filepath, import_bookmarks=True, progress=_no_progress, result_cache=None):
+        '''Run all pages through the stages and write the result.
+
+        Args:
+            output_filepath (str): Path the new PDF File is written to
+            import_bookmarks (bool): Carry over bookmarks pointing to joined pages (default: True)
+            progress (callable): Called with `(done, total)` after every page. May raise
+                to abort the operation (default: no progress reporting)
+            result_cache (ResultCache): Serve a run with the same inputs and stages from
+                this cache, see `resultcache` (default: None)
+
+        Returns:
+            int: Number of bytes saved by deduplication
+        '''
+        if result_cache is not None:
+            filepaths, params = self.__cache_params(import_bookmarks)
+            return result_cache.run('pipeline', filepaths, params, output_filepath,
+                                    lambda: self.run(output_filepath, import_bookmarks=import_bookmarks,
+                                                     progress=progress),
+                                    progress=progress)
+        from engine import join_pages, resolve_page_ranges
+        from pdfwriter import streaming_output
+
+        with streaming_output(output_filepath, deduplicate=self.deduplicate,
+                              compress_level=self.compress_level) as out_pdf:
+            # the stages need the number of pages of the output up front, which the
+            # probed page counts tell without parsing every source before the join
+            # (and keeping them all parsed); join_pages opens each one when it gets to it
+            pages = sum(len(range(*page_slice)) for filepath, page_ranges in self.entries
+                        for page_slice in resolve_page_ranges(filepath, page_ranges))
+            for stage in self.stages:
+                stage.prepare(out_pdf, pages)
+            join_pages(out_pdf, self.entries, import_bookmarks=import_bookmarks,
+                       transform=self.__transform if self.stages else None, progress=progress)
+        return out_pdf.bytes_saved
+
+
+def _page_ranges(page_select):
+    if not page_select:
+        return None
+    # only the syntax can be checked before the page counts are known
+    try:
+        parse_page_select(str(page_select))
+    except PageSelectError as e:
+        raise ManifestError(str(e))
+    return str(page_select)
+
+
+def pipeline_from_manifest(manifest, basedir='.'):
+    '''Build a pipeline from a parsed job manifest.
+
+    Args:
+        manifest (dict): Job manifest as described in the module documentation
+        basedir (str): Directory relative paths are resolved against (default: '.')
+
+    Returns:
+        tuple: The `Pipeline` and the absolute path of its output file
+    '''
+    def path(filepath):
+        if not filepath:
+            raise ManifestError('missing file name in job manifest')
+        return os.path.join(basedir, os.path.expanduser(filepath))
+
+    if not manifest.get('join') or not manifest.get('output'):
+        raise ManifestError('a job manifest needs "join" and "output"')
+    compress_level = manifest.get('compress_level')
+    if compress_level is not None and compress_level not in range(1, 10):
+        raise ManifestError(f'compress_level must be between 1 and 9: {compress_level}')
+    pipeline = Pipeline(deduplicate=bool(manifest.get('deduplicate', False)), compress_level=compress_level)
+    for entry in manifest['join']:
+        if isinstance(entry, str):
+            entry = {'file': entry}
+        pipeline.join(path(entry.get('file')), _page_ranges(entry.get('pages')))
+    for stage in manifest.get('stages', []):
+        op = stage.get('op')
+        if op == 'rotate':
+            if stage.get('rotate', 'RIGHT') not in ROTATE_DEGREES:
+                raise ManifestError(f'unknown rotation: {stage["rotate"]}')
+            pipeline.rotate(ROTATE_DEGREES[stage.get('rotate', 'RIGHT')], _page_ranges(stage.get('pages')))
+        elif op == 'stamp':
+            if stage.get('command', 'STAMP') not in ('STAMP', 'BG'):
+                raise ManifestError(f'unknown stamp command: {stage["command"]}')
+            pipeline.stamp(path(stage.get('stamp')), command=stage.get('command', 'STAMP'),
+                           only_first_page=bool(stage.get('only_first_page', False)))
+        elif op == 'number':
+            font_size, start = stage.get('font_size', NUMBER_FONT_SIZE), stage.get('start', 1)
+            if not isinstance(font_size, (int, float)) or not isinstance(start, int):
+                raise ManifestError(f'font_size and start of a number stage must be numbers: {font_size}, {start}')
+            try:
+                pipeline.number(format=str(stage.get('format', NUMBER_FORMAT)),
+                                position=stage.get('position', NUMBER_POSITION), font_size=font_size, start=start)
+            except ValueError as e:
+                raise ManifestError(str(e))
+        else:
+            raise ManifestError(f'unknown stage: {op}')
+    return pipeline, os.path.abspath(path(manifest['output']))
+
+
+def load_manifest(manifest_filepath):
+    '''Read a JSON job manifest from a file. See `pipeline_from_manifest`.'''
+    with open(manifest_filepath, 'r') as manifest_file:
+        manifest = json.load(manifest_file)
+    return pipeline_from_manifest(manifest, basedir=os.path.dirname(os.path.abspath(manifest_filepath)))
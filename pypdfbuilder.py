@@ -1,21 +1,30 @@
 #!/usr/bin/python
 
+import time
+IMPORT_STARTED = time.perf_counter()
+
 import os
 import sys
 import appdirs
+import base64
 import json
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Queue
 from pathlib import Path as plPath
 from operator import itemgetter
 from settings import *
 
-from tkinter import filedialog
-from pygubu import Builder as pgBuilder
-
-# if dist fails to start because it's missing these, uncomment these two imports
-# import pygubu.builder.ttkstdwidgets
-# import pygubu.builder.widgets.dialog
+from tkinter import PhotoImage, TclError, filedialog
 
-from PyPDF2 import PdfFileMerger, PdfFileReader, PdfFileWriter
+from backends import join_pdfs, rotate_pdf, split_pdf, stamp_pdf
+from batch import batch_rotate, batch_stamp
+from doccache import document_cache
+from jobs import CANCELLED, Job, JobQueue
+from joinlist import JoinList
+from pageselect import PageSelectError, compile_page_select, parse_page_select
+from resultcache import ResultCache
+from thumbnails import ThumbnailCache
 
 # check to see if we're running from stand-alone one-file executable:
 if hasattr(sys, '_MEIPASS'):
@@ -27,6 +36,9 @@ CONFIG_DIR = appdirs.user_config_dir(APPNAME)
 DATA_DIR = appdirs.user_data_dir(APPNAME)
 
 
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
+
 class SettingsData:
     '''Class for managing current user's application settings'''
 
@@ -34,13 +46,17 @@ class SettingsData:
         self.__settings_data_path = os.path.join(CONFIG_DIR, 'data.json')
         self.__settings_defaults = {
             'use_poppler_tools': False,
+            'split_workers': 0,
+            'optimize_output': False,
+            'compress_level': COMPRESS_LEVEL,
+            'cache_results': False,
         }
         self.__settings_data = self.__get_settings_data()
 
     @property
     def use_poppler_tools(self):
         '''If set to True, PyPDF Builder will first try to use Poppler Tools where possible
-        to produce the desired PDFs.
+        to produce the desired PDFs, see `backends`.
 
         The getter will first try to return the value stored in the
         instance, then try to read it out of the user data file, and if all else fails,
@@ -56,12 +72,76 @@ class SettingsData:
         self.__settings_data['use_poppler_tools'] = val
         self.__save_settings_data()
 
+    @property
+    def split_workers(self):
+        '''Number of processes used to split a PDF into single pages. 0 uses every
+        available core, 1 splits without any worker processes.
+
+        Getter and setter work the same way as for `use_poppler_tools`.
+        '''
+        return self.__settings_data.get('split_workers', self.__get_settings_data()['split_workers'])
+
+    @split_workers.setter
+    def split_workers(self, val):
+        self.__settings_data['split_workers'] = val
+        self.__save_settings_data()
+
+    @property
+    def optimize_output(self):
+        '''If set to True, output files get their streams recompressed and are written
+        with object and cross reference streams, see `pdfwriter`.
+
+        Getter and setter work the same way as for `use_poppler_tools`.
+        '''
+        return self.__settings_data.get('optimize_output', self.__get_settings_data()['optimize_output'])
+
+    @optimize_output.setter
+    def optimize_output(self, val):
+        self.__settings_data['optimize_output'] = val
+        self.__save_settings_data()
+
+    @property
+    def compress_level(self):
+        '''zlib level (1-9) used when optimizing output files.
+
+        Getter and setter work the same way as for `use_poppler_tools`.
+        '''
+        return self.__settings_data.get('compress_level', self.__get_settings_data()['compress_level'])
+
+    @compress_level.setter
+    def compress_level(self, val):
+        self.__settings_data['compress_level'] = min(max(int(val), 1), 9)
+        self.__save_settings_data()
+
+    @property
+    def cache_results(self):
+        '''If set to True, joins, rotations and stamps that ran before with the same
+        input files and options are served from the result cache, see `resultcache`.
+
+        Getter and setter work the same way as for `use_poppler_tools`.
+        '''
+        return self.__settings_data.get('cache_results', self.__get_settings_data()['cache_results'])
+
+    @cache_results.setter
+    def cache_results(self, val):
+        self.__settings_data['cache_results'] = val
+        self.__save_settings_data()
+
+    @property
+    def output_compress_level(self):
+        '''int: `compress_level` if output files are to be optimized, otherwise None'''
+        return self.compress_level if self.optimize_output else None
+
     def __get_settings_data(self):
         '''Method to retrieve current user's settings data
 
         Return:
             dict: Dictionary of settings data with keys:
                 * `use_poppler_tools`: user Poppler PDF tools by default
+                * `split_workers`: number of processes used for splitting PDFs
+                * `optimize_output`: optimize output files
+                * `compress_level`: zlib level used for optimizing output files
+                * `cache_results`: serve repeated jobs from the result cache
         '''
         try:
             with (open(self.__settings_data_path, 'r')) as datafile:
@@ -177,9 +257,7 @@ class PDFInfo:
     @property
     def pages(self):
         '''int: Number of pages contained in PDF file'''
-        with open(self.__filepath, 'rb') as in_pdf:
-            pdf_handler = PdfFileReader(in_pdf)
-            return pdf_handler.getNumPages()
+        return document_cache.pages(self.__filepath)
 
     def concat_filename(self, max_length=35):
         '''Concatenate a filename to a certain length.
@@ -197,26 +275,200 @@ class PDFInfo:
             concat_filename += '…'
         return concat_filename
 
-    def pdf_info_string(self, concat_length=35):
+    def pdf_info_string(self, concat_length=35, pages=None):
         '''Fetch a standard info-string about the PDFInfo-object.
 
         Args:
             concat_length (int): Maximum length of concatenated filename string (default: 35)
+            pages: Page count to show instead of looking it up, e.g. a placeholder
+                while the pages are still being counted (default: None)
 
         Returns:
             str: Information in the format `Filename (pages)` of PDFInfo-object
 
         '''
         concat_filename = self.concat_filename(max_length=concat_length)
-        return f'{concat_filename} ({self.pages} pages)'
+        if pages is None:
+            pages = self.pages
+        return f'{concat_filename} ({pages} pages)'
+
+
+def files_info_string(filepaths, concat_length=35):
+    '''Info-string about one or more chosen PDF files.
+
+    Args:
+        filepaths (list): Paths to PDF Files
+        concat_length (int): Maximum length of the concatenated first filename (default: 35)
+
+    Returns:
+        str: `Filename (pages)` of the first file, followed by the number of other files
+    '''
+    info = PDFInfo(filepaths[0]).pdf_info_string(concat_length=concat_length)
+    if len(filepaths) > 1:
+        others = len(filepaths) - 1
+        info += f' and {others} more file{"s" if others > 1 else ""}'
+    return info
+
+
+def batch_pairs(filepaths, directory):
+    '''list: `(input path, output path)` tuples writing every file under its name to `directory`'''
+    return [(filepath, os.path.join(directory, os.path.basename(filepath))) for filepath in filepaths]
+
+
+def batch_status(directory):
+    '''Status bar text after a batch, built from its `BatchReport`.'''
+    def status_text(report):
+        if report.failed:
+            first = report.failed[0]
+            return BATCH_FILE_FAILED.format(len(report.results) - len(report.failed), len(report.results),
+                                            directory, len(report.failed), first)
+        return BATCH_FILE_SUCCESS.format(len(report.results), directory)
+    return status_text
+
+
+class ThumbnailStrip:
+    '''A row of page thumbnails on a canvas with a horizontal scrollbar.
+
+    Thumbnails come from the `ThumbnailCache` of the application and are rendered on
+    a thread pool. Only the pages scrolled into view are asked for, in chunks of
+    `THUMBNAIL_RENDER_CHUNK`, so showing a large file renders a handful of pages
+    instead of all of them. Every page has a frame, tagged with its index, that can
+    be highlighted.
+
+    Args:
+        parent (PyPDFBuilderApplication): Application providing the cache and `after()`
+        canvas (Canvas): Canvas to draw the thumbnails on
+        scrollbar (Scrollbar): Horizontal scrollbar of the canvas
+    '''
+
+    def __init__(self, parent, canvas, scrollbar):
+        self.parent = parent
+        self.__canvas = canvas
+        self.__scrollbar = scrollbar
+        self.__canvas['height'] = THUMBNAIL_SIZE + 4 * THUMBNAIL_GAP
+        self.__canvas['xscrollcommand'] = self.__on_scroll
+        self.__scrollbar['command'] = self.__canvas.xview
+        self.__renderer = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix='Thumbnails')
+        self.__rendered = Queue()
+        self.__pending = 0
+        # results of renderings requested for a file that isn't shown anymore are dropped
+        self.__generation = 0
+        self.__filepath = None
+        self.__pages = []
+        self.__slots = {}
+        self.__requested = set()
+        self.__images = {}
+
+    def show(self, filepath, pages):
+        '''Show thumbnails of some pages of a file.
+
+        Args:
+            filepath (str): Path to PDF File
+            pages (iterable): Zero-based page indices in the order they are shown
+        '''
+        self.clear()
+        self.__filepath = filepath
+        self.__pages = list(pages)
+        step = THUMBNAIL_SIZE + THUMBNAIL_GAP
+        for slot, page in enumerate(self.__pages):
+            self.__slots.setdefault(page, []).append(slot)
+            x = THUMBNAIL_GAP + slot * step
+            self.__canvas.create_rectangle(x - 1, THUMBNAIL_GAP - 1, x + THUMBNAIL_SIZE + 1,
+                                           THUMBNAIL_GAP + THUMBNAIL_SIZE + 1, outline=THUMBNAIL_OUTLINE,
+                                           tags=('frame', f'page{page}'))
+            self.__canvas.create_text(x + THUMBNAIL_SIZE // 2, THUMBNAIL_SIZE + 2 * THUMBNAIL_GAP, anchor='n',
+                                      text=str(page + 1))
+        self.__canvas['scrollregion'] = (0, 0, THUMBNAIL_GAP + len(self.__pages) * step, 0)
+        self.__canvas.xview_moveto(0)
+        self.__request_visible()
+
+    def highlight(self, pages):
+        '''Frame the thumbnails of `pages` (zero-based indices) in the highlight colour.'''
+        self.__canvas.itemconfigure('frame', outline=THUMBNAIL_OUTLINE, width=1)
+        for page in pages:
+            if page in self.__slots:
+                self.__canvas.itemconfigure(f'page{page}', outline=THUMBNAIL_HIGHLIGHT, width=3)
+
+    def clear(self):
+        '''Remove all thumbnails.'''
+        self.__generation += 1
+        self.__canvas.delete('all')
+        self.__filepath = None
+        self.__pages = []
+        self.__slots = {}
+        self.__requested = set()
+        self.__images = {}
+
+    def close(self):
+        '''Stop rendering thumbnails that haven't been rendered yet.'''
+        self.__renderer.shutdown(wait=False, cancel_futures=True)
+
+    def __on_scroll(self, first, last):
+        self.__scrollbar.set(first, last)
+        self.__request_visible()
+
+    def __request_visible(self):
+        '''Ask for the chunks of pages in view that haven't been asked for yet.'''
+        if not self.__pages:
+            return
+        # the canvas has no size of its own before it is shown for the first time
+        width = self.__canvas.winfo_width()
+        if width <= 1:
+            width = int(self.__canvas['width'])
+        step = THUMBNAIL_SIZE + THUMBNAIL_GAP
+        first = max(0, int(self.__canvas.canvasx(0)) // step)
+        last = min(len(self.__pages) - 1, int(self.__canvas.canvasx(width)) // step)
+        for chunk in range(first // THUMBNAIL_RENDER_CHUNK, last // THUMBNAIL_RENDER_CHUNK + 1):
+            if chunk in self.__requested:
+                continue
+            self.__requested.add(chunk)
+            pages = self.__pages[chunk * THUMBNAIL_RENDER_CHUNK:(chunk + 1) * THUMBNAIL_RENDER_CHUNK]
+            future = self.__renderer.submit(self.parent.thumbnails.thumbnails, self.__filepath, pages)
+            generation = self.__generation
+            future.add_done_callback(lambda future, generation=generation: self.__rendered.put((generation, future)))
+            if not self.__pending:
+                self.parent.after(THUMBNAIL_INTERVAL, self.__show_rendered)
+            self.__pending += 1
+
+    def __show_rendered(self):
+        '''Draw the thumbnails that have been rendered since the last call.'''
+        while True:
+            try:
+                generation, future = self.__rendered.get_nowait()
+            except Empty:
+                break
+            self.__pending -= 1
+            if generation != self.__generation or future.cancelled():
+                continue
+            try:
+                images = future.result()
+            except Exception as e:
+                self.__show_unavailable(e)
+                continue
+            for page, image in images.items():
+                self.__draw(page, image)
+        if self.__pending:
+            self.parent.after(THUMBNAIL_INTERVAL, self.__show_rendered)
+
+    def __draw(self, page, image):
+        if page in self.__images:
+            return
+        photo = self.__images[page] = PhotoImage(data=base64.b64encode(image))
+        for slot in self.__slots.get(page, ()):
+            x = THUMBNAIL_GAP + slot * (THUMBNAIL_SIZE + THUMBNAIL_GAP) + THUMBNAIL_SIZE // 2
+            self.__canvas.create_image(x, THUMBNAIL_GAP + THUMBNAIL_SIZE // 2, image=photo)
+
+    def __show_unavailable(self, error):
+        self.__canvas.delete('unavailable')
+        self.__canvas.create_text(THUMBNAIL_GAP, THUMBNAIL_GAP, anchor='nw', tags='unavailable',
+                                  text=THUMBNAIL_UNAVAILABLE.format(error))
 
 
 class BgTabManager:
     def __init__(self, parent=None):
         self.parent = parent
-        self.__source_filepath = None
+        self.__source_filepaths = []
         self.__bg_filepath = None
-        self.__source_file_info = None
         self.__bg_file_info = None
         self.__bg_pdf_pages = None
         self.__source_file_info_widget = self.parent.builder.get_variable('source_file_info')
@@ -225,7 +477,16 @@ class BgTabManager:
         self.__bg_only_first_page = self.parent.builder.get_variable('bg_only_first_page')
         self.__bg_button_label = self.parent.builder.get_variable('bg_options_bg_button')
         self.__only_first_button_label = self.parent.builder.get_variable('bg_options_only_first_button')
+        self.__number_format = self.parent.builder.get_variable('number_format')
+        self.__number_position = self.parent.builder.get_variable('number_position')
+        self.__number_font_size = self.parent.builder.get_variable('number_font_size')
+        self.__number_start = self.parent.builder.get_variable('number_start')
         self.__bg_command.set('BG')
+        self.parent.builder.get_object('BgNumberPositionCombobox').configure(values=NUMBER_POSITIONS)
+        self.__number_format.set(NUMBER_FORMAT)
+        self.__number_position.set(NUMBER_POSITION)
+        self.__number_font_size.set(NUMBER_FONT_SIZE)
+        self.__number_start.set(1)
 
     @property
     def parent(self):
@@ -236,11 +497,10 @@ class BgTabManager:
         self.__parent = val
 
     def choose_source_file(self):
-        choose_source_file = self.parent.get_file_dialog(
-            func=filedialog.askopenfilename, widget_title='Choose Source PDF …')
-        if choose_source_file:
-            self.__source_filepath = choose_source_file
-            self.__source_file_info = PDFInfo(self.__source_filepath)
+        choose_source_files = self.parent.get_file_dialog(
+            func=filedialog.askopenfilenames, widget_title='Choose Source PDF(s) …')
+        if choose_source_files:
+            self.__source_filepaths = list(choose_source_files)
             self.__show_source_file_info()
 
     def choose_bg_file(self):
@@ -252,7 +512,7 @@ class BgTabManager:
             self.__show_bg_file_info()
 
     def __show_source_file_info(self):
-        self.__source_file_info_widget.set(self.__source_file_info.pdf_info_string(concat_length=80))
+        self.__source_file_info_widget.set(files_info_string(self.__source_filepaths, concat_length=80))
 
     def __show_bg_file_info(self):
         self.__bg_file_info_widget.set(self.__bg_file_info.pdf_info_string(concat_length=80))
@@ -265,32 +525,53 @@ class BgTabManager:
         self.__only_first_button_label.set('Apply background to only the first page')
         self.__bg_button_label.set('Choose Background …')
 
+    def choose_number_option(self):
+        self.__only_first_button_label.set('Apply background to only the first page')
+        self.__bg_button_label.set('Choose Background (optional) …')
+
+    def __stamp_options(self):
+        '''Keyword arguments of `stamp_pdf` for the chosen options, None if they are invalid.
+
+        Numbering puts the background, if one was chosen, behind the pages in the same pass.
+        '''
+        from numbering import PageNumberer
+        command = self.__bg_command.get()
+        if command != 'NUMBER':
+            if not self.__bg_filepath:
+                return None
+            return {'command': command, 'only_first_page': self.__bg_only_first_page.get()}
+        try:
+            numbering = PageNumberer(format=self.__number_format.get(), position=self.__number_position.get(),
+                                     font_size=self.__number_font_size.get(), start=self.__number_start.get())
+        except (TclError, ValueError) as e:
+            self.parent.status_text = NUMBER_OPTIONS_INVALID.format(e)
+            return None
+        return {'command': 'BG', 'only_first_page': self.__bg_only_first_page.get(), 'numbering': numbering}
+
     def save_as(self):
+        if not self.__source_filepaths:
+            return
+        options = self.__stamp_options()
+        if options is None:
+            return
+        if len(self.__source_filepaths) > 1:
+            return self.__save_batch(options)
         save_filepath = self.parent.get_file_dialog(func=filedialog.asksaveasfilename, widget_title='Save New PDF to …')
-        if self.__source_filepath and self.__bg_filepath:
-            out_pdf = PdfFileWriter()
-            command = self.__bg_command.get()
-            with open(self.__source_filepath, "rb") as source_pdf_stream, \
-                    open(self.__bg_filepath, "rb") as bg_pdf_stream:
-                for p in range(self.__source_file_info.pages):
-                    # new PdfFileReader instances needed for every page merged. See here:
-                    # https://github.com/mstamy2/PyPDF2/issues/100#issuecomment-43145634
-                    source_pdf = PdfFileReader(source_pdf_stream)
-                    bg_pdf = PdfFileReader(bg_pdf_stream)
-                    if not self.__bg_only_first_page.get() or (self.__bg_only_first_page.get() and p < 1):
-                        if command == 'STAMP':
-                            top_page = bg_pdf.getPage(0)
-                            bottom_page = source_pdf.getPage(p)
-                        elif command == 'BG':
-                            top_page = source_pdf.getPage(p)
-                            bottom_page = bg_pdf.getPage(0)
-                        bottom_page.mergePage(top_page)
-                    else:
-                        bottom_page = source_pdf.getPage(p)
-                    out_pdf.addPage(bottom_page)
-                with open(save_filepath, "wb") as out_pdf_stream:
-                    out_pdf.write(out_pdf_stream)
-            self.parent.save_success(status_text=BG_FILE_SUCCESS.format(os.path.basename(save_filepath)))
+        if save_filepath:
+            self.parent.submit_job(
+                stamp_pdf, self.__source_filepaths[0], self.__bg_filepath, save_filepath, **options,
+                compress_level=self.parent.settings_data.output_compress_level,
+                use_poppler_tools=self.parent.settings_data.use_poppler_tools,
+                result_cache=self.parent.result_cache, title='Stamping', status_text=BG_FILE_SUCCESS.format(os.path.basename(save_filepath)))
+
+    def __save_batch(self, options):
+        '''Stamp all chosen files into a directory, parsing the stamp once per worker.'''
+        save_directory = self.parent.get_file_dialog(func=filedialog.askdirectory, widget_title='Save New PDFs to …')
+        if save_directory:
+            self.parent.submit_job(
+                batch_stamp, batch_pairs(self.__source_filepaths, save_directory), self.__bg_filepath, **options,
+                compress_level=self.parent.settings_data.output_compress_level, title='Stamping',
+                status_text=batch_status(save_directory))
 
 
 class SplitTabManager:
@@ -307,6 +588,14 @@ class SplitTabManager:
         self.__split_filepath = None
         self.__split_file_info = None
         self.__split_file_info_widget = self.parent.builder.get_variable('split_file_info')
+        self.__split_mode = self.parent.builder.get_variable('split_mode')
+        self.__split_every = self.parent.builder.get_variable('split_every')
+        self.__split_max_size = self.parent.builder.get_variable('split_max_size')
+        self.__split_to_zip = self.parent.builder.get_variable('split_to_zip')
+        self.__split_mode.set('PAGES')
+        self.__split_every.set(SPLIT_EVERY)
+        self.__split_max_size.set(SPLIT_MAX_SIZE)
+        self.__split_to_zip.set(False)
 
     @property
     def parent(self):
@@ -328,38 +617,67 @@ class SplitTabManager:
     def __show_file_info(self):
         self.__split_file_info_widget.set(self.__split_file_info.pdf_info_string())
 
+    def __split_options(self):
+        '''Keyword arguments of `split_pdf` for the chosen parts, None if they are invalid.'''
+        mode = self.__split_mode.get()
+        try:
+            if mode == 'EVERY':
+                every = self.__split_every.get()
+                if every < 1:
+                    raise ValueError(f'pages per part must be positive: {every}')
+                return {'every': every}
+            if mode == 'SIZE':
+                max_size = self.__split_max_size.get()
+                if max_size <= 0:
+                    raise ValueError(f'size of a part must be positive: {max_size}')
+                return {'max_bytes': int(max_size * 1024 * 1024)}
+        except (TclError, ValueError) as e:
+            self.parent.status_text = SPLIT_OPTIONS_INVALID.format(e)
+            return None
+        return {'bookmarks': True} if mode == 'BOOKMARKS' else {}
+
     def save_as(self):
-        if self.__split_filepath:
-            basepath = os.path.splitext(self.__split_filepath)[0]
-            # in spite of discussion here https://stackoverflow.com/a/2189814
-            # we'll just go the lazy way to count the number of needed digits:
-            num_length = len(str(abs(self.__split_file_info.pages)))
-            in_pdf = PdfFileReader(open(self.__split_filepath, "rb"))
-            for p in range(self.__split_file_info.pages):
-                output_path = f"{basepath}_{str(p+1).rjust(num_length, '0')}.pdf"
-                out_pdf = PdfFileWriter()
-                out_pdf.addPage(in_pdf.getPage(p))
-                with open(output_path, "wb") as out_pdf_stream:
-                    out_pdf.write(out_pdf_stream)
-            self.parent.save_success(status_text=SPLIT_FILE_SUCCESS.format(os.path.dirname(self.__split_filepath)))
+        if not self.__split_filepath:
+            return
+        options = self.__split_options()
+        if options is None:
+            return
+        status_text = SPLIT_FILE_SUCCESS.format(os.path.dirname(self.__split_filepath))
+        if self.__split_to_zip.get():
+            archive = self.parent.get_file_dialog(
+                func=filedialog.asksaveasfilename, widget_title='Save Parts to ZIP Archive…',
+                filetypes=(("ZIP Archive", "*.zip"), ("All Files", "*.*")))
+            if not archive:
+                return
+            options['archive'] = archive
+            status_text = SPLIT_ARCHIVE_SUCCESS.format(os.path.basename(archive))
+        self.parent.submit_job(
+            split_pdf, self.__split_filepath, workers=self.parent.settings_data.split_workers,
+            compress_level=self.parent.settings_data.output_compress_level, **options,
+            use_poppler_tools=self.parent.settings_data.use_poppler_tools, title='Splitting', status_text=status_text)
 
 
 class RotateTabManager:
     def __init__(self, parent=None):
         self.parent = parent
-        self.__rotate_filepath = None
-        self.__rotate_file_info = None
+        self.__rotate_filepaths = []
         self.__rotate_file_info_widget = self.parent.builder.get_variable('rotate_file_info')
         self.__rotate_from_page_widget = self.parent.builder.get_variable('rotate_from_page')
         self.__rotate_to_page_widget = self.parent.builder.get_variable('rotate_to_page')
         self.__rotate_amount_widget = self.parent.builder.get_variable('rotate_amount')
         self.__do_page_extract_widget = self.parent.builder.get_variable('do_extract_pages')
+        self.__do_incremental_widget = self.parent.builder.get_variable('do_incremental_rotate')
         # Set default values. No idea how to avoid this using only the UI file, so I'm
         # breaking the MVC principle here.
         self.__rotate_amount_widget.set('NO_ROTATE')
         self.__rotate_from_page_widget.set('')
         self.__rotate_to_page_widget.set('')
         self.__do_page_extract_widget.set(True)
+        self.__do_incremental_widget.set(False)
+        self.__thumbnails = ThumbnailStrip(self.parent, self.parent.builder.get_object('RotateThumbnails'),
+                                           self.parent.builder.get_object('RotateThumbnailsScrollbar'))
+        self.__rotate_from_page_widget.trace_add('write', self.__highlight_rotate_pages)
+        self.__rotate_to_page_widget.trace_add('write', self.__highlight_rotate_pages)
 
     @property
     def parent(self):
@@ -370,50 +688,88 @@ class RotateTabManager:
         self.__parent = val
 
     def open_file(self):
-        chose_rotate_file = self.parent.get_file_dialog(
-            func=filedialog.askopenfilename, widget_title='Choose PDF to Rotate…')
-        if chose_rotate_file:
-            self.__rotate_filepath = chose_rotate_file
-            self.__rotate_file_info = PDFInfo(self.__rotate_filepath)
+        chose_rotate_files = self.parent.get_file_dialog(
+            func=filedialog.askopenfilenames, widget_title='Choose PDF(s) to Rotate…')
+        if chose_rotate_files:
+            self.__rotate_filepaths = list(chose_rotate_files)
+            # the thumbnails show the first file, the range reaches the end of the longest one
+            self.__thumbnails.show(self.__rotate_filepaths[0], range(document_cache.pages(self.__rotate_filepaths[0])))
             self.__show_file_info()
             self.__show_rotate_pages()
 
     def __show_rotate_pages(self):
         self.__rotate_from_page_widget.set(1)
-        self.__rotate_to_page_widget.set(self.__rotate_file_info.pages)
+        self.__rotate_to_page_widget.set(max(document_cache.pages(filepath) for filepath in self.__rotate_filepaths))
+
+    def __highlight_rotate_pages(self, *args):
+        '''Frame the thumbnails of the pages that are going to be rotated.'''
+        try:
+            first, last = self.__rotate_from_page_widget.get(), self.__rotate_to_page_widget.get()
+        except TclError:
+            # a field is empty or doesn't hold a number (yet)
+            return
+        self.__thumbnails.highlight(range(first - 1, last))
+
+    def close(self):
+        '''Stop rendering thumbnails.'''
+        self.__thumbnails.close()
 
     def __show_file_info(self):
-        self.__rotate_file_info_widget.set(self.__rotate_file_info.pdf_info_string())
+        self.__rotate_file_info_widget.set(files_info_string(self.__rotate_filepaths))
 
     def save_as(self):
+        if not self.__rotate_filepaths:
+            return
         page_range = (self.__rotate_from_page_widget.get()-1, self.__rotate_to_page_widget.get())
+        if len(self.__rotate_filepaths) > 1:
+            return self.__save_batch(page_range)
         save_filepath = self.parent.get_file_dialog(func=filedialog.asksaveasfilename, widget_title='Save New PDF to…')
-        if self.__rotate_filepath:
-            in_pdf = PdfFileReader(open(self.__rotate_filepath, "rb"))
-            out_pdf = PdfFileWriter()
-            for p in range(self.__rotate_file_info.pages):
-                if p in range(*page_range):
-                    if ROTATE_DEGREES[self.__rotate_amount_widget.get()] != 0:            
-                        out_pdf.addPage(in_pdf.getPage(p).rotateClockwise(
-                            ROTATE_DEGREES[self.__rotate_amount_widget.get()]))
-                    else:
-                        out_pdf.addPage(in_pdf.getPage(p))
-                elif not self.__do_page_extract_widget.get():
-                    out_pdf.addPage(in_pdf.getPage(p))
-            with open(save_filepath, "wb") as out_pdf_stream:
-                out_pdf.write(out_pdf_stream)
-            self.parent.save_success(status_text=ROTATE_FILE_SUCCESS.format(os.path.basename(save_filepath)))
+        if save_filepath:
+            self.parent.submit_job(
+                rotate_pdf, self.__rotate_filepaths[0], save_filepath, page_range,
+                ROTATE_DEGREES[self.__rotate_amount_widget.get()], extract_pages=self.__do_page_extract_widget.get(),
+                incremental=self.__do_incremental_widget.get(),
+                compress_level=self.parent.settings_data.output_compress_level,
+                use_poppler_tools=self.parent.settings_data.use_poppler_tools,
+                result_cache=self.parent.result_cache, title='Rotating',
+                status_text=ROTATE_FILE_SUCCESS.format(os.path.basename(save_filepath)))
+
+    def __save_batch(self, page_range):
+        '''Rotate the same pages of all chosen files into a directory, cut to shorter files.'''
+        save_directory = self.parent.get_file_dialog(func=filedialog.askdirectory, widget_title='Save New PDFs to…')
+        if save_directory:
+            self.parent.submit_job(
+                batch_rotate, batch_pairs(self.__rotate_filepaths, save_directory), page_range,
+                ROTATE_DEGREES[self.__rotate_amount_widget.get()], extract_pages=self.__do_page_extract_widget.get(),
+                incremental=self.__do_incremental_widget.get(),
+                compress_level=self.parent.settings_data.output_compress_level, title='Rotating',
+                status_text=batch_status(save_directory))
 
 
 class JoinTabManager:
+    '''Manager class for the Join Tab
+
+    The files to join are kept in a `JoinList`, the Treeview only shows it: its item
+    ids are the ids of the entries, and every change to the list is followed by
+    updating just the rows that changed.
+    '''
+
     def __init__(self, parent=None):
         self.parent = parent
         self.__current_file_info = None
+        self.__join_list = JoinList()
         self.__files_tree_widget = self.parent.builder.get_object('JoinFilesList')
         self.__files_tree_widget['displaycolumns'] = ('FileNameColumn', 'PageSelectColumn')
         self.__current_file_info_widget = self.parent.builder.get_variable('current_file_info')
         self.__page_select_input_widget = self.parent.builder.get_variable('page_select_input')
-        self.__selected_files = []
+        self.__do_deduplicate_widget = self.parent.builder.get_variable('do_deduplicate')
+        self.__do_deduplicate_widget.set(False)
+        self.__selected_files = ()
+        self.__page_counter = ThreadPoolExecutor(max_workers=PAGE_COUNT_WORKERS, thread_name_prefix='PageCounter')
+        self.__counted_pages = Queue()
+        self.__pending_page_counts = 0
+        self.__thumbnails = ThumbnailStrip(self.parent, self.parent.builder.get_object('JoinThumbnails'),
+                                           self.parent.builder.get_object('JoinThumbnailsScrollbar'))
 
     @property
     def parent(self):
@@ -425,43 +781,74 @@ class JoinTabManager:
 
     def on_file_select(self, event):
         self.__selected_files = self.__files_tree_widget.selection()
-        self.__current_file_info = PDFInfo(
-            self.__files_tree_widget.item(self.__selected_files[0], 'values')[PDF_FILEPATH])
+        if not self.__selected_files:
+            # the selected rows have been removed
+            self.__current_file_info_widget.set('')
+            self.__thumbnails.clear()
+            return
+        self.__current_file_info = PDFInfo(self.__join_list[self.__selected_files[0]].filepath)
         self.__show_file_info()
         self.__show_selected_pages()
+        self.__show_thumbnails()
 
     def enter_page_selection(self, event):
         '''
         This medthod is called when the page selection input field loses focus
         i.e. when input is completed
         '''
+        page_select = self.__page_select_input_widget.get()
         for f in self.__selected_files:
-            file_data = self.__files_tree_widget.item(f, 'values')
-            page_select = self.__page_select_input_widget.get()
-            new_tuple = (file_data[PDF_FILENAME], page_select, file_data[PDF_FILEPATH], file_data[PDF_PAGES])
-            self.__files_tree_widget.item(f, values=new_tuple)
+            entry = self.__join_list[f]
+            self.__check_page_select(page_select, entry)
+            entry.page_select = page_select
+        self.__refresh_rows(self.__selected_files)
+        if self.__selected_files:
+            self.__show_thumbnails()
+
+    def __check_page_select(self, page_select, entry):
+        '''Show what is wrong with a page selection in the status bar. Selections are
+        only checked against the page count once it is known.'''
+        if not page_select.strip():
+            return
+        try:
+            parse_page_select(page_select)
+            if entry.pages is not None:
+                compile_page_select(page_select, entry.pages)
+        except PageSelectError as e:
+            self.parent.status_text = PAGE_SELECT_INVALID.format(os.path.basename(entry.filepath), e)
+
+    def __refresh_rows(self, entry_ids):
+        '''Show the current values of some entries in their rows.'''
+        for entry_id in entry_ids:
+            self.__files_tree_widget.item(entry_id, values=self.__join_list[entry_id].values)
+
+    def __refresh_order(self, entry_ids):
+        '''Move the rows of entries that changed their position to where they are now.'''
+        for entry_id in sorted(entry_ids, key=self.__join_list.index):
+            self.__files_tree_widget.move(entry_id, '', self.__join_list.index(entry_id))
 
     def __show_file_info(self):
-        self.__current_file_info_widget.set(self.__current_file_info.pdf_info_string(concat_length=25))
+        # don't wait for a page count that is still being worked on in the background
+        pages = self.__join_list[self.__selected_files[0]].values[PDF_PAGES]
+        self.__current_file_info_widget.set(self.__current_file_info.pdf_info_string(concat_length=25, pages=pages))
 
     def __show_selected_pages(self):
-        file_data = self.__files_tree_widget.item(self.__selected_files[0], 'values')
-        self.__page_select_input_widget.set(file_data[PDF_PAGESELECT])
-
-    def __get_join_files(self):
-        return [self.__files_tree_widget.item(i)['values'] for i in self.__files_tree_widget.get_children()]
-
-    def __parse_page_select(self, page_select):
-        '''
-        As this method deals with raw user input, there will have to be a whole lot of error checking
-        built into this function at a later time. Really don't look forward to this… at all.
-        '''
-        for page_range in page_select.replace(' ', '').split(','):
-            if '-' in page_range:
-                range_list = page_range.split('-')
-                yield tuple(sorted((int(range_list[0])-1, int(range_list[1]))))
-            else:
-                yield tuple(sorted((int(page_range)-1, int(page_range))))
+        self.__page_select_input_widget.set(self.__join_list[self.__selected_files[0]].page_select)
+
+    def __show_thumbnails(self):
+        '''Show the selected pages of the first selected file, all of them if the
+        selection is empty or invalid, nothing while the pages are still being counted.'''
+        entry = self.__join_list[self.__selected_files[0]]
+        if entry.pages is None:
+            self.__thumbnails.clear()
+            return
+        page_slices = ((0, entry.pages),)
+        if entry.page_select.strip():
+            try:
+                page_slices = compile_page_select(entry.page_select, entry.pages)
+            except PageSelectError:
+                pass
+        self.__thumbnails.show(entry.filepath, (p for page_slice in page_slices for p in range(*page_slice)))
 
     def add_file(self):
         add_filepaths = self.parent.get_file_dialog(
@@ -469,60 +856,107 @@ class JoinTabManager:
             widget_title='Choose PDFs to Add…'
         )
         if add_filepaths:
-            for filepath in list(add_filepaths):
-                filename = os.path.basename(filepath)
-                file_info = PDFInfo(filepath)
-                file_data = (filename, '', filepath, file_info.pages)
-                self.__files_tree_widget.insert('', 'end', values=file_data)
+            for entry_id in self.__join_list.extend(add_filepaths):
+                entry = self.__join_list[entry_id]
+                self.__files_tree_widget.insert('', 'end', iid=entry_id, values=entry.values)
+                self.__count_pages(entry_id, entry.filepath)
+
+    def __count_pages(self, entry_id, filepath):
+        '''Count the pages of a newly added file on the page counter thread pool. The
+        result is put into `self.__counted_pages` and picked up by `__show_page_counts`.'''
+        future = self.__page_counter.submit(document_cache.pages, filepath)
+        future.add_done_callback(lambda future: self.__counted_pages.put((entry_id, future)))
+        if not self.__pending_page_counts:
+            self.parent.after(PAGE_COUNT_INTERVAL, self.__show_page_counts)
+        self.__pending_page_counts += 1
+
+    def __show_page_counts(self):
+        '''Write the page counts that have come in since the last call into the Treeview,
+        in batches of at most `PAGE_COUNT_BATCH` rows so the UI stays responsive.'''
+        for _ in range(PAGE_COUNT_BATCH):
+            try:
+                entry_id, future = self.__counted_pages.get_nowait()
+            except Empty:
+                break
+            self.__pending_page_counts -= 1
+            # the entry may have been removed in the meantime
+            if entry_id not in self.__join_list:
+                continue
+            entry = self.__join_list[entry_id]
+            try:
+                entry.pages = future.result()
+            except Exception:
+                entry.unreadable = True
+            self.__refresh_rows((entry_id,))
+            if entry_id in self.__selected_files[:1]:
+                self.__show_thumbnails()
+        if self.__pending_page_counts:
+            self.parent.after(PAGE_COUNT_INTERVAL, self.__show_page_counts)
+
+    def close(self):
+        '''Stop counting pages and rendering thumbnails.'''
+        self.__page_counter.shutdown(wait=False, cancel_futures=True)
+        self.__thumbnails.close()
 
     def save_as(self):
-        if len(self.__get_join_files()) > 0:
+        if len(self.__join_list) > 0:
             save_filepath = self.parent.get_file_dialog(
                 func=filedialog.asksaveasfilename, widget_title='Save Joined PDF to…')
             if save_filepath:
-                merger = PdfFileMerger()
-                for f in self.__get_join_files():
-                    if not f[PDF_PAGESELECT]:
-                        merger.append(fileobj=open(f[PDF_FILEPATH], 'rb'))
-                    else:
-                        for page_range in self.__parse_page_select(str(f[PDF_PAGESELECT])):
-                            merger.append(fileobj=open(f[PDF_FILEPATH], 'rb'), pages=page_range)
-                with open(save_filepath, 'wb') as out_pdf:
-                    merger.write(out_pdf)
-                self.parent.save_success(status_text=JOIN_FILE_SUCCESS.format(os.path.basename(save_filepath)))
+                self.parent.submit_job(
+                    join_pdfs, self.__join_list.entries(), save_filepath,
+                    deduplicate=self.__do_deduplicate_widget.get(),
+                    compress_level=self.parent.settings_data.output_compress_level,
+                    use_poppler_tools=self.parent.settings_data.use_poppler_tools,
+                    result_cache=self.parent.result_cache, title='Joining',
+                    status_text=lambda bytes_saved: self.__joined_status(save_filepath, bytes_saved))
+
+    def __joined_status(self, save_filepath, bytes_saved):
+        if bytes_saved:
+            return JOIN_DEDUP_SUCCESS.format(os.path.basename(save_filepath), bytes_saved / 1024 / 1024)
+        return JOIN_FILE_SUCCESS.format(os.path.basename(save_filepath))
 
     def move_up(self):
-        selected_files = self.__selected_files
-        first_idx = self.__files_tree_widget.index(selected_files[0])
-        parent = self.__files_tree_widget.parent(selected_files[0])
-        if first_idx > 0:
-            for f in selected_files:
-                swap_item = self.__files_tree_widget.prev(f)
-                new_idx = self.__files_tree_widget.index(swap_item)
-                self.__files_tree_widget.move(f, parent, new_idx)
+        self.__refresh_order(self.__join_list.move_up(self.__selected_files))
 
     def move_down(self):
-        selected_files = list(reversed(self.__selected_files))
-        last_idx = self.__files_tree_widget.index(selected_files[0])
-        parent = self.__files_tree_widget.parent(selected_files[0])
-        last_idx_in_widget = self.__files_tree_widget.index(self.__files_tree_widget.get_children()[-1])
-        if last_idx < last_idx_in_widget:
-            for f in selected_files:
-                swap_item = self.__files_tree_widget.next(f)
-                own_idx = self.__files_tree_widget.index(f)
-                new_idx = self.__files_tree_widget.index(swap_item)
-                self.__files_tree_widget.move(f, parent, new_idx)
+        self.__refresh_order(self.__join_list.move_down(self.__selected_files))
 
     def remove_file(self):
-        for f in self.__selected_files:
-            self.__files_tree_widget.detach(f)
+        selected_files, self.__selected_files = self.__selected_files, ()
+        if selected_files:
+            self.__join_list.remove(selected_files)
+            self.__files_tree_widget.delete(*selected_files)
 
 
 class PyPDFBuilderApplication:
-    '''Main application class. Handles setup and running of all application parts.'''
+    '''Main application class. Handles setup and running of all application parts.
+
+    Only what is needed to show the window happens up front: the manager of a tab is
+    built when the tab is selected for the first time, and user data and settings
+    are read when they are first needed.
+
+    Attributes:
+        startup_seconds (float): Time from the start of the import of this module until
+            the main loop was idle for the first time, None before that
+    '''
+
+    TAB_MANAGERS = {
+        'join': JoinTabManager,
+        'split': SplitTabManager,
+        'bg': BgTabManager,
+        'rotate': RotateTabManager,
+    }
 
     def __init__(self):
+        # imported here, so that running the command line interface doesn't load it
+        from pygubu import Builder as pgBuilder
+        # if dist fails to start because it's missing these, uncomment these two imports
+        # import pygubu.builder.ttkstdwidgets
+        # import pygubu.builder.widgets.dialog
+
         self.builder = pgBuilder()
+        self.builder.add_resource_path(CURRENT_DIR)
         self.builder.add_from_file(os.path.join(CURRENT_DIR, 'mainwindow.ui'))
 
         self.__mainwindow = self.builder.get_object('MainWindow')
@@ -538,18 +972,71 @@ class PyPDFBuilderApplication:
         self.__mainwindow.config(menu=self.__mainmenu)
         self.__status_text_variable = self.builder.get_variable('application_status_text')
         self.__settings_use_poppler_variable = self.builder.get_variable('settings_use_poppler')
+        self.__settings_optimize_output_variable = self.builder.get_variable('settings_optimize_output')
+        self.__settings_compress_level_variable = self.builder.get_variable('settings_compress_level')
+        self.__settings_cache_results_variable = self.builder.get_variable('settings_cache_results')
         self.status_text = None
         self.builder.connect_callbacks(self)
 
-        self.user_data = UserData()
-        self.settings_data = SettingsData()
+        self.__user_data = None
+        self.__settings_data = None
+        self.jobs = JobQueue()
+        self.thumbnails = ThumbnailCache(os.path.join(DATA_DIR, 'thumbnails'))
+        self.__result_cache = ResultCache(os.path.join(DATA_DIR, 'results'))
 
-        self.__jointab = JoinTabManager(self)
-        self.__splittab = SplitTabManager(self)
-        self.__bgtab = BgTabManager(self)
-        self.__rotatetab = RotateTabManager(self)
+        self.__tab_managers = {}
+        self.__notebook.bind('<<NotebookTabChanged>>', self.__on_tab_changed, add='+')
+        self.__on_tab_changed()
 
         self.status_text = DEFAULT_STATUS
+        self.startup_seconds = None
+        self.__mainwindow.after_idle(self.__started)
+        self.__mainwindow.after(JOB_POLL_INTERVAL, self.__poll_jobs)
+
+    @property
+    def user_data(self):
+        '''UserData: Current user's application data, read on first access'''
+        if self.__user_data is None:
+            self.__user_data = UserData()
+        return self.__user_data
+
+    @property
+    def settings_data(self):
+        '''SettingsData: Current user's settings, read on first access'''
+        if self.__settings_data is None:
+            self.__settings_data = SettingsData()
+        return self.__settings_data
+
+    @property
+    def result_cache(self):
+        '''ResultCache: Cache serving repeated jobs, None if turned off in the settings'''
+        return self.__result_cache if self.settings_data.cache_results else None
+
+    def __tab_manager(self, tab):
+        '''Manager of a tab, built the first time it is needed.
+
+        Args:
+            tab (str): Key of the tab in `TAB_MANAGERS`
+        '''
+        manager = self.__tab_managers.get(tab)
+        if manager is None:
+            manager = self.__tab_managers[tab] = self.TAB_MANAGERS[tab](self)
+        return manager
+
+    def __on_tab_changed(self, event=None):
+        selected = str(self.__notebook.select())
+        for tab, frame in self.__tabs.items():
+            if str(frame) == selected:
+                self.__tab_manager(tab)
+
+    def __started(self):
+        self.startup_seconds = time.perf_counter() - IMPORT_STARTED
+        timing = os.environ.get(STARTUP_TIMING_VARIABLE)
+        if timing:
+            print(json.dumps({'import_seconds': IMPORT_SECONDS, 'startup_seconds': self.startup_seconds}),
+                  file=sys.stderr)
+            if timing == 'exit':
+                self.quit()
 
     @property
     def status_text(self):
@@ -581,65 +1068,107 @@ class PyPDFBuilderApplication:
         self.__notebook.select(self.__tabs['rotate'])
 
     def jointab_add_file(self):
-        self.__jointab.add_file()
+        self.__tab_manager('join').add_file()
 
     def jointab_on_file_select(self, event):
-        self.__jointab.on_file_select(event)
+        self.__tab_manager('join').on_file_select(event)
 
     def jointab_enter_page_selection(self, event):
-        self.__jointab.enter_page_selection(event)
+        self.__tab_manager('join').enter_page_selection(event)
 
     def jointab_save_as(self):
-        self.__jointab.save_as()
+        self.__tab_manager('join').save_as()
 
     def jointab_move_up(self):
-        self.__jointab.move_up()
+        self.__tab_manager('join').move_up()
 
     def jointab_move_down(self):
-        self.__jointab.move_down()
+        self.__tab_manager('join').move_down()
 
     def jointab_remove(self):
-        self.__jointab.remove_file()
+        self.__tab_manager('join').remove_file()
 
     def splittab_open_file(self):
-        self.__splittab.open_file()
+        self.__tab_manager('split').open_file()
 
     def splittab_save_as(self):
-        self.__splittab.save_as()
+        self.__tab_manager('split').save_as()
 
     def bgtab_choose_bg_option(self):
-        self.__bgtab.choose_bg_option()
+        self.__tab_manager('bg').choose_bg_option()
 
     def bgtab_choose_stamp_option(self):
-        self.__bgtab.choose_stamp_option()
+        self.__tab_manager('bg').choose_stamp_option()
 
     def bgtab_choose_number_option(self):
-        '''
-        Numbering pages is currently not supported by PyPDF2 so this option will remain
-        disabled for now
-        '''
-        pass
+        self.__tab_manager('bg').choose_number_option()
 
     def bgtab_choose_source_file(self):
-        self.__bgtab.choose_source_file()
+        self.__tab_manager('bg').choose_source_file()
 
     def bgtab_choose_bg_file(self):
-        self.__bgtab.choose_bg_file()
+        self.__tab_manager('bg').choose_bg_file()
 
     def bgtab_save_as(self):
-        self.__bgtab.save_as()
+        self.__tab_manager('bg').save_as()
 
     def rotatetab_open_file(self):
-        self.__rotatetab.open_file()
+        self.__tab_manager('rotate').open_file()
 
     def rotatetab_save_as(self):
-        self.__rotatetab.save_as()
+        self.__tab_manager('rotate').save_as()
 
-    def save_success(self, status_text=DEFAULT_STATUS):
-        '''Gets called when a PDF file was processed successfully. Currently only
-        increases the `number_of_processed_files`-counter by 1
+    def submit_job(self, func, *args, title='Job', status_text=DEFAULT_STATUS, **kwargs):
+        '''Run a PDF operation in the background. Progress is shown in the status bar
+        and `save_success` gets called with `status_text` once the operation is done.
+
+        Args:
+            func (callable): Operation to run, called with `*args` and `**kwargs`
+            title (str): Short description shown in the status bar while running
+            status_text (str or callable): Status bar text shown after success, or a
+                function building it from the result of the operation
+        '''
+        def on_success(job):
+            self.save_success(status_text=status_text(job.result) if callable(status_text) else status_text,
+                              pages_per_second=job.pages_per_second)
+
+        self.jobs.submit(Job(func, *args, title=title, on_success=on_success, **kwargs))
+        self.__show_job_progress()
+
+    def cancel_jobs(self, *args, **kwargs):
+        '''Gets called when menu item "File > Cancel Running Jobs" is selected. Stops
+        the running job after its current page and drops all queued jobs.'''
+        self.jobs.cancel_all()
+
+    def __poll_jobs(self):
+        for job in self.jobs.poll():
+            if job.status == CANCELLED:
+                self.status_text = JOB_CANCELLED.format(job.title)
+            elif job.error is not None:
+                self.status_text = JOB_FAILED.format(job.title, job.error)
+                if job.on_failure:
+                    job.on_failure(job)
+            elif job.on_success:
+                job.on_success(job)
+        self.__show_job_progress()
+        self.__mainwindow.after(JOB_POLL_INTERVAL, self.__poll_jobs)
+
+    def __show_job_progress(self):
+        job = self.jobs.current
+        if job is not None:
+            status_text = job.progress_text()
+            if self.jobs.pending:
+                status_text += f' ({self.jobs.pending} queued)'
+            self.status_text = status_text
+
+    def save_success(self, status_text=DEFAULT_STATUS, pages_per_second=None):
+        '''Gets called when a PDF file was processed successfully. Increases the
+        `number_of_processed_files`-counter by 1 and shows `status_text`, followed by
+        the throughput of the operation if it is known.
         '''
         self.user_data.number_of_processed_files += 1
+        if pages_per_second is not None:
+            status_text = THROUGHPUT_STATUS.format(status_text, pages_per_second)
         self.status_text = status_text
 
     def show_settings(self, *args, **kwargs):
@@ -649,19 +1178,34 @@ class PyPDFBuilderApplication:
         case `event` gets passed into the call.'''
         self.__settings_dialog.run()
         self.__settings_use_poppler_variable.set(self.settings_data.use_poppler_tools)
+        self.__settings_optimize_output_variable.set(self.settings_data.optimize_output)
+        self.__settings_compress_level_variable.set(self.settings_data.compress_level)
+        self.__settings_cache_results_variable.set(self.settings_data.cache_results)
 
     def close_settings(self, *args, **kwargs):
         self.settings_data.use_poppler_tools = self.__settings_use_poppler_variable.get()
+        self.settings_data.optimize_output = self.__settings_optimize_output_variable.get()
+        self.settings_data.cache_results = self.__settings_cache_results_variable.get()
+        try:
+            self.settings_data.compress_level = self.__settings_compress_level_variable.get()
+        except TclError:
+            # not a number, keep the previous level
+            pass
         self.__settings_dialog.close()
 
     def cancel_settings(self, *args, **kwargs):
         pass
 
-    def get_file_dialog(self, func, widget_title='Choose File(s) …'):
+    def get_file_dialog(self, func, widget_title='Choose File(s) …', filetypes=(("PDF File", "*.pdf"), ("All Files", "*.*"))):
+        if func is filedialog.askdirectory:
+            f = func(initialdir=self.user_data.filedialog_path, title=widget_title)
+            if f:
+                self.user_data.filedialog_path = f
+            return f
         f = func(
             initialdir=self.user_data.filedialog_path,
             title=widget_title,
-            filetypes=(("PDF File", "*.pdf"), ("All Files", "*.*"))
+            filetypes=filetypes
         )
         if f:
             if type(f) == list or type(f) == tuple:
@@ -670,7 +1214,15 @@ class PyPDFBuilderApplication:
                 self.user_data.filedialog_path = os.path.dirname(f)
             return f
 
+    def after(self, ms, func):
+        '''Call `func` on the Tk thread after `ms` milliseconds.'''
+        return self.__mainwindow.after(ms, func)
+
     def quit(self, event=None):
+        self.jobs.cancel_all()
+        for tab in ('join', 'rotate'):
+            if tab in self.__tab_managers:
+                self.__tab_managers[tab].close()
         self.__mainwindow.quit()
 
     def run(self):
@@ -678,5 +1230,10 @@ class PyPDFBuilderApplication:
 
 
 if __name__ == '__main__':
+    # the split worker processes need this in frozen PyInstaller builds
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        from cli import main
+        sys.exit(main())
     app = PyPDFBuilderApplication()
     app.run()
@@ -0,0 +1,263 @@
+'''Outputs of finished jobs, kept on disk to serve identical jobs without running them.
+
+Regenerating the same packet every month used to parse and write everything again.
+A `ResultCache` keys the output of a job on the SHA-256 hashes of its input files
+(see `doccache.content_hash`) and its normalized parameters, like page selections
+resolved to page slices, so an identical job gets the output copied or linked into
+place instead of running again:
+
+    cache = ResultCache(os.path.join(DATA_DIR, 'results'))
+    join_pdfs(entries, 'packet.pdf', result_cache=cache)
+
+Outputs are copied into the cache, so changing the output of a job afterwards leaves
+its entry alone. They are served as copies by default; served as hardlinks with
+`link=True`, they take no time and space at all, but share their file with the cache
+and each other, so changing one in place changes all of them. Every entry remembers
+the content hash of its file, and one that got changed, e.g. by appending an
+incremental update to a linked output, is dropped instead of served. The least
+recently used entries are removed once the outputs take more than `max_bytes`.
+
+Hashing reads every input once per version of the file on disk. Nothing here
+imports `engine`, so a job served from the cache never loads PyPDF2.
+'''
+
+import hashlib
+import json
+import os
+import shutil
+
+from settings import APPVERSION, RESULT_CACHE_MAX_BYTES
+from doccache import content_hash, document_cache
+from pageselect import compile_page_select
+from tracing import count, span
+
+
+def _no_progress(done, total=None):
+    pass
+
+
+def page_slices(filepath, page_ranges):
+    '''Page selection of a file as zero-based page slices, like `engine.resolve_page_ranges`.
+
+    Args:
+        filepath (str): Path to PDF File
+        page_ranges: None for all pages, a page selection string (see `pageselect`) or
+            zero-based `(start, stop)` / `(start, stop, step)` tuples
+
+    Returns:
+        list: `[start, stop]` or `[start, stop, step]` lists, which serialize to JSON
+    '''
+    if page_ranges is None:
+        page_ranges = ((0, document_cache.pages(filepath)),)
+    elif isinstance(page_ranges, str):
+        page_ranges = compile_page_select(page_ranges, document_cache.pages(filepath))
+    return [list(page_slice) for page_slice in page_ranges]
+
+
+def clamp_page_range(filepath, page_range):
+    '''A `(start, stop)` page range cut to a file, so ranges picking the same pages match.
+
+    Args:
+        filepath (str): Path to PDF File
+        page_range (tuple): Zero-based `(start, stop)`, a `stop` of None for the last page
+
+    Returns:
+        list: `[start, stop]`, which serializes to JSON
+    '''
+    start, stop = page_range
+    pages = document_cache.pages(filepath)
+    stop = pages if stop is None else min(stop, pages)
+    start = min(max(start, 0), stop)
+    return [start, stop]
+
+
+class ResultCache:
+    '''Output files of jobs keyed on their inputs and parameters.
+
+    Args:
+        directory (str): Directory of the cache, created when needed
+        max_bytes (int): Disk budget of the cached outputs (default: RESULT_CACHE_MAX_BYTES)
+        link (bool): Serve outputs as hardlinks instead of copies where possible (default: False)
+    '''
+
+    def __init__(self, directory, max_bytes=RESULT_CACHE_MAX_BYTES, link=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.link = link
+
+    def key(self, operation, filepaths, params):
+        '''Key of a job.
+
+        Args:
+            operation (str): Name of the operation, e.g. `'join'`
+            filepaths (list): Paths of all files the output is made from, in a fixed order
+            params (dict): Everything else the output depends on, serializable to JSON
+
+        Returns:
+            str: Hex digest identifying the job
+        '''
+        job = {'version': APPVERSION, 'operation': operation,
+               'inputs': [content_hash(filepath) for filepath in filepaths], 'params': params}
+        return hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()
+
+    def __paths(self, key):
+        '''Paths of the output and the info file of an entry.'''
+        return os.path.join(self.directory, f'{key}.pdf'), os.path.join(self.directory, f'{key}.json')
+
+    def __place(self, source_filepath, output_filepath, link):
+        '''Link or copy a file to `output_filepath`, replacing whatever is there at once.'''
+        partial_filepath = os.path.join(os.path.dirname(os.path.abspath(output_filepath)),
+                                        f'.{os.path.basename(output_filepath)}.part')
+        if os.path.exists(partial_filepath):
+            os.remove(partial_filepath)
+        try:
+            try:
+                if not link:
+                    raise OSError('not linking')
+                os.link(source_filepath, partial_filepath)
+            except OSError:
+                # other file system, or one without hardlinks
+                shutil.copyfile(source_filepath, partial_filepath)
+            os.replace(partial_filepath, output_filepath)
+        except BaseException:
+            if os.path.exists(partial_filepath):
+                os.remove(partial_filepath)
+            raise
+
+    def __remove(self, key):
+        for filepath in self.__paths(key):
+            try:
+                os.remove(filepath)
+            except FileNotFoundError:
+                pass
+
+    def fetch(self, key, output_filepath):
+        '''Put the cached output of a job at `output_filepath`, if there is one and it is unchanged.
+
+        Args:
+            key (str): Key of the job, see `key()`
+            output_filepath (str): Path the output is wanted at
+
+        Returns:
+            tuple: `(True, result of the job)` if the output was served from the cache,
+            `(False, None)` otherwise
+        '''
+        entry_filepath, info_filepath = self.__paths(key)
+        try:
+            with open(info_filepath, 'r') as info_file:
+                info = json.load(info_file)
+            stat = os.stat(entry_filepath)
+        except (OSError, ValueError):
+            return False, None
+        if stat.st_size != info.get('size') or content_hash(entry_filepath) != info.get('sha256'):
+            # changed since it was stored, e.g. through an output linked to it
+            self.__remove(key)
+            return False, None
+        self.__place(entry_filepath, output_filepath, self.link)
+        # the modification time of the info file is the last use
+        os.utime(info_filepath)
+        return True, info.get('result')
+
+    def store(self, key, output_filepath, result=None):
+        '''Add the output of a job to the cache and make room for it.
+
+        Args:
+            key (str): Key of the job, see `key()`
+            output_filepath (str): Path of the output the job wrote
+            result: What the job returned, kept if it serializes to JSON (default: None)
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        entry_filepath, info_filepath = self.__paths(key)
+        # a copy, a link would let changes of the output reach the entry
+        self.__place(output_filepath, entry_filepath, False)
+        info = {'size': os.path.getsize(entry_filepath), 'sha256': content_hash(entry_filepath)}
+        try:
+            info = json.dumps(dict(info, result=result))
+        except TypeError:
+            info = json.dumps(dict(info, result=None))
+        partial_filepath = os.path.join(self.directory, f'.{key}.json.part')
+        with open(partial_filepath, 'w') as info_file:
+            info_file.write(info)
+        os.replace(partial_filepath, info_filepath)
+        self.evict()
+
+    def entries(self):
+        '''list: `(last use, size in bytes, key)` of every entry, least recently used first'''
+        entries = []
+        try:
+            filenames = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for filename in filenames:
+            key, extension = os.path.splitext(filename)
+            if extension != '.pdf' or filename.startswith('.'):
+                continue
+            entry_filepath, info_filepath = self.__paths(key)
+            try:
+                size = os.stat(entry_filepath).st_size
+            except FileNotFoundError:
+                continue
+            try:
+                last_use = os.stat(info_filepath).st_mtime_ns
+            except FileNotFoundError:
+                # incomplete, goes first
+                last_use = 0
+            entries.append((last_use, size, key))
+        return sorted(entries)
+
+    def evict(self):
+        '''Remove the least recently used entries until the outputs fit into `max_bytes`.
+
+        Returns:
+            int: Number of entries removed
+        '''
+        entries = self.entries()
+        size = sum(entry_size for _, entry_size, _ in entries)
+        removed = 0
+        for _, entry_size, key in entries:
+            if size <= self.max_bytes:
+                break
+            self.__remove(key)
+            size -= entry_size
+            removed += 1
+        if removed:
+            count('result cache evictions', removed)
+        return removed
+
+    def clear(self):
+        '''Remove all entries.'''
+        for _, _, key in self.entries():
+            self.__remove(key)
+
+    def run(self, operation, filepaths, params, output_filepath, job, progress=_no_progress):
+        '''Serve a job from the cache, or run it and cache its output.
+
+        A job writing over one of its inputs always runs.
+
+        Args:
+            operation (str): Name of the operation, see `key()`
+            filepaths (list): Paths of all input files, see `key()`
+            params (dict): Normalized parameters of the job, see `key()`
+            output_filepath (str): Path the job writes its output to
+            job (callable): Runs the job without arguments and returns its result
+            progress (callable): Called with `(1, 1)` for a job served from the cache
+                (default: no progress reporting)
+
+        Returns:
+            Whatever the job returned, also when served from the cache
+        '''
+        output_abspath = os.path.abspath(output_filepath)
+        if any(os.path.abspath(filepath) == output_abspath for filepath in filepaths):
+            return job()
+        with span('result cache lookup', operation=operation):
+            key = self.key(operation, filepaths, params)
+            hit, result = self.fetch(key, output_filepath)
+        if hit:
+            count('result cache hits')
+            progress(1, 1)
+            return result
+        count('result cache misses')
+        result = job()
+        with span('result cache store', operation=operation):
+            self.store(key, output_filepath, result)
+        return result
@@ -10,9 +10,126 @@ PDF_PAGES = 3
 
 ROTATE_DEGREES = {'LEFT': 270, 'RIGHT': 90, 'ONE_EIGHTY': 180, 'NO_ROTATE': 0}
 
+# Memory budget (in bytes of raw file contents) of the shared parsed-document cache
+
+DOC_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Joining: run the garbage collector over dropped sources once this many bytes of source
+# files or this many sources have been detached since the last collection
+
+JOIN_GC_BYTES = 64 * 1024 * 1024
+JOIN_GC_SOURCES = 100
+
+# Number of page counts the document cache remembers for files it hasn't parsed in full
+
+PAGE_COUNT_CACHE_SIZE = 10000
+
+# Number of compiled page selections (per selection and page count) to remember
+
+PAGE_SELECT_CACHE_SIZE = 1024
+
+# Milliseconds between two looks at the background job queue from the Tk mainloop
+
+JOB_POLL_INTERVAL = 100
+
+# Counting pages of files added to the Join list: number of threads, milliseconds between
+# two updates of the list, maximum number of rows updated at once, placeholder texts
+
+PAGE_COUNT_WORKERS = 4
+PAGE_COUNT_INTERVAL = 100
+PAGE_COUNT_BATCH = 500
+PAGE_COUNT_PLACEHOLDER = 'counting…'
+PAGE_COUNT_ERROR = 'unreadable'
+
+# Environment variable that makes the application print its import and startup time
+# once the window is up, and quit right away if set to `exit`
+
+STARTUP_TIMING_VARIABLE = 'PYPDFBUILDER_STARTUP_TIMING'
+
+# Pages written by one run of pdfseparate, progress is reported in between
+
+POPPLER_SPLIT_CHUNK = 100
+
+# Page thumbnails: longest side in pixels, pages rendered by one run of pdftoppm,
+# thumbnails kept in memory, rendering threads, milliseconds between two looks for
+# rendered thumbnails, gap between and colours of the frames around thumbnails in a strip
+
+THUMBNAIL_SIZE = 96
+THUMBNAIL_RENDER_CHUNK = 20
+THUMBNAIL_CACHE_SIZE = 2000
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_INTERVAL = 100
+THUMBNAIL_GAP = 8
+THUMBNAIL_OUTLINE = 'gray70'
+THUMBNAIL_HIGHLIGHT = 'royal blue'
+THUMBNAIL_UNAVAILABLE = 'No previews: {}'
+
+# Number of content hashes of files (per path, size and modification time) to remember
+
+CONTENT_HASH_CACHE_SIZE = 1024
+
+# Hot folders: seconds between two looks into folders that can't be watched with
+# inotify, files handed to the worker pool ahead per worker, seconds between two
+# throughput reports, suffixes of the markers written next to processed inputs
+
+HOT_FOLDER_POLL_INTERVAL = 2.0
+HOT_FOLDER_QUEUE_PER_WORKER = 2
+HOT_FOLDER_REPORT_INTERVAL = 60.0
+HOT_FOLDER_DONE_SUFFIX = '.done'
+HOT_FOLDER_FAILED_SUFFIX = '.failed'
+
+# Page numbers: text with `{page}` and `{pages}` placeholders, where on the page it
+# goes, font size in points and distance from the edges of the page in points
+
+NUMBER_FORMAT = '{page}'
+NUMBER_POSITIONS = ('bottom-left', 'bottom-center', 'bottom-right', 'top-left', 'top-center', 'top-right')
+NUMBER_POSITION = 'bottom-center'
+NUMBER_FONT_SIZE = 10
+NUMBER_MARGIN = 28
+
+# Optimized output: default zlib level, threads compressing streams, objects packed
+# into one object stream
+
+COMPRESS_LEVEL = 6
+COMPRESS_WORKERS = 4
+OBJECT_STREAM_SIZE = 100
+
+# Splitting into parts: bytes counted for every part, for every object and for an object
+# packed into an object stream when estimating the size of a part, characters of a bookmark title kept in the name of a
+# part
+
+SPLIT_PART_OVERHEAD = 300
+SPLIT_OBJECT_OVERHEAD = 20
+SPLIT_PACKED_OBJECT_SIZE = 100
+SPLIT_TITLE_LENGTH = 40
+
+# Disk budget of the outputs of finished jobs kept in the result cache, the least
+# recently used ones are removed first
+
+RESULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Defaults of the Split tab: pages per part and size of a part in MB
+
+SPLIT_EVERY = 100
+SPLIT_MAX_SIZE = 25
+
 
 SPLIT_FILE_SUCCESS = 'Files saved successfully to {}!'
+SPLIT_ARCHIVE_SUCCESS = 'Parts saved successfully to {}!'
+SPLIT_OPTIONS_INVALID = 'Split: {}'
 JOIN_FILE_SUCCESS = 'Files joined successfully to {}!'
+JOIN_DEDUP_SUCCESS = 'Files joined successfully to {}, {:.1f} MB saved by merging identical objects!'
 ROTATE_FILE_SUCCESS = 'Pages in {} rotated successfully!'
 BG_FILE_SUCCESS = 'File saved successfully to {}!'
+BATCH_FILE_SUCCESS = '{} files saved successfully to {}!'
+BATCH_FILE_FAILED = '{} of {} files saved to {}, {} failed: {}'
+BATCH_FILE_RESULT = '{}: {} pages in {:.2f} s'
+BATCH_SUMMARY = '{files} files, {failed} failed, {pages} pages in {seconds:.1f} s: {pages_per_second:.1f} pages/s'
+THROUGHPUT_STATUS = '{} ({:.0f} pages/s)'
+PAGE_SELECT_INVALID = 'Page selection of {}: {}'
+NUMBER_OPTIONS_INVALID = 'Page numbers: {}'
+JOB_CANCELLED = '{} cancelled.'
+JOB_FAILED = '{} failed: {}'
+HOT_FOLDER_REPORT = ('{files} files ({failed} failed), {pages} pages in {seconds:.0f} s: '
+                     '{pages_per_second:.1f} pages/s while busy, {recent_pages_per_second:.1f} pages/s recently')
 DEFAULT_STATUS = F'PyPDF Builder v{APPVERSION}'
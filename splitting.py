@@ -0,0 +1,264 @@
+'''Cutting a document into parts and where the parts go.
+
+`engine.split_pdf` writes one file per page by default. Large documents can also be
+cut into fewer, larger parts: every N pages, at the top-level bookmarks, or into parts
+that stay below a size budget. The functions of this module plan these parts as
+`Part` tuples of zero-based page ranges.
+
+The parts are written into a sink: `DirectorySink` puts each of them into a file of
+its own, `ZipSink` streams all of them into a single ZIP archive, which may also be
+a stream like stdout, without staging any of them on disk.
+'''
+
+import os
+import re
+import time
+import zipfile
+from collections import namedtuple
+from contextlib import contextmanager
+
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject
+
+from settings import SPLIT_OBJECT_OVERHEAD, SPLIT_PACKED_OBJECT_SIZE, SPLIT_PART_OVERHEAD, SPLIT_TITLE_LENGTH
+from pdfprobe import TAIL_SIZE, ProbeError, last_startxref
+from pdfwriter import StreamingPdfWriter, streaming_output
+
+# pages `start` to `stop` (exclusive) of a split, and the bookmark title it starts at or None
+Part = namedtuple('Part', 'start stop title')
+
+# keys that lead from an object back up to the page or page tree holding it
+BACK_REFERENCES = frozenset(('/Parent', '/P'))
+
+
+def page_chunks(pages, every):
+    '''Parts of `every` pages each, the last one may be shorter.
+
+    Args:
+        pages (int): Number of pages of the document
+        every (int): Pages per part
+
+    Returns:
+        list: The `Part`s in page order
+    '''
+    if every < 1:
+        raise ValueError(f'pages per part must be positive: {every}')
+    return [Part(start, min(start + every, pages), None) for start in range(0, pages, every)]
+
+
+def bookmark_parts(reader):
+    '''Parts starting at the pages the top-level bookmarks point to.
+
+    Pages before the first bookmark make a part of their own. If several bookmarks
+    point to the same page, the first one names the part.
+
+    Args:
+        reader (PdfFileReader): Reader of the document
+
+    Returns:
+        list: The `Part`s in page order
+
+    Raises:
+        ValueError: If the document has no bookmarks pointing to its pages
+    '''
+    titles = {}
+    for outline in reader.getOutlines():
+        # nested lists hold the children of the bookmark before them
+        if isinstance(outline, list):
+            continue
+        try:
+            page = reader.getDestinationPageNumber(outline)
+        except Exception:
+            continue
+        if page >= 0:
+            titles.setdefault(page, outline.title)
+    if not titles:
+        raise ValueError('document has no bookmarks to split at')
+    starts = sorted(titles)
+    if starts[0] != 0:
+        starts.insert(0, 0)
+    stops = starts[1:] + [reader.getNumPages()]
+    return [Part(start, stop, titles.get(start)) for start, stop in zip(starts, stops)]
+
+
+def _object_sizes(reader):
+    '''Bytes every object of the document takes in the file, estimated from the cross reference offsets.
+
+    The output adds a cross reference entry to every object, which is counted as well.
+    '''
+    offsets = sorted((offset, idnum) for objects in reader.xref.values() for idnum, offset in objects.items())
+    stream = reader.stream
+    end = stream.seek(0, os.SEEK_END)
+    stream.seek(max(end - TAIL_SIZE, 0))
+    try:
+        # the last object ends where the cross reference section starts
+        end = min(end, last_startxref(stream.read()))
+    except ProbeError:
+        pass
+    ends = [offset for offset, _ in offsets[1:]] + [end]
+    sizes = {idnum: max(end - offset, 0) + SPLIT_OBJECT_OVERHEAD for (offset, idnum), end in zip(offsets, ends)}
+    for idnum in reader.xref_objStm:
+        sizes[idnum] = SPLIT_PACKED_OBJECT_SIZE
+    return sizes
+
+
+def _references(obj):
+    '''Indirect references in `obj` and its direct objects, leaving out the ones back up.'''
+    references = []
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            references.append(obj)
+        elif isinstance(obj, DictionaryObject):
+            # `items()` of the dict gives the values without resolving them
+            stack.extend(value for key, value in obj.items() if key not in BACK_REFERENCES)
+        elif isinstance(obj, ArrayObject):
+            stack.extend(obj)
+    return references
+
+
+def size_budget_parts(reader, max_bytes):
+    '''Parts that are estimated to be at most `max_bytes` large.
+
+    The size of a part is the sum of the sizes in the input of all objects its pages
+    need, counting objects the pages share once. Pages are added to a part until the
+    next one would break the budget; a page that breaks it on its own gets a part of
+    its own.
+
+    Args:
+        reader (PdfFileReader): Reader of the document
+        max_bytes (int): Size budget of a part in bytes
+
+    Returns:
+        list: The `Part`s in page order
+    '''
+    if max_bytes <= 0:
+        raise ValueError(f'size of a part must be positive: {max_bytes}')
+    sizes = _object_sizes(reader)
+    # references out of every object seen so far, None for pages, whose own
+    # objects are counted for their own part
+    children = {}
+    parts = []
+    start, size = 0, SPLIT_PART_OVERHEAD
+    part_objects = set()
+    pages = reader.getNumPages()
+    for p in range(pages):
+        page = reader.getPage(p)
+        objects = {page.indirectRef.idnum}
+        stack = _references(page)
+        while stack:
+            reference = stack.pop()
+            idnum = reference.idnum
+            if idnum in objects:
+                continue
+            if idnum not in children:
+                obj = reference.getObject()
+                is_page = isinstance(obj, DictionaryObject) and obj.get('/Type') == '/Page'
+                children[idnum] = None if is_page else _references(obj)
+            if children[idnum] is not None:
+                objects.add(idnum)
+                stack.extend(children[idnum])
+        # only the references are needed, not the parsed objects
+        reader.resolvedObjects.clear()
+        # the page's entry in the page tree of the part comes on top
+        added = SPLIT_OBJECT_OVERHEAD + sum(sizes.get(idnum, SPLIT_PACKED_OBJECT_SIZE)
+                                            for idnum in objects - part_objects)
+        if p > start and size + added > max_bytes:
+            parts.append(Part(start, p, None))
+            start, size = p, SPLIT_PART_OVERHEAD
+            part_objects = set()
+            added = SPLIT_OBJECT_OVERHEAD + sum(sizes.get(idnum, SPLIT_PACKED_OBJECT_SIZE) for idnum in objects)
+        part_objects |= objects
+        size += added
+    parts.append(Part(start, pages, None))
+    return parts
+
+
+def title_slug(title):
+    '''str: A bookmark title cut and cleaned up to go into a file name'''
+    slug = re.sub(r'[^\w.-]+', '_', title or '').strip('._')
+    return slug[:SPLIT_TITLE_LENGTH].rstrip('._')
+
+
+class DirectorySink:
+    '''Writes every part into a file of its own, see `streaming_output`.'''
+
+    def output(self, filepath, compress_level=None):
+        return streaming_output(filepath, compress_level=compress_level)
+
+    def name(self, filepath):
+        return filepath
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class _CountingStream:
+    '''Write-only stream that counts the bytes written, for streams that can't `tell()`.'''
+
+    def __init__(self, stream):
+        self.__stream = stream
+        self.__position = 0
+
+    def write(self, data):
+        self.__stream.write(data)
+        self.__position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.__position
+
+
+class ZipSink:
+    '''Streams all parts into a single ZIP archive, named after the file names of the parts.
+
+    Every part is written into its archive member while it is produced, nothing else
+    touches the disk. An archive given by path is written next to its destination and
+    moved there by `close()`; `abort()` removes it again. Streams, like stdout, don't
+    need to be seekable.
+
+    Members are deflated at zlib's default level: `ZipFile.open()` takes no level
+    for members it streams, and `ZipFile.writestr()` would need whole parts in memory.
+
+    Args:
+        archive: Path of the archive or a binary file object to write it to
+        compress (bool): Deflate the members, False to store them as they are (default: True)
+    '''
+
+    def __init__(self, archive, compress=True):
+        self.__filepath = archive if isinstance(archive, (str, os.PathLike)) else None
+        if self.__filepath is not None:
+            archive = f'{self.__filepath}.part'
+        self.__zip = zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+
+    @contextmanager
+    def output(self, filepath, compress_level=None):
+        # named by a `ZipInfo`, so the member gets the current time instead of 1980
+        member_info = zipfile.ZipInfo(self.name(filepath), time.localtime()[:6])
+        member_info.compress_type = self.__zip.compression
+        # parts of unknown size may grow beyond 4 GB
+        with self.__zip.open(member_info, 'w', force_zip64=True) as member:
+            out_pdf = StreamingPdfWriter(_CountingStream(member), compress_level=compress_level)
+            yield out_pdf
+            out_pdf.close()
+
+    def name(self, filepath):
+        return os.path.basename(filepath)
+
+    def close(self):
+        '''Write the directory of the archive and move it into place.'''
+        self.__zip.close()
+        if self.__filepath is not None:
+            os.replace(f'{self.__filepath}.part', self.__filepath)
+
+    def abort(self):
+        '''Give up the archive, removing what has been written of it to disk.'''
+        try:
+            self.__zip.close()
+        except Exception:
+            pass
+        if self.__filepath is not None and os.path.exists(f'{self.__filepath}.part'):
+            os.remove(f'{self.__filepath}.part')
@@ -0,0 +1,26 @@
+'''Shared fixtures of the tests.
+
+The modules under test live in the top-level directory, and the documents the tests
+work on are generated with the benchmark corpus generator (`benchmarks/corpus.py`).
+'''
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from corpus import make_pdf
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    '''Factory writing a text PDF with a number of pages and returning its path.'''
+    def make(pages, name='document.pdf', **kwargs):
+        filepath = str(tmp_path / name)
+        make_pdf(filepath, pages, **kwargs)
+        return filepath
+    return make
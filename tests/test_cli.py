@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from cli import RESULT_CACHE_DIR, build_parser, main, result_cache
+
+
+def test_cache_flag_leaves_the_command_alone():
+    args = build_parser().parse_args(['--cache', 'run', 'x.json'])
+    assert args.command == 'run' and args.manifests == ['x.json']
+    assert result_cache(args).directory == RESULT_CACHE_DIR
+
+    args = build_parser().parse_args(['--cache', 'join', '-o', 'j.pdf', 'a.pdf', 'b.pdf'])
+    assert args.command == 'join' and args.output == 'j.pdf' and args.inputs == ['a.pdf', 'b.pdf']
+
+
+@pytest.mark.parametrize('argv, directory', [
+    (['join', '-o', 'j.pdf', 'a.pdf'], None),
+    (['--cache-dir', 'results', 'join', '-o', 'j.pdf', 'a.pdf'], 'results'),
+    (['--cache', '--cache-dir', 'results', 'run', 'x.json'], 'results'),
+])
+def test_cache_dir(argv, directory):
+    cache = result_cache(build_parser().parse_args(argv))
+    assert (cache and cache.directory) == directory
+
+
+def test_cached_join(pdf, tmp_path):
+    first, second = pdf(2, name='first.pdf'), pdf(3, name='second.pdf')
+    cache_dir = str(tmp_path / 'results')
+    for name in ('joined.pdf', 'again.pdf'):
+        assert main(['-q', '--cache-dir', cache_dir, 'join', '-o', str(tmp_path / name), first, second]) == 0
+    assert len(os.listdir(cache_dir)) == 2
+    assert (tmp_path / 'again.pdf').read_bytes() == (tmp_path / 'joined.pdf').read_bytes()
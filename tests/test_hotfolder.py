@@ -0,0 +1,29 @@
+import json
+
+import pytest
+from PyPDF2 import PdfFileReader
+
+from hotfolder import ConfigError, load_config, process
+
+
+def config(tmp_path, **rule):
+    (tmp_path / 'incoming').mkdir(exist_ok=True)
+    filepath = tmp_path / 'hotfolders.json'
+    rule = dict({'input': 'incoming', 'output': 'done', 'op': 'rotate'}, **rule)
+    filepath.write_text(json.dumps({'folders': [rule]}))
+    return str(filepath)
+
+
+def test_rotate_range_is_cut_to_short_scans(pdf, tmp_path):
+    rules, _ = load_config(config(tmp_path, rotate='LEFT', to=3))
+    result = process(rules[0], pdf(2, name='incoming/scan.pdf'))
+    assert result['pages'] == 2
+    with open(result['outputs'][0], 'rb') as in_file:
+        reader = PdfFileReader(in_file)
+        assert [reader.getPage(p).get('/Rotate', 0) for p in range(2)] == [270, 270]
+
+
+@pytest.mark.parametrize('rule', [{'from': 0}, {'to': 0}, {'from': -2}, {'to': '3'}])
+def test_page_numbers_start_at_one(tmp_path, rule):
+    with pytest.raises(ConfigError):
+        load_config(config(tmp_path, **rule))
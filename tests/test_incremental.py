@@ -0,0 +1,93 @@
+import re
+import warnings
+
+import pytest
+from PyPDF2 import PdfFileReader
+
+from engine import rotate_pdf_incremental
+from pdfprobe import last_startxref, probe_pages
+from test_pdfprobe import compressed_copy
+
+
+def xref_chain(data):
+    '''Offsets of all cross reference sections, newest first, following /Prev.'''
+    chain = []
+    offset = last_startxref(data)
+    while offset is not None:
+        assert offset not in chain
+        chain.append(offset)
+        if data[offset:offset + 4] == b'xref':
+            end = data.index(b'startxref', offset)
+        else:
+            assert re.match(rb'\d+ \d+ obj\s', data[offset:offset + 32])
+            end = data.index(b'stream', offset)
+        prev = re.search(rb'/Prev\s+(\d+)', data[offset:end])
+        offset = int(prev.group(1)) if prev else None
+    return chain
+
+
+def table_offsets(data, offset):
+    '''`{idnum: offset}` of the in-use entries of the classic table at `offset`.'''
+    offsets = {}
+    lines = iter(data[offset:data.index(b'trailer', offset)].split(b'\n')[1:])
+    for line in lines:
+        if not line.strip():
+            continue
+        first, entries = map(int, line.split())
+        for idnum in range(first, first + entries):
+            position, _, kind = next(lines).split()
+            if kind == b'n':
+                offsets[idnum] = int(position)
+    return offsets
+
+
+def rotations(filepath):
+    with open(filepath, 'rb') as in_file, warnings.catch_warnings():
+        warnings.simplefilter('error')
+        reader = PdfFileReader(in_file, strict=True)
+        return [reader.getPage(p).get('/Rotate', 0) for p in range(reader.getNumPages())]
+
+
+@pytest.fixture(params=[False, True], ids=['table', 'stream'])
+def source(request, pdf, tmp_path):
+    filepath = pdf(6)
+    if request.param:
+        filepath = compressed_copy(filepath, str(tmp_path / 'compressed.pdf'))
+    return filepath
+
+
+def test_update_is_appended(source, tmp_path):
+    with open(source, 'rb') as in_file:
+        original = in_file.read()
+    output_filepath = str(tmp_path / 'rotated.pdf')
+    rotate_pdf_incremental(source, output_filepath, (1, 3), 90)
+    with open(output_filepath, 'rb') as in_file:
+        data = in_file.read()
+    assert data.startswith(original) and len(data) > len(original)
+    assert rotations(output_filepath) == [0, 90, 90, 0, 0, 0]
+    assert probe_pages(output_filepath) == 6
+    chain = xref_chain(data)
+    assert chain[0] >= len(original) and chain[1:] == xref_chain(original)
+    # a section written like the file's own, a classic table pointing at the new page objects
+    is_table = data[chain[0]:chain[0] + 4] == b'xref'
+    assert is_table == (original[chain[1]:chain[1] + 4] == b'xref')
+    if is_table:
+        for idnum, offset in table_offsets(data, chain[0]).items():
+            assert offset >= len(original)
+            assert data[offset:].startswith(f'{idnum} 0 obj'.encode())
+
+
+def test_updates_stack_in_place(source):
+    rotate_pdf_incremental(source, source, (0, 2), 90)
+    rotate_pdf_incremental(source, source, (1, 100), 180)
+    rotate_pdf_incremental(source, source, (5, 6), 270)
+    assert rotations(source) == [90, 270, 180, 180, 180, 90]
+    with open(source, 'rb') as in_file:
+        assert len(xref_chain(in_file.read())) >= 4
+
+
+def test_nothing_to_rotate_copies_the_file(source, tmp_path):
+    output_filepath = str(tmp_path / 'unchanged.pdf')
+    rotate_pdf_incremental(source, output_filepath, (2, 4), 0)
+    with open(source, 'rb') as original, open(output_filepath, 'rb') as copy:
+        assert original.read() == copy.read()
@@ -0,0 +1,78 @@
+import pytest
+
+from joinlist import JoinList
+from settings import PAGE_COUNT_ERROR, PAGE_COUNT_PLACEHOLDER, PDF_FILENAME, PDF_PAGES
+
+
+def names(join_list):
+    return [join_list[entry_id].filepath for entry_id in join_list]
+
+
+def ids(join_list, *filepaths):
+    return [entry_id for entry_id in join_list if join_list[entry_id].filepath in filepaths]
+
+
+@pytest.fixture
+def join_list():
+    join_list = JoinList()
+    join_list.extend(['a', 'b', 'c', 'd', 'e'])
+    return join_list
+
+
+@pytest.mark.parametrize('selected, expected, changed', [
+    (['b'], ['b', 'a', 'c', 'd', 'e'], ['a', 'b']),
+    (['b', 'c'], ['b', 'c', 'a', 'd', 'e'], ['a', 'b', 'c']),
+    (['b', 'd'], ['b', 'a', 'd', 'c', 'e'], ['a', 'b', 'c', 'd']),
+    (['a', 'c'], ['a', 'b', 'c', 'd', 'e'], []),
+    ([], ['a', 'b', 'c', 'd', 'e'], []),
+])
+def test_move_up(join_list, selected, expected, changed):
+    assert join_list.move_up(ids(join_list, *selected)) == set(ids(join_list, *changed))
+    assert names(join_list) == expected
+
+
+@pytest.mark.parametrize('selected, expected, changed', [
+    (['d'], ['a', 'b', 'c', 'e', 'd'], ['d', 'e']),
+    (['c', 'd'], ['a', 'b', 'e', 'c', 'd'], ['c', 'd', 'e']),
+    (['b', 'd'], ['a', 'c', 'b', 'e', 'd'], ['b', 'c', 'd', 'e']),
+    (['c', 'e'], ['a', 'b', 'c', 'd', 'e'], []),
+])
+def test_move_down(join_list, selected, expected, changed):
+    assert join_list.move_down(ids(join_list, *selected)) == set(ids(join_list, *changed))
+    assert names(join_list) == expected
+
+
+def test_moves_keep_positions(join_list):
+    join_list.move_down(ids(join_list, 'a', 'c'))
+    join_list.move_up(ids(join_list, 'e'))
+    assert all(join_list.index(entry_id) == position for position, entry_id in enumerate(join_list))
+
+
+def test_remove(join_list):
+    moved = ids(join_list, 'd')
+    join_list.remove(ids(join_list, 'a', 'c') + ['unknown'])
+    assert names(join_list) == ['b', 'd', 'e']
+    assert len(join_list) == 3 and join_list.index(moved[0]) == 1
+    join_list.move_up(moved)
+    assert names(join_list) == ['d', 'b', 'e']
+
+
+def test_ids_are_not_reused(join_list):
+    removed = ids(join_list, 'e')
+    join_list.remove(removed)
+    added = join_list.extend(['f'])
+    assert added != removed and removed[0] not in join_list
+
+
+def test_entries_and_values(join_list):
+    entry_ids = list(join_list)
+    join_list[entry_ids[1]].page_select = '2-end'
+    join_list[entry_ids[2]].page_select = '  '
+    assert join_list.entries()[:3] == [('a', None), ('b', '2-end'), ('c', None)]
+    entry = join_list[entry_ids[0]]
+    assert entry.values[PDF_FILENAME] == 'a'
+    assert entry.values[PDF_PAGES] == PAGE_COUNT_PLACEHOLDER
+    entry.unreadable = True
+    assert entry.values[PDF_PAGES] == PAGE_COUNT_ERROR
+    entry.pages = 12
+    assert entry.values[PDF_PAGES] == 12
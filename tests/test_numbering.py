@@ -0,0 +1,37 @@
+import shutil
+
+from PyPDF2 import PdfFileReader, PdfFileWriter
+from PyPDF2.generic import NameObject, NumberObject
+
+from engine import stamp_pdf
+from numbering import PageNumberer
+
+
+def rotate_pages(filepath):
+    '''Turn all pages but the first by 90 degrees, the last one with an indirect /Rotate.'''
+    with open(filepath, 'rb') as in_file:
+        reader = PdfFileReader(in_file)
+        out_pdf = PdfFileWriter()
+        pages = [reader.getPage(p) for p in range(reader.getNumPages())]
+        pages[1][NameObject('/Rotate')] = NumberObject(90)
+        pages[2][NameObject('/Rotate')] = out_pdf._addObject(NumberObject(90))
+        for page in pages:
+            out_pdf.addPage(page)
+        with open(f'{filepath}.rotated', 'wb') as out_file:
+            out_pdf.write(out_file)
+    shutil.move(f'{filepath}.rotated', filepath)
+    return filepath
+
+
+def test_numbers_follow_rotation(pdf, tmp_path):
+    filepath = rotate_pages(pdf(3))
+    output_filepath = str(tmp_path / 'numbered.pdf')
+    stamp_pdf(filepath, None, output_filepath, numbering=PageNumberer(position='bottom-left', font_size=10))
+    with open(output_filepath, 'rb') as in_file:
+        reader = PdfFileReader(in_file)
+        contents = [b''.join(stream.getObject().getData() for stream in reader.getPage(p)['/Contents'])
+                    for p in range(3)]
+    # 28 points from the bottom left corner of a letter page as it is displayed
+    assert b'\nQ\nq 10 0 0 10 28 28 cm' in contents[0]
+    assert b'\nQ\nq 0 10 -10 0 584 28 cm' in contents[1]
+    assert b'\nQ\nq 0 10 -10 0 584 28 cm' in contents[2]
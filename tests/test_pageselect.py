@@ -0,0 +1,69 @@
+import pytest
+from PyPDF2 import PdfFileReader
+
+import engine
+from engine import join_pdfs
+from pageselect import PageSelectError, compile_page_select, parse_page_select
+
+
+def selected(page_select, pages):
+    '''One-based page numbers a selection picks, in order.'''
+    return [p + 1 for page_slice in compile_page_select(page_select, pages) for p in range(*page_slice)]
+
+
+@pytest.mark.parametrize('page_select, expected', [
+    ('1', [1]),
+    ('end', [10]),
+    ('1-3, 7', [1, 2, 3, 7]),
+    ('3-1', [3, 2, 1]),
+    ('end-8', [10, 9, 8]),
+    ('odd', [1, 3, 5, 7, 9]),
+    ('even', [2, 4, 6, 8, 10]),
+    ('2-7odd', [3, 5, 7]),
+    ('9-2even', [8, 6, 4, 2]),
+    ('1-end, !4-6', [1, 2, 3, 7, 8, 9, 10]),
+    ('!2, 1-3', [1, 3]),
+    ('1-5, 3-8', [1, 2, 3, 4, 5, 6, 7, 8]),
+    ('5, 1-2', [5, 1, 2]),
+    (' 1 - 2 ,\t4 ', [1, 2, 4]),
+    ('END-9', [10, 9]),
+])
+def test_selected_pages(page_select, expected):
+    assert selected(page_select, 10) == expected
+
+
+@pytest.mark.parametrize('page_select, pages, expected', [
+    ('1-3, 4, 5-end', 400, ((0, 400),)),
+    (','.join(str(p) for p in range(1, 401)), 400, ((0, 400),)),
+    ('3-1', 5, ((2, -1, -1),)),
+    ('odd', 6, ((0, 6, 2),)),
+    ('1-2, 5', 5, ((0, 2), (4, 5))),
+])
+def test_coalesced_slices(page_select, pages, expected):
+    assert compile_page_select(page_select, pages) == expected
+
+
+@pytest.mark.parametrize('page_select', ['', '1,,2', 'x', '1-', '-3', '1-2-3', '!'])
+def test_syntax_errors(page_select):
+    with pytest.raises(PageSelectError):
+        parse_page_select(page_select)
+
+
+@pytest.mark.parametrize('page_select', ['0', '11', '2-12', '1-end, !1-end'])
+def test_selection_must_fit_document(page_select):
+    with pytest.raises(PageSelectError):
+        compile_page_select(page_select, 10)
+
+
+def test_page_select_error_is_value_error():
+    assert issubclass(PageSelectError, ValueError)
+
+
+def test_join_trusts_the_reader_over_the_probe(pdf, tmp_path, monkeypatch):
+    filepath = pdf(6)
+    # a probed page count that is out of date must not be used to pick pages
+    monkeypatch.setattr(engine.document_cache, 'pages', lambda filepath: 20)
+    output_filepath = str(tmp_path / 'joined.pdf')
+    join_pdfs([(filepath, None), (filepath, '2-end')], output_filepath)
+    with open(output_filepath, 'rb') as in_file:
+        assert PdfFileReader(in_file).getNumPages() == 11
@@ -0,0 +1,82 @@
+import pytest
+from PyPDF2 import PdfFileReader
+
+from engine import rotate_pdf_incremental
+from pdfprobe import ProbeError, last_startxref, probe_pages
+from pdfwriter import streaming_output
+
+
+def pypdf2_pages(filepath):
+    with open(filepath, 'rb') as in_file:
+        return PdfFileReader(in_file).getNumPages()
+
+
+def compressed_copy(filepath, output_filepath):
+    '''Rewrite a file with object streams and a cross reference stream.'''
+    with open(filepath, 'rb') as in_file, streaming_output(output_filepath, compress_level=6) as out_pdf:
+        reader = PdfFileReader(in_file)
+        for p in range(reader.getNumPages()):
+            out_pdf.addPage(reader.getPage(p))
+    return output_filepath
+
+
+def truncate_page_tree(filepath, pages):
+    '''Append a classic incremental update that cuts the page tree root down to `pages` kids.'''
+    with open(filepath, 'rb') as in_file:
+        data = in_file.read()
+        in_file.seek(0)
+        reader = PdfFileReader(in_file)
+        root = reader.trailer.raw_get('/Root')
+        tree = reader.trailer['/Root'].raw_get('/Pages')
+        kids = reader.trailer['/Root']['/Pages']['/Kids'][:pages]
+        size = 1 + max(list(reader.xref_objStm) + [idnum for section in reader.xref.values() for idnum in section])
+    kids = ' '.join(f'{kid.idnum} {kid.generation} R' for kid in kids)
+    update = f'{tree.idnum} 0 obj\n<< /Type /Pages /Kids [{kids}] /Count {pages} >>\nendobj\n'.encode()
+    xref = len(data) + len(update)
+    update += (f'xref\n0 1\n0000000000 65535 f \n{tree.idnum} 1\n{len(data):010d} 00000 n \n'
+               f'trailer\n<< /Size {size} /Root {root.idnum} 0 R /Prev {last_startxref(data)} >>\n'
+               f'startxref\n{xref}\n%%EOF\n').encode()
+    with open(filepath, 'ab') as out_file:
+        out_file.write(update)
+    return filepath
+
+
+def test_classic_table(pdf):
+    filepath = pdf(7)
+    assert probe_pages(filepath) == pypdf2_pages(filepath) == 7
+
+
+def test_xref_stream(pdf, tmp_path):
+    filepath = compressed_copy(pdf(12), str(tmp_path / 'compressed.pdf'))
+    with open(filepath, 'rb') as in_file:
+        assert b'/ObjStm' in in_file.read()
+    assert probe_pages(filepath) == pypdf2_pages(filepath) == 12
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_incremental_update(pdf, tmp_path, compressed):
+    filepath = pdf(9)
+    if compressed:
+        filepath = compressed_copy(filepath, str(tmp_path / 'compressed.pdf'))
+    output_filepath = str(tmp_path / 'rotated.pdf')
+    rotate_pdf_incremental(filepath, output_filepath, (2, 5), 90)
+    assert probe_pages(output_filepath) == pypdf2_pages(output_filepath) == 9
+
+
+def test_classic_update_over_xref_stream(pdf, tmp_path):
+    # the newer classic table replaces the page tree root kept in an object stream
+    filepath = truncate_page_tree(compressed_copy(pdf(20), str(tmp_path / 'compressed.pdf')), 5)
+    assert probe_pages(filepath) == pypdf2_pages(filepath) == 5
+
+
+def test_classic_update_over_classic_table(pdf):
+    filepath = truncate_page_tree(pdf(20), 3)
+    assert probe_pages(filepath) == pypdf2_pages(filepath) == 3
+
+
+@pytest.mark.parametrize('data', [b'', b'not a pdf at all', b'%PDF-1.4\nstartxref\n999999\n%%EOF\n'])
+def test_unreadable(tmp_path, data):
+    filepath = tmp_path / 'broken.pdf'
+    filepath.write_bytes(data)
+    with pytest.raises(ProbeError):
+        probe_pages(str(filepath))
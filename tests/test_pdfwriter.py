@@ -0,0 +1,90 @@
+import hashlib
+import os
+import re
+import shutil
+
+from PyPDF2 import PdfFileReader, PdfFileWriter
+from PyPDF2.generic import ArrayObject, DictionaryObject, FloatObject, NameObject
+
+from engine import join_pdfs
+from pdfprobe import probe_pages
+
+
+def with_links(filepath):
+    '''Give every page of a file the same link annotation.'''
+    with open(filepath, 'rb') as in_file:
+        reader = PdfFileReader(in_file)
+        out_pdf = PdfFileWriter()
+        for p in range(reader.getNumPages()):
+            page = reader.getPage(p)
+            page[NameObject('/Annots')] = ArrayObject([out_pdf._addObject(DictionaryObject({
+                NameObject('/Type'): NameObject('/Annot'),
+                NameObject('/Subtype'): NameObject('/Link'),
+                NameObject('/Rect'): ArrayObject(FloatObject(v) for v in (72, 72, 144, 96)),
+            }))])
+            out_pdf.addPage(page)
+        with open(f'{filepath}.links', 'wb') as out_file:
+            out_pdf.write(out_file)
+    shutil.move(f'{filepath}.links', filepath)
+    return filepath
+
+
+def objects(filepath):
+    with open(filepath, 'rb') as in_file:
+        return len(re.findall(rb'\d+ 0 obj\b', in_file.read()))
+
+
+def resources(page, kind):
+    '''`{name: idnum}` of the fonts or XObjects of a page.'''
+    return {name: ref.idnum for name, ref in page['/Resources'][kind].items()}
+
+
+def rendering(page):
+    '''What a page looks like: contents, fonts, XObject data and link rectangles.'''
+    xobjects = page['/Resources']['/XObject']
+    return (page.getContents().getData(),
+            sorted((name, font.getObject()['/BaseFont']) for name, font in page['/Resources']['/Font'].items()),
+            sorted((name, hashlib.sha256(xobjects[name].getData()).hexdigest()) for name in xobjects),
+            [[float(v) for v in annot.getObject()['/Rect']] for annot in page.get('/Annots', [])])
+
+
+def test_deduplicated_join(pdf, tmp_path):
+    first = with_links(pdf(3, name='first.pdf', profile='image'))
+    second = str(tmp_path / 'second.pdf')
+    shutil.copy(first, second)
+    entries = [(first, None), (second, None)]
+    plain, deduplicated = str(tmp_path / 'plain.pdf'), str(tmp_path / 'deduplicated.pdf')
+    assert join_pdfs(entries, plain) == 0
+    assert join_pdfs(entries, deduplicated, deduplicate=True) > 0
+    # images, fonts and the logo of the copy are written once, pages and links per page
+    with open(deduplicated, 'rb') as in_file:
+        reader = PdfFileReader(in_file)
+        pages = [reader.getPage(p) for p in range(reader.getNumPages())]
+        assert len(pages) == 6
+        assert len({page.indirectRef.idnum for page in pages}) == 6
+        for page, copy in zip(pages[:3], pages[3:]):
+            assert resources(page, '/Font') == resources(copy, '/Font')
+            assert resources(page, '/XObject') == resources(copy, '/XObject')
+        assert len({page.raw_get('/Annots')[0].idnum for page in pages}) == 6
+        deduplicated_pages = [rendering(page) for page in pages]
+    # the copy's image and contents of every page, its three fonts and its logo
+    assert objects(deduplicated) == objects(plain) - 3 * 2 - 3 - 1
+    with open(plain, 'rb') as in_file:
+        reader = PdfFileReader(in_file)
+        assert [rendering(reader.getPage(p)) for p in range(reader.getNumPages())] == deduplicated_pages
+
+
+def test_compressed_round_trip(pdf, tmp_path):
+    filepath = pdf(25, profile='mixed')
+    output_filepath = str(tmp_path / 'compressed.pdf')
+    join_pdfs([(filepath, None)], output_filepath, compress_level=9)
+    with open(output_filepath, 'rb') as in_file:
+        data = in_file.read()
+    assert b'/ObjStm' in data and b'/XRef' in data and b'\nxref' not in data
+    assert os.path.getsize(output_filepath) < os.path.getsize(filepath)
+    assert probe_pages(output_filepath) == 25
+    with open(filepath, 'rb') as original, open(output_filepath, 'rb') as compressed:
+        original, compressed = PdfFileReader(original), PdfFileReader(compressed, strict=True)
+        assert compressed.getNumPages() == 25 and compressed.xref_objStm
+        assert [rendering(compressed.getPage(p)) for p in range(25)] == \
+            [rendering(original.getPage(p)) for p in range(25)]
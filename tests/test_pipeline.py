@@ -0,0 +1,23 @@
+from PyPDF2 import PdfFileReader
+
+import engine
+from pipeline import Pipeline
+
+
+def test_sources_are_only_parsed_by_the_join(pdf, tmp_path, monkeypatch):
+    first, second = pdf(3, name='first.pdf'), pdf(4, name='second.pdf')
+    parsed = []
+    get = engine.document_cache.get
+    monkeypatch.setattr(engine.document_cache, 'get', lambda filepath: parsed.append(filepath) or get(filepath))
+    pipeline = Pipeline().join(first).join(second, '2-end').join(first, '1').rotate(90, '2').number()
+    prepared = []
+    prepare = pipeline.stages[-1].prepare
+    pipeline.stages[-1].prepare = lambda out_pdf, pages: prepared.append((pages, list(parsed))) or \
+        prepare(out_pdf, pages)
+    output_filepath = str(tmp_path / 'packet.pdf')
+    pipeline.run(output_filepath)
+    assert prepared == [(7, [])]
+    with open(output_filepath, 'rb') as in_file:
+        reader = PdfFileReader(in_file)
+        assert reader.getNumPages() == 7
+        assert [reader.getPage(p).get('/Rotate', 0) for p in range(3)] == [0, 90, 0]
@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+from backends import rotate_pdf
+from resultcache import ResultCache, clamp_page_range, page_slices
+
+
+class Job:
+    '''Writes a file with fixed contents and counts how often it ran.'''
+
+    def __init__(self, output_filepath, contents=b'%PDF-1.4 output', result=42):
+        self.output_filepath = output_filepath
+        self.contents = contents
+        self.result = result
+        self.runs = 0
+
+    def __call__(self):
+        self.runs += 1
+        with open(self.output_filepath, 'wb') as out_file:
+            out_file.write(self.contents)
+        return self.result
+
+
+@pytest.fixture
+def source(tmp_path):
+    filepath = tmp_path / 'source.pdf'
+    filepath.write_bytes(b'%PDF-1.4 source')
+    return str(filepath)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / 'results'))
+
+
+def read(filepath):
+    with open(filepath, 'rb') as in_file:
+        return in_file.read()
+
+
+def test_miss_then_hit(cache, source, tmp_path):
+    first, second = str(tmp_path / 'first.pdf'), str(tmp_path / 'second.pdf')
+    job = Job(first)
+    assert cache.run('join', [source], {'pages': [[0, 1]]}, first, job) == 42
+    assert job.runs == 1
+    progress = []
+    assert cache.run('join', [source], {'pages': [[0, 1]]}, second, Job(second),
+                     progress=lambda *args: progress.append(args)) == 42
+    assert read(second) == read(first)
+    assert progress == [(1, 1)]
+    assert len(cache.entries()) == 1
+
+
+def test_different_parameters_or_inputs_miss(cache, source, tmp_path):
+    output_filepath = str(tmp_path / 'out.pdf')
+    cache.run('rotate', [source], {'degrees': 90}, output_filepath, Job(output_filepath))
+    job = Job(output_filepath)
+    cache.run('rotate', [source], {'degrees': 180}, output_filepath, job)
+    cache.run('stamp', [source], {'degrees': 90}, output_filepath, job)
+    with open(source, 'ab') as source_file:
+        source_file.write(b' changed')
+    cache.run('rotate', [source], {'degrees': 90}, output_filepath, job)
+    assert job.runs == 3
+
+
+def test_job_writing_over_its_input_always_runs(cache, source):
+    job = Job(source)
+    cache.run('rotate', [source], {}, source, job)
+    cache.run('rotate', [source], {}, source, job)
+    assert job.runs == 2
+    assert cache.entries() == []
+
+
+def test_changing_the_output_leaves_the_entry_alone(cache, source, tmp_path):
+    output_filepath = str(tmp_path / 'out.pdf')
+    cache.run('join', [source], {}, output_filepath, Job(output_filepath))
+    with open(output_filepath, 'r+b') as out_file:
+        out_file.write(b'%XXX')
+    served_filepath = str(tmp_path / 'served.pdf')
+    job = Job(served_filepath)
+    cache.run('join', [source], {}, served_filepath, job)
+    assert job.runs == 0
+    assert read(served_filepath) == b'%PDF-1.4 output'
+
+
+def test_changed_entry_is_dropped(tmp_path, source):
+    cache = ResultCache(str(tmp_path / 'results'), link=True)
+    output_filepath = str(tmp_path / 'out.pdf')
+    cache.run('join', [source], {}, output_filepath, Job(output_filepath))
+    linked_filepath = str(tmp_path / 'linked.pdf')
+    cache.run('join', [source], {}, linked_filepath, Job(linked_filepath))
+    # the same size, so only the contents tell
+    with open(linked_filepath, 'r+b') as linked_file:
+        linked_file.write(b'%XXX')
+    job = Job(str(tmp_path / 'again.pdf'))
+    cache.run('join', [source], {}, job.output_filepath, job)
+    assert job.runs == 1
+    assert read(job.output_filepath) == b'%PDF-1.4 output'
+
+
+def test_evicts_least_recently_used(tmp_path, source):
+    cache = ResultCache(str(tmp_path / 'results'), max_bytes=250)
+    outputs = {}
+    for n in range(3):
+        outputs[n] = str(tmp_path / f'out-{n}.pdf')
+        cache.run('join', [source], {'n': n}, outputs[n], Job(outputs[n], contents=bytes(100)))
+        # keep the order of use apart on file systems with coarse timestamps
+        info_filepath = os.path.join(cache.directory, f'{cache.key("join", [source], {"n": n})}.json')
+        os.utime(info_filepath, ns=(n * 10 ** 9, n * 10 ** 9))
+    assert [key for _, _, key in cache.entries()] == [cache.key('join', [source], {'n': n}) for n in (1, 2)]
+    assert sum(size for _, size, _ in cache.entries()) <= 250
+    assert cache.evict() == 0
+    cache.clear()
+    assert cache.entries() == []
+
+
+def test_page_slices_normalize_selections(pdf):
+    filepath = pdf(5)
+    assert page_slices(filepath, None) == [[0, 5]]
+    assert page_slices(filepath, '1-2, 3, 4-end') == [[0, 5]]
+    assert page_slices(filepath, ((0, 2),)) == [[0, 2]]
+
+
+def test_page_ranges_are_cut_to_the_file(pdf, cache, tmp_path):
+    filepath = pdf(5)
+    assert clamp_page_range(filepath, (0, 100)) == clamp_page_range(filepath, (0, None)) == [0, 5]
+    assert clamp_page_range(filepath, (1, 3)) == [1, 3]
+    for n, page_range in enumerate([(0, 100), (0, 5), (0, None)]):
+        rotate_pdf(filepath, str(tmp_path / f'rotated-{n}.pdf'), page_range, 90, result_cache=cache)
+    assert len(cache.entries()) == 1
@@ -0,0 +1,87 @@
+import os
+import zipfile
+
+import pytest
+from PyPDF2 import PdfFileReader
+
+import engine
+from doccache import document_cache
+from engine import split_pdf
+from splitting import Part, page_chunks, size_budget_parts
+
+
+def pages_of(filepath):
+    with open(filepath, 'rb') as in_file:
+        return PdfFileReader(in_file).getNumPages()
+
+
+@pytest.mark.parametrize('pages, every, expected', [
+    (10, 1, [(p, p + 1) for p in range(10)]),
+    (10, 3, [(0, 3), (3, 6), (6, 9), (9, 10)]),
+    (10, 5, [(0, 5), (5, 10)]),
+    (10, 50, [(0, 10)]),
+    (0, 4, []),
+])
+def test_page_chunks(pages, every, expected):
+    parts = page_chunks(pages, every)
+    assert [(start, stop) for start, stop, _ in parts] == expected
+    assert all(title is None for _, _, title in parts)
+
+
+def test_page_chunks_needs_positive_size():
+    with pytest.raises(ValueError):
+        page_chunks(10, 0)
+
+
+def test_size_budget_parts_cover_document(pdf):
+    filepath = pdf(30, profile='mixed')
+    reader = document_cache.open_reader(filepath)
+    size = os.path.getsize(filepath)
+    parts = size_budget_parts(reader, size // 4)
+    assert 2 < len(parts) < 30
+    assert parts[0].start == 0 and parts[-1].stop == 30
+    assert all(part.stop == following.start for part, following in zip(parts, parts[1:]))
+    assert all(part.start < part.stop for part in parts)
+
+
+def test_size_budget_parts_limits(pdf):
+    filepath = pdf(12, profile='image')
+    reader = document_cache.open_reader(filepath)
+    assert size_budget_parts(reader, 10 * os.path.getsize(filepath)) == [Part(0, 12, None)]
+    # pages breaking the budget on their own still get a part each
+    assert size_budget_parts(reader, 1) == [Part(p, p + 1, None) for p in range(12)]
+    with pytest.raises(ValueError):
+        size_budget_parts(reader, 0)
+
+
+def test_size_budget_parts_stay_below_budget(pdf):
+    filepath = pdf(40, profile='image')
+    max_bytes = os.path.getsize(filepath) // 5
+    outputs = split_pdf(filepath, max_bytes=max_bytes)
+    assert sum(pages_of(output) for output in outputs) == 40
+    assert all(os.path.getsize(output) <= max_bytes for output in outputs if pages_of(output) > 1)
+
+
+def test_split_every(pdf):
+    filepath = pdf(7)
+    outputs = split_pdf(filepath, every=3)
+    assert [os.path.basename(output) for output in outputs] == ['document_1.pdf', 'document_2.pdf', 'document_3.pdf']
+    assert [pages_of(output) for output in outputs] == [3, 3, 1]
+
+
+def test_split_into_archive(pdf, tmp_path):
+    filepath = pdf(5)
+    archive = str(tmp_path / 'parts.zip')
+    names = split_pdf(filepath, every=2, archive=archive)
+    with zipfile.ZipFile(archive) as parts:
+        assert parts.namelist() == names == ['document_1.pdf', 'document_2.pdf', 'document_3.pdf']
+    assert not os.path.exists(f'{archive}.part')
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_split_trusts_the_reader_over_the_probe(pdf, monkeypatch, workers):
+    filepath = pdf(6)
+    # a probed page count that is out of date must not be used to pick pages
+    monkeypatch.setattr(engine.document_cache, 'pages', lambda filepath: 20)
+    outputs = split_pdf(filepath, workers=workers, every=4)
+    assert [pages_of(output) for output in outputs] == [4, 2]
@@ -0,0 +1,159 @@
+'''Page thumbnails, rendered by Poppler's `pdftoppm` and cached in memory and on disk.
+
+Thumbnails are PNG images keyed on the SHA-256 hash of the file contents and the
+zero-based page index, so they stay valid when a file is renamed or copied and are
+never shown for a file that has changed. The most recently used ones are kept in
+memory, all of them on disk:
+
+    cache = ThumbnailCache(os.path.join(DATA_DIR, 'thumbnails'))
+    images = cache.thumbnails('scan.pdf', range(20))
+
+Missing thumbnails are rendered in runs of consecutive pages, one run of `pdftoppm`
+per `THUMBNAIL_RENDER_CHUNK` pages. Rendering blocks, so it belongs on a worker
+thread; the cache can be used from several threads at once.
+'''
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+from settings import THUMBNAIL_CACHE_SIZE, THUMBNAIL_RENDER_CHUNK, THUMBNAIL_SIZE
+from backends import POPPLER
+from doccache import content_hash
+from tracing import count, span
+
+RENDERED_PAGE = re.compile(r'-(\d+)\.png$')
+
+
+def _runs(pages, chunk):
+    '''Cut page indices into runs of consecutive pages no longer than `chunk`.'''
+    runs = []
+    for page in sorted(set(pages)):
+        if runs and page == runs[-1][1] and page - runs[-1][0] < chunk:
+            runs[-1][1] = page + 1
+        else:
+            runs.append([page, page + 1])
+    return runs
+
+
+class ThumbnailCache:
+    '''Thumbnails of PDF pages, see the module documentation.
+
+    Args:
+        directory (str): Directory to keep the thumbnails in, created when needed
+        size (int): Longest side of a thumbnail in pixels (default: THUMBNAIL_SIZE)
+        max_items (int): Number of thumbnails kept in memory (default: THUMBNAIL_CACHE_SIZE)
+        rasterizer (PopplerBackend): Provides `pdftoppm` (default: POPPLER)
+    '''
+
+    def __init__(self, directory, size=THUMBNAIL_SIZE, max_items=THUMBNAIL_CACHE_SIZE, rasterizer=POPPLER):
+        self.directory = directory
+        self.size = size
+        self.max_items = max_items
+        self.rasterizer = rasterizer
+        self.__images = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__images)
+
+    def path(self, digest, page):
+        '''Path of a thumbnail on disk, whether it exists or not.
+
+        Args:
+            digest (str): Content hash of the file, see `content_hash()`
+            page (int): Zero-based page index
+        '''
+        return os.path.join(self.directory, str(self.size), digest[:2], digest, f'{page}.png')
+
+    def __remember(self, key, image):
+        with self.__lock:
+            self.__images[key] = image
+            self.__images.move_to_end(key)
+            while len(self.__images) > self.max_items:
+                self.__images.popitem(last=False)
+
+    def cached(self, digest, page):
+        '''A thumbnail from memory or disk, without rendering it.
+
+        Args:
+            digest (str): Content hash of the file, see `content_hash()`
+            page (int): Zero-based page index
+
+        Returns:
+            bytes: PNG image, None if the page hasn't been rendered yet
+        '''
+        key = (digest, page)
+        with self.__lock:
+            image = self.__images.get(key)
+            if image is not None:
+                self.__images.move_to_end(key)
+                count('thumbnail memory hits')
+                return image
+        try:
+            with open(self.path(digest, page), 'rb') as image_file:
+                image = image_file.read()
+        except FileNotFoundError:
+            return None
+        count('thumbnail disk hits')
+        self.__remember(key, image)
+        return image
+
+    def thumbnails(self, filepath, pages):
+        '''Thumbnails of some pages of a file, rendering those not cached yet.
+
+        Args:
+            filepath (str): Path to PDF File
+            pages (iterable): Zero-based page indices
+
+        Returns:
+            dict: PNG image per page index
+
+        Raises:
+            Unsupported: If `pdftoppm` isn't installed or can't render the file
+        '''
+        digest = content_hash(filepath)
+        images = {}
+        missing = []
+        for page in pages:
+            image = self.cached(digest, page)
+            if image is None:
+                missing.append(page)
+            else:
+                images[page] = image
+        for first, stop in _runs(missing, THUMBNAIL_RENDER_CHUNK):
+            images.update(self.__render(filepath, digest, first, stop))
+        return images
+
+    def __render(self, filepath, digest, first, stop):
+        '''Render pages `first` up to `stop` and move the images into the disk cache.'''
+        pdftoppm = self.rasterizer.tool('pdftoppm')
+        os.makedirs(os.path.dirname(self.path(digest, first)), exist_ok=True)
+        # rendered next to the cache, so the images can be renamed into place
+        workdir = tempfile.mkdtemp(dir=self.directory, prefix='.render-')
+        images = {}
+        try:
+            with span('thumbnails', file=os.path.basename(filepath), pages=stop - first):
+                self.rasterizer.run([pdftoppm, '-png', '-scale-to', str(self.size), '-f', str(first + 1),
+                                     '-l', str(stop), filepath, os.path.join(workdir, 'page')])
+            for filename in os.listdir(workdir):
+                match = RENDERED_PAGE.search(filename)
+                if match is None:
+                    continue
+                page = int(match.group(1)) - 1
+                with open(os.path.join(workdir, filename), 'rb') as image_file:
+                    images[page] = image_file.read()
+                os.replace(os.path.join(workdir, filename), self.path(digest, page))
+                self.__remember((digest, page), images[page])
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        count('thumbnails rendered', len(images))
+        return images
+
+    def clear(self):
+        '''Forget the thumbnails kept in memory, those on disk stay.'''
+        with self.__lock:
+            self.__images.clear()
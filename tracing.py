@@ -0,0 +1,173 @@
+'''Instrumentation of the PDF operations.
+
+The engine marks its hot paths (parsing files, fetching, rotating and stamping
+pages, adding them to the output, writing it) with `span()` and counts pages and
+bytes with `count()`. Both do nothing unless a `Tracer` is active:
+
+    with tracing() as tracer:
+        join_pdfs(entries, 'joined.pdf')
+    print(tracer.summary())
+    tracer.write_chrome_trace('join.trace.json')
+
+The trace file can be opened in `chrome://tracing` or https://ui.perfetto.dev and
+shows every span on a timeline per thread. Spans of split workers running in other
+processes are not recorded.
+
+Turned off, a span costs a global lookup and a function call, which is nothing
+compared to the work of a single page.
+'''
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+_tracer = None
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.events.append(
+            (self.name, self.start, time.perf_counter_ns() - self.start, threading.get_ident(), self.args))
+
+
+class Tracer:
+    '''Collects spans and counters while it is active, see `tracing()`.
+
+    Attributes:
+        events (list): Finished spans as `(name, start ns, duration ns, thread id, args)`
+        counters (dict): Current value of every counter
+    '''
+
+    def __init__(self):
+        self.events = []
+        self.counters = {}
+        self.__samples = []
+        self.__lock = threading.Lock()
+        self.start = time.perf_counter_ns()
+        self.stop = None
+
+    @property
+    def seconds(self):
+        '''float: Wall time the tracer has been (or was) active for'''
+        stop = self.stop if self.stop is not None else time.perf_counter_ns()
+        return (stop - self.start) / 1e9
+
+    def span(self, name, args):
+        return _Span(self, name, args)
+
+    def count(self, name, value):
+        with self.__lock:
+            total = self.counters[name] = self.counters.get(name, 0) + value
+            self.__samples.append((name, time.perf_counter_ns(), total))
+
+    def chrome_trace(self):
+        '''The recorded data in the Chrome trace event format.
+
+        Returns:
+            dict: JSON serializable trace with one complete event per span and a
+            counter event for every change of a counter
+        '''
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for name, start, duration, thread, args in self.events:
+            event = {'name': name, 'ph': 'X', 'ts': (start - self.start) / 1000, 'dur': duration / 1000,
+                     'pid': pid, 'tid': threads.setdefault(thread, len(threads))}
+            if args:
+                event['args'] = args
+            events.append(event)
+        for name, timestamp, total in self.__samples:
+            events.append({'name': name, 'ph': 'C', 'ts': (timestamp - self.start) / 1000, 'pid': pid,
+                           'args': {name: total}})
+        events.sort(key=lambda event: event['ts'])
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, filepath):
+        '''Write the trace to a JSON file, see `chrome_trace()`.
+
+        Args:
+            filepath (str): Path of the trace file
+        '''
+        with open(filepath, 'w') as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+    def summary(self):
+        '''A table of the time spent in every span and the values of all counters.
+
+        Nested spans are all counted in full, so the shares of the wall time can add
+        up to more than 100%.
+
+        Returns:
+            str: Human readable, aligned table
+        '''
+        totals = {}
+        for name, _, duration, _, _ in self.events:
+            calls, total, longest = totals.get(name, (0, 0, 0))
+            totals[name] = (calls + 1, total + duration, max(longest, duration))
+        wall = self.seconds
+        lines = [f'{"span":<20} {"calls":>8} {"total ms":>10} {"mean ms":>9} {"max ms":>9} {"wall":>6}']
+        for name, (calls, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f'{name:<20} {calls:>8} {total / 1e6:>10.1f} {total / calls / 1e6:>9.3f} '
+                         f'{longest / 1e6:>9.3f} {total / 1e9 / wall if wall else 0:>6.0%}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'{name:<20} {value:>8} ({value / wall if wall else 0:.1f}/s)')
+        lines.append(f'{"wall time":<20} {wall:>8.3f} s')
+        return '\n'.join(lines)
+
+
+def span(name, **args):
+    '''Time a block of code if tracing is active.
+
+    Args:
+        name (str): Name of the span, e.g. the method being called
+        **args: Details shown with the span in the trace, e.g. the page number
+
+    Returns:
+        A context manager
+    '''
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name, args)
+
+
+def count(name, value=1):
+    '''Add to a counter if tracing is active.
+
+    Args:
+        name (str): Name of the counter, e.g. `'pages'`
+        value (int): Amount to add (default: 1)
+    '''
+    if _tracer is not None:
+        _tracer.count(name, value)
+
+
+@contextmanager
+def tracing():
+    '''Record spans and counters of all threads while the block runs.
+
+    Yields:
+        Tracer: The active tracer, which keeps its data after the block
+    '''
+    global _tracer
+    tracer, previous = Tracer(), _tracer
+    _tracer = tracer
+    try:
+        yield tracer
+    finally:
+        tracer.stop = time.perf_counter_ns()
+        _tracer = previous